@@ -0,0 +1,148 @@
+"""End-to-end turns through the root agent and adviser_agent, fully offline.
+
+Gemini is replaced by the scripted StubLlm (service/agents/stub_model.py) and CoinGecko by
+bench/stub_mcp_server.py. The user's database is filled with bench.synthetic_data, and sessions
+go through the SQLite session service, as in production. For every scenario (one session,
+--turns turns) the report gives:
+- turn latency p50/p95
+- model and tool calls per turn
+- the size of the prompts sent to the model
+- peak RSS
+
+    python -m bench.agent_bench --size 100000 --turns 20 --output agent_bench.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from bench.db_bench import peak_rss_mb, summarize
+from bench.synthetic_data import populate
+from service.agents.registry import MODEL_BACKEND_ENV
+from service.db import database
+from service.db.async_database import shutdown_executor
+from service.db.session_store import SessionStore
+from service.tracing import tracer
+
+STUB_MCP_SERVER = os.path.join(os.path.dirname(__file__), "stub_mcp_server.py")
+APP_NAME = "agent_bench"
+
+# (target agent, scenario, message)
+SCENARIOS = (
+    ("root", "greeting", "hello there"),
+    ("root", "transactions", "show my last transactions"),
+    ("root", "goals", "show my goals"),
+    ("root", "market", "what is the bitcoin price today"),
+    ("root", "advice", "what should I invest in to reach my goals faster"),
+    ("adviser", "plan", "make me a plan to reach my goals with my investments"),
+)
+
+
+def use_stubs(model_latency: float):
+    """Points the model registry and the market toolset at the offline stubs; call before building agents."""
+    os.environ[MODEL_BACKEND_ENV] = "stub"
+    os.environ["STUB_MODEL_LATENCY"] = str(model_latency)
+    os.environ["MARKET_MCP_COMMAND"] = f'"{sys.executable}" "{STUB_MCP_SERVER}"'
+
+
+async def run_scenario(runner, target: str, scenario: str, message: str, turns: int) -> dict:
+    from google.genai import types
+
+    from service.agents.stub_model import reset_stub_stats, stub_stats
+    from service.agents.turns import summarize_turn
+
+    session = await runner.session_service.create_session(app_name=APP_NAME, user_id="bench",
+                                                          session_id=f"{target}-{scenario}")
+    reset_stub_stats()
+    latencies, tools, response_chars = [], 0, []
+    for _ in range(turns):
+        content = types.Content(role="user", parts=[types.Part(text=message)])
+        started = time.perf_counter()
+        with tracer.span("turn", "turn", root=True, scenario=scenario):
+            events = [event async for event in runner.run_async(user_id="bench", session_id=session.id,
+                                                                new_message=content)]
+        latencies.append(time.perf_counter() - started)
+        turn = summarize_turn(events)
+        tools += len(turn.tools)
+        response_chars.append(len(turn.response))
+    model = stub_stats()
+    return {
+        "target": target,
+        "scenario": scenario,
+        "turns": turns,
+        "latency": summarize(latencies),
+        "model_calls_per_turn": round(model["calls"] / turns, 2),
+        "tool_calls_per_turn": round(tools / turns, 2),
+        "prompt_chars_p50": model["prompt_chars_p50"],
+        "prompt_chars_p95": model["prompt_chars_p95"],
+        "prompt_chars_max": model["prompt_chars_max"],
+        "response_chars_mean": round(statistics.fmean(response_chars), 1) if response_chars else 0,
+    }
+
+
+async def run(size: int, turns: int, model_latency: float, seed: int, workdir: str, trace_file: str = None) -> dict:
+    use_stubs(model_latency)
+    if trace_file:
+        tracer.configure(path=trace_file)
+    from google.adk.runners import Runner
+
+    from service.agents.adviser_agent import get_adviser_agent
+    from service.agents.root_agent import get_root_agent
+    from service.agents.session_service import SqliteSessionService
+    from service.agents.tracing_plugin import tracing_plugins
+    from service.market.sessions import mcp_registry
+
+    results = {"benchmark": "agent", "started_at": datetime.utcnow().isoformat(timespec="seconds"),
+               "size": size, "turns": turns, "model_latency_s": model_latency}
+    path = os.path.join(workdir, "agent_bench.db")
+    results["populate"] = populate(path, size, seed=seed)
+    session_service = SqliteSessionService(SessionStore(os.path.join(workdir, "sessions.db")))
+    runners = {
+        "root": Runner(app_name=APP_NAME, agent=get_root_agent(), session_service=session_service,
+                       plugins=tracing_plugins()),
+        "adviser": Runner(app_name=APP_NAME, agent=get_adviser_agent(), session_service=session_service,
+                          plugins=tracing_plugins()),
+    }
+    try:
+        started = time.perf_counter()
+        await mcp_registry.warm_up()
+        results["mcp_warm_up_s"] = round(time.perf_counter() - started, 3)
+        with database.use_database(path):
+            results["scenarios"] = [
+                await run_scenario(runners[target], target, scenario, message, turns)
+                for target, scenario, message in SCENARIOS
+            ]
+        results["market_cache"] = mcp_registry.get_toolset().cache.stats()
+    finally:
+        await mcp_registry.close()
+        shutdown_executor()
+        database.close_all_pools()
+    results["peak_rss_mb"] = peak_rss_mb()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--size", type=int, default=100000, help="transaction rows in the user's database")
+    parser.add_argument("--turns", type=int, default=10, help="turns per scenario (one session each)")
+    parser.add_argument("--model-latency", type=float, default=0.0, help="seconds the stub model waits per call")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--trace-file", help="also export the spans of every turn (see service/tracing.py)")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as workdir:
+        results = asyncio.run(run(args.size, args.turns, args.model_latency, args.seed, workdir, args.trace_file))
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
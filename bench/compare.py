@@ -0,0 +1,83 @@
+"""Compares two benchmark reports (from db_bench, agent_bench or startup_bench) and flags regressions.
+
+Every numeric metric where lower is better is compared: latencies (*_ms, *_s), peak RSS, prompt
+and result sizes, and calls per turn. Throughputs (*_per_s) are compared the other way round.
+Exits with status 1 if any metric got worse by more than --threshold.
+
+    python -m bench.compare baseline.json current.json --threshold 0.2
+"""
+import argparse
+import json
+import sys
+
+LOWER_IS_BETTER = ("_ms", "_s", "_mb", "_chars", "_chars_p50", "_chars_p95", "_chars_max", "_tokens_est",
+                   "_per_turn")
+HIGHER_IS_BETTER = ("_per_s",)
+# Differences below these are noise whatever the ratio.
+MIN_ABSOLUTE = {"_ms": 0.5, "_s": 0.005}
+
+
+def flatten(value, prefix="") -> dict:
+    """Flattens nested reports; list entries are keyed by their size/scenario/name when they have one."""
+    items = {}
+    if isinstance(value, dict):
+        for key, item in value.items():
+            items.update(flatten(item, f"{prefix}.{key}" if prefix else str(key)))
+    elif isinstance(value, list):
+        for index, item in enumerate(value):
+            label = index
+            if isinstance(item, dict):
+                label = next((f"{key}={item[key]}" for key in ("size", "scenario", "name") if key in item), index)
+            items.update(flatten(item, f"{prefix}[{label}]"))
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        items[prefix] = value
+    return items
+
+
+def direction(metric: str):
+    name = metric.rsplit(".", 1)[-1]
+    if name.endswith(HIGHER_IS_BETTER):
+        return -1
+    if name.endswith(LOWER_IS_BETTER):
+        return 1
+    return None
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> list:
+    """Returns (metric, baseline, current, change) for every metric that is worse by more than `threshold`."""
+    before, after = flatten(baseline), flatten(current)
+    regressions = []
+    for metric, old in before.items():
+        new = after.get(metric)
+        sign = direction(metric)
+        if new is None or sign is None or old == 0:
+            continue
+        suffix = next((s for s in MIN_ABSOLUTE if metric.endswith(s)), None)
+        if suffix and abs(new - old) < MIN_ABSOLUTE[suffix]:
+            continue
+        change = (new - old) / abs(old)
+        if sign * change > threshold:
+            regressions.append((metric, old, new, change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=0.2, help="relative change counted as a regression")
+    args = parser.parse_args()
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    regressions = compare(baseline, current, args.threshold)
+    for metric, old, new, change in sorted(regressions, key=lambda r: -abs(r[3])):
+        print(f"❌ {metric}: {old} -> {new} ({change:+.0%})")
+    if not regressions:
+        print(f"✅ No regression over {args.threshold:.0%}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
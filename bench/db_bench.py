@@ -0,0 +1,202 @@
+"""Times every data function of service/db/database.py and every database_agent tool at several data sizes.
+
+For each size a fresh database is filled with bench.synthetic_data. Each case is then run
+--repeats times, or fewer if it exceeds --case-budget seconds. Reported per case:
+- p50/p95/max latency
+- rows returned and rows/s
+- for tools, the size of the result the model would read, in characters and estimated tokens
+
+    python -m bench.db_bench --sizes 10000 100000 1000000 --output db_bench.json
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import resource
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from bench.synthetic_data import populate
+from service.agents import database_agent
+from service.db import async_database, database
+from service.tokens import estimate_tokens
+
+DEFAULT_SIZES = (10000, 100000, 1000000)
+DEFAULT_REPEATS = 7
+CASE_BUDGET_SECONDS = 10.0
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux (bytes on macOS).
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def summarize(samples: list) -> dict:
+    samples = sorted(samples)
+    return {
+        "runs": len(samples),
+        "p50_ms": round(statistics.median(samples) * 1000, 3),
+        "p95_ms": round(samples[min(int(len(samples) * 0.95), len(samples) - 1)] * 1000, 3),
+        "max_ms": round(samples[-1] * 1000, 3),
+    }
+
+
+def _count_rows(result) -> int:
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, dict):
+        for key in ("items", "data"):
+            if isinstance(result.get(key), list):
+                return len(result[key])
+            # Tool results encoded as a table (service/agents/result_encoding.py).
+            if isinstance(result.get(key), dict) and isinstance(result[key].get("rows"), list):
+                return len(result[key]["rows"])
+    return 1 if result is not None else 0
+
+
+def _date_range(days: int) -> tuple:
+    today = datetime.utcnow().date()
+    return (today - timedelta(days=days)).isoformat(), today.isoformat()
+
+
+def database_cases(start: str, end: str) -> list:
+    """(name, function) pairs covering the public data functions; writes add a little data as they go."""
+    def second_page():
+        cursor = database.get_transactions_page()["next_cursor"]
+        return database.get_transactions_page(cursor=cursor)
+
+    return [
+        ("get_data_version", database.get_data_version),
+        ("get_all_goals", database.get_all_goals),
+        ("get_all_transactions", database.get_all_transactions),
+        ("get_transactions_by_type", lambda: database.get_transactions_by_type('expense')),
+        ("get_all_investments", database.get_all_investments),
+        ("get_transaction_totals_by_date_range", lambda: database.get_transaction_totals_by_date_range(start, end)),
+        ("get_transaction_totals_from_history", lambda: database.get_transaction_totals_from_history(start, end)),
+        ("get_category_totals", lambda: database.get_category_totals(start, end)),
+        ("get_category_totals[food]", lambda: database.get_category_totals(start, end, category='food')),
+        ("get_transactions_page", database.get_transactions_page),
+        ("get_transactions_page[second]", second_page),
+        ("get_transactions_page[expense,range]",
+         lambda: database.get_transactions_page(transaction_type='expense', start_date=start, end_date=end)),
+        ("get_investments_page", database.get_investments_page),
+        ("iter_transactions", lambda: list(database.iter_transactions())),
+        ("iter_investments", lambda: list(database.iter_investments())),
+        ("get_profile_snapshot", database.get_profile_snapshot),
+        ("add_transaction", lambda: database.add_transaction('expense', 12.5)),
+        ("add_transactions[1000]", lambda: database.add_transactions(
+            [('expense', 3.0 + i % 50, None) for i in range(1000)])),
+        ("add_goal", lambda: database.add_goal('Bench goal', end, 1000)),
+        ("add_investment", lambda: database.add_investment(0.01, 'BTC', 45000.0)),
+        ("rebuild_aggregates", database.rebuild_aggregates),
+    ]
+
+
+def tool_cases(start: str, end: str) -> list:
+    batch = [{"type": "expense", "amount": 4.5, "created_at": end} for _ in range(100)]
+    return [
+        ("AddNewTransaction", lambda: database_agent.AddNewTransaction('expense', 9.99)),
+        ("AddNewTransactions[100]", lambda: database_agent.AddNewTransactions(batch)),
+        ("GetAllTransactions", lambda: database_agent.GetAllTransactions()),
+        ("GetTransactionsByType", lambda: database_agent.GetTransactionsByType('expense')),
+        ("GetTransactionTotalsByDateRange", lambda: database_agent.GetTransactionTotalsByDateRange(start, end)),
+        ("GetCategoryTotals", lambda: database_agent.GetCategoryTotals(start_date=start, end_date=end)),
+        ("AddNewGoal", lambda: database_agent.AddNewGoal('Bench goal', end, 5000)),
+        ("GetAllGoals", lambda: database_agent.GetAllGoals()),
+        ("AddNewInvestment", lambda: database_agent.AddNewInvestment(0.5, 'ETH', 2500.0)),
+        ("GetAllInvestments", lambda: database_agent.GetAllInvestments()),
+        ("GoalAndInvestment", lambda: database_agent.GoalAndInvestment()),
+        ("GetCashflowAnalytics", lambda: database_agent.GetCashflowAnalytics()),
+        ("GetGoalProjections", lambda: database_agent.GetGoalProjections()),
+    ]
+
+
+def time_case(func, repeats: int, budget: float) -> tuple:
+    samples, result = [], None
+    spent = 0.0
+    while len(samples) < repeats and (not samples or spent < budget):
+        started = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - started
+        samples.append(elapsed)
+        spent += elapsed
+    return samples, result
+
+
+async def time_tool(func, repeats: int, budget: float) -> tuple:
+    samples, result = [], None
+    spent = 0.0
+    while len(samples) < repeats and (not samples or spent < budget):
+        started = time.perf_counter()
+        result = await func()
+        elapsed = time.perf_counter() - started
+        samples.append(elapsed)
+        spent += elapsed
+    return samples, result
+
+
+def bench_size(path: str, size: int, repeats: int, budget: float, seed: int) -> dict:
+    report = {"size": size, "populate": populate(path, size, seed=seed), "functions": {}, "tools": {}}
+    start, end = _date_range(365)
+    with database.use_database(path):
+        # get_all_transactions prints every row; that cost is measured, the output is not wanted.
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            for name, func in database_cases(start, end):
+                samples, result = time_case(func, repeats, budget)
+                stats = summarize(samples)
+                rows = _count_rows(result)
+                stats["rows"] = rows
+                stats["rows_per_s"] = round(rows / statistics.median(samples)) if rows > 1 else None
+                report["functions"][name] = stats
+
+        async def run_tools():
+            try:
+                for name, func in tool_cases(start, end):
+                    samples, result = await time_tool(func, repeats, budget)
+                    text = json.dumps(result, default=str)
+                    report["tools"][name] = {**summarize(samples), "status": result.get("status"),
+                                             "rows": _count_rows(result), "result_chars": len(text),
+                                             "result_tokens_est": estimate_tokens(text)}
+            finally:
+                async_database.shutdown_executor()
+
+        asyncio.run(run_tools())
+    report["peak_rss_mb"] = peak_rss_mb()
+    return report
+
+
+def run(sizes, repeats: int, budget: float, seed: int, directory: str = None) -> dict:
+    results = {"benchmark": "db", "started_at": datetime.utcnow().isoformat(timespec='seconds'),
+               "repeats": repeats, "sizes": []}
+    with tempfile.TemporaryDirectory(dir=directory) as workdir:
+        for size in sizes:
+            path = os.path.join(workdir, f'bench_{size}.db')
+            results["sizes"].append(bench_size(path, size, repeats, budget, seed))
+            database.close_all_pools()
+    results["peak_rss_mb"] = peak_rss_mb()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="transaction rows")
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS)
+    parser.add_argument("--case-budget", type=float, default=CASE_BUDGET_SECONDS,
+                        help="stop repeating a case after this many seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--directory", default=None, help="where to create the temporary databases")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    args = parser.parse_args()
+    results = run(args.sizes, args.repeats, args.case_budget, args.seed, args.directory)
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
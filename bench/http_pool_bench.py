@@ -0,0 +1,144 @@
+"""Model requests of concurrent agent turns against a fake Gemini endpoint, with ADK's default HTTP settings and with the pooled ones.
+
+FakeGeminiEndpoint is a local HTTP/1.1 server answering every generateContent request with a
+fixed response after --latency-ms. Each new connection first costs --setup-ms, standing for the
+TCP and TLS handshakes with the real endpoint. --users users run --turns turns at the same time,
+each turn making the model calls of an advice or bookkeeping turn in order (root, then the agents
+it hands over to, then root again) and then waiting --idle-ms for the user's next message. Every
+call goes through the one Gemini object all agents share (registry.get_model()), built in two
+modes:
+- default: Gemini as the tree built it before model_client, with google-genai's default httpx
+  settings (idle connections are dropped after 5 seconds)
+- pooled: the same Gemini with model_client.use_pool()
+The report gives, per mode, the connections the endpoint accepted, the most open at once, the
+total time and model call latency percentiles.
+
+    python -m bench.http_pool_bench --users 8 --turns 3 --idle-ms 6000 --output http_pool.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from bench.db_bench import summarize
+from service.agents import model_client
+from service.agents.registry import DEFAULT_MODEL, get_retry_config
+
+# The model calls of a turn, by agent; they all go through the same shared model.
+TURNS = (
+    ("Financial_Assistant", "market_data_agent", "final_adviser", "Financial_Assistant"),
+    ("Financial_Assistant", "root_database_agent", "root_database_agent", "Financial_Assistant"),
+)
+RESPONSE = json.dumps({
+    "candidates": [{"content": {"role": "model", "parts": [{"text": "ok"}]}, "finishReason": "STOP", "index": 0}],
+    "usageMetadata": {"promptTokenCount": 10, "candidatesTokenCount": 1, "totalTokenCount": 11},
+}).encode()
+
+
+class FakeGeminiEndpoint:
+    """Answers any POST with RESPONSE over keep-alive connections and counts the connections."""
+
+    def __init__(self, setup: float, latency: float):
+        self.setup = setup
+        self.latency = latency
+        self.stats = {"connections": 0, "max_open": 0, "requests": 0}
+        self._open = 0
+        self._server = None
+
+    async def start(self) -> str:
+        self._server = await asyncio.start_server(self._handle, '127.0.0.1', 0)
+        host, port = self._server.sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}/"
+
+    async def close(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.stats["connections"] += 1
+        self._open += 1
+        self.stats["max_open"] = max(self.stats["max_open"], self._open)
+        try:
+            await asyncio.sleep(self.setup)
+            while True:
+                head = await reader.readuntil(b'\r\n\r\n')
+                headers = {}
+                for line in head.decode('latin-1').split('\r\n')[1:]:
+                    name, _, value = line.partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get('content-length') or 0)
+                if length:
+                    await reader.readexactly(length)
+                self.stats["requests"] += 1
+                await asyncio.sleep(self.latency)
+                writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n'
+                             b'Content-Length: %d\r\nConnection: keep-alive\r\n\r\n' % len(RESPONSE) + RESPONSE)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._open -= 1
+            writer.close()
+
+
+async def run_mode(mode: str, args) -> dict:
+    from google.adk.models import Gemini
+
+    endpoint = FakeGeminiEndpoint(args.setup_ms / 1000, args.latency_ms / 1000)
+    url = await endpoint.start()
+    model = Gemini(model=DEFAULT_MODEL, retry_options=get_retry_config(), base_url=url)
+    if mode == "pooled":
+        model_client.use_pool(model)
+    latencies = []
+
+    async def user(index: int):
+        for number in range(args.turns):
+            if number:
+                await asyncio.sleep(args.idle_ms / 1000)
+            for _agent in TURNS[(index + number) % len(TURNS)]:
+                started = time.perf_counter()
+                await model.api_client.aio.models.generate_content(model=DEFAULT_MODEL, contents="hello")
+                latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(user(index) for index in range(args.users)))
+    total = time.perf_counter() - started - (args.turns - 1) * args.idle_ms / 1000
+    await model.api_client.aio.aclose()
+    await endpoint.close()
+    return {
+        "mode": mode,
+        "busy_s": round(total, 3),
+        **endpoint.stats,
+        "latency": summarize(latencies),
+    }
+
+
+async def run(args) -> dict:
+    # google-genai wants a key even for a local endpoint.
+    os.environ.setdefault("GOOGLE_API_KEY", "bench")
+    results = {"benchmark": "http_pool", "users": args.users, "turns": args.turns, "idle_ms": args.idle_ms,
+               "setup_ms": args.setup_ms, "latency_ms": args.latency_ms, "pool": model_client.stats()}
+    results["modes"] = [await run_mode(mode, args) for mode in ("default", "pooled")]
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--users", type=int, default=8, help="users running turns at the same time")
+    parser.add_argument("--turns", type=int, default=3, help="turns per user")
+    parser.add_argument("--idle-ms", type=float, default=6000.0, help="time a user waits between turns")
+    parser.add_argument("--setup-ms", type=float, default=80.0, help="cost of opening a connection")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="time the endpoint takes per request")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    args = parser.parse_args()
+    results = asyncio.run(run(args))
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
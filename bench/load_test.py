@@ -0,0 +1,113 @@
+"""Load test for server.py: many simulated users chatting at once.
+
+Each user opens its own connection and sends a mix of bookkeeping messages (answered by the
+fast-path router), repeated questions (response cache) and free-form questions (agent tree),
+keeping up to --pipeline requests in flight. Reports latency percentiles per source,
+throughput, and how many requests were refused for backpressure.
+
+    python server.py --stub-model --stub-mcp --user-data-dir /tmp/load_users &
+    python -m bench.load_test --users 50 --messages 20
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import statistics
+import time
+
+MESSAGES = (
+    "spent 12.50 on lunch",
+    "show my goals",
+    "how much did I spend this month",
+    "got paid 2500 from salary",
+    "How am I doing on my savings goals overall?",
+    "Should I put more money into my investments this year?",
+    "show my last transactions",
+    "What would you suggest to reduce my monthly expenses?",
+)
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(int(len(values) * fraction), len(values) - 1)], 1)
+
+
+async def run_user(host, port, user_id, messages, pipeline, results):
+    reader, writer = await asyncio.open_connection(host, port)
+    sent_at = {}
+    slots = asyncio.Semaphore(pipeline)
+
+    async def receive():
+        for _ in range(messages):
+            line = await reader.readline()
+            if not line:
+                break
+            response = json.loads(line)
+            started = sent_at.pop(response["id"])
+            results.append((response.get("source") or response.get("error"), (time.perf_counter() - started) * 1000))
+            slots.release()
+
+    receiver = asyncio.create_task(receive())
+    try:
+        for i, message in zip(range(messages), itertools.cycle(MESSAGES)):
+            await slots.acquire()
+            sent_at[i] = time.perf_counter()
+            request = {"id": i, "user_id": user_id, "session_id": "load", "message": message}
+            writer.write(json.dumps(request).encode() + b"\n")
+            await writer.drain()
+        await receiver
+    finally:
+        receiver.cancel()
+        writer.close()
+
+
+async def fetch_stats(host, port):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(b'{"id": "stats", "op": "stats"}\n')
+    await writer.drain()
+    response = json.loads(await reader.readline())
+    writer.close()
+    return response.get("stats")
+
+
+async def run(host, port, users, messages, pipeline):
+    results = []
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        run_user(host, port, f"load-user-{n}", messages, pipeline, results) for n in range(users)
+    ))
+    elapsed = time.perf_counter() - started
+
+    by_source = {}
+    for source, latency in results:
+        by_source.setdefault(source, []).append(latency)
+    report = {
+        "users": users,
+        "requests": len(results),
+        "elapsed_s": round(elapsed, 3),
+        "requests_per_s": round(len(results) / elapsed, 1) if elapsed else None,
+        "latency_ms": {
+            source: {"count": len(values), "p50": percentile(values, 0.5), "p95": percentile(values, 0.95),
+                     "mean": round(statistics.fmean(values), 1)}
+            for source, values in sorted(by_source.items())
+        },
+        "server": await fetch_stats(host, port),
+    }
+    print(json.dumps(report, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--messages", type=int, default=16, help="messages per user")
+    parser.add_argument("--pipeline", type=int, default=2, help="requests in flight per user")
+    args = parser.parse_args()
+    asyncio.run(run(args.host, args.port, args.users, args.messages, args.pipeline))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Checks the market data cache against the local stub MCP server.
+
+Runs bursts of concurrent identical price lookups and repeated metadata lookups through a
+CachingToolset wrapping an McpToolset connected to bench/stub_mcp_server.py, then compares the
+number of tool calls made by the agent side with the number the server actually executed.
+
+    python -m bench.mcp_cache_check --bursts 5 --concurrency 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+from google.adk.tools.mcp_tool import McpToolset, StdioConnectionParams
+from mcp import StdioServerParameters
+
+from service.market.cache import AsyncTTLCache, CachingToolset, TOOL_TTLS
+
+STUB_SERVER = os.path.join(os.path.dirname(__file__), "stub_mcp_server.py")
+
+
+def stub_toolset() -> McpToolset:
+    return McpToolset(
+        connection_params=StdioConnectionParams(
+            server_params=StdioServerParameters(command=sys.executable, args=[STUB_SERVER]),
+            timeout=30,
+        )
+    )
+
+
+async def run(bursts: int, concurrency: int):
+    toolset = CachingToolset(stub_toolset(), cache=AsyncTTLCache(), ttls=(("get_stub_stats", 0),) + TOOL_TTLS)
+    try:
+        tools = {tool.name: tool for tool in await toolset.get_tools()}
+        requests = 0
+        started = time.perf_counter()
+        for burst in range(bursts):
+            # Same question phrased with different casing/order must hit the same entry.
+            variants = [{"ids": "bitcoin,ethereum", "vs_currencies": "usd"},
+                        {"vs_currencies": "USD", "ids": "Ethereum, Bitcoin"}]
+            await asyncio.gather(*(
+                tools["get_simple_price"].run_async(args=variants[i % 2], tool_context=None)
+                for i in range(concurrency)
+            ))
+            await tools["get_coins_list"].run_async(args={}, tool_context=None)
+            requests += concurrency + 1
+        elapsed = time.perf_counter() - started
+
+        stats = await tools["get_stub_stats"].run_async(args={}, tool_context=None)
+        executed = json.loads(stats["content"][0]["text"])
+        print(json.dumps({
+            "requests": requests,
+            "server_calls": executed,
+            "elapsed_s": round(elapsed, 3),
+            "cache": toolset.cache.stats(),
+        }, indent=2))
+    finally:
+        await toolset.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--bursts", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args(argv)
+    asyncio.run(run(args.bursts, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""Bursts of model requests against a fake endpoint enforcing a quota, with and without the model scheduler.
+
+FakeModelEndpoint accepts --quota requests per --window seconds and answers the rest with a 429
+carrying a RetryInfo delay, like Gemini does. The same burst of requests (a third of them
+background advice, the rest interactive) is sent twice:
+- independent: every request retries on its own, like the old per-model HttpRetryOptions
+  (5 attempts, delays of 1, 7, 49... minutes-scaled seconds)
+- scheduler: every request goes through a ModelScheduler sized for the quota
+Time is compressed: --window seconds stand for one minute, and the retry delays shrink to match.
+The report gives, per mode, the 429s the endpoint returned, failed requests, the total time and
+latency percentiles per priority.
+
+    python -m bench.rate_limit_bench --requests 200 --quota 30 --window 1 --output rate_limit.json
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import deque
+
+from bench.db_bench import summarize
+from service.agents.model_scheduler import BACKGROUND, INTERACTIVE, PRIORITY_NAMES, ModelScheduler
+
+# The old google-genai retry settings of registry.get_retry_config.
+OLD_RETRY_ATTEMPTS = 5
+OLD_RETRY_EXP_BASE = 7
+OLD_RETRY_INITIAL_DELAY = 1
+OLD_RETRY_MAX_DELAY = 60
+
+
+class FakeQuotaError(Exception):
+    """Shaped like google-genai's APIError for a 429: a `code` and the JSON error `details`."""
+
+    def __init__(self, retry_delay: float):
+        super().__init__(f"429 RESOURCE_EXHAUSTED (retry in {retry_delay:.2f}s)")
+        self.code = 429
+        self.details = {"error": {"code": 429, "status": "RESOURCE_EXHAUSTED", "details": [
+            {"@type": "type.googleapis.com/google.rpc.RetryInfo", "retryDelay": f"{retry_delay:.3f}s"}]}}
+
+
+class FakeModelEndpoint:
+    """Serves at most `quota` requests per sliding `window` seconds, each taking `latency` seconds."""
+
+    def __init__(self, quota: int, window: float, latency: float):
+        self.quota = quota
+        self.window = window
+        self.latency = latency
+        self._accepted = deque()
+        self.stats = {"requests": 0, "rejected": 0}
+
+    async def generate(self) -> str:
+        now = time.monotonic()
+        while self._accepted and self._accepted[0] <= now - self.window:
+            self._accepted.popleft()
+        self.stats["requests"] += 1
+        if len(self._accepted) >= self.quota:
+            self.stats["rejected"] += 1
+            raise FakeQuotaError(self._accepted[0] + self.window - now)
+        self._accepted.append(now)
+        await asyncio.sleep(self.latency)
+        return "ok"
+
+
+async def independent_call(endpoint: FakeModelEndpoint, scale: float):
+    """One request retrying on its own with exponential backoff, as every Gemini instance used to."""
+    for attempt in range(OLD_RETRY_ATTEMPTS):
+        try:
+            return await endpoint.generate()
+        except FakeQuotaError:
+            if attempt == OLD_RETRY_ATTEMPTS - 1:
+                raise
+            delay = min(OLD_RETRY_INITIAL_DELAY * OLD_RETRY_EXP_BASE ** attempt, OLD_RETRY_MAX_DELAY)
+            await asyncio.sleep((delay + random.uniform(0, 1)) * scale)
+
+
+async def run_mode(mode: str, args) -> dict:
+    endpoint = FakeModelEndpoint(args.quota, args.window, args.latency)
+    scale = args.window / 60
+    scheduler = ModelScheduler(rpm=args.quota * 60 / args.window * args.rpm_factor, tpm=0,
+                               max_concurrent=args.concurrency, base_backoff=scale, max_backoff=60 * scale,
+                               burst=args.quota)
+    latencies = {priority: [] for priority in PRIORITY_NAMES}
+    failures = 0
+
+    async def request(priority: int):
+        nonlocal failures
+        started = time.perf_counter()
+        try:
+            if mode == "scheduler":
+                await scheduler.call(endpoint.generate, priority)
+            else:
+                await independent_call(endpoint, scale)
+        except FakeQuotaError:
+            failures += 1
+        else:
+            latencies[priority].append(time.perf_counter() - started)
+
+    priorities = [BACKGROUND if i % 3 == 0 else INTERACTIVE for i in range(args.requests)]
+    started = time.perf_counter()
+    await asyncio.gather(*(request(priority) for priority in priorities))
+    result = {
+        "mode": mode,
+        "total_s": round(time.perf_counter() - started, 3),
+        "endpoint_requests": endpoint.stats["requests"],
+        "rejected_429": endpoint.stats["rejected"],
+        "failed": failures,
+        "latency": {PRIORITY_NAMES[priority]: summarize(samples) for priority, samples in latencies.items() if samples},
+    }
+    if mode == "scheduler":
+        result["scheduler"] = scheduler.stats()
+    return result
+
+
+async def run(args) -> dict:
+    random.seed(args.seed)
+    results = {"benchmark": "rate_limit", "requests": args.requests, "quota": args.quota, "window_s": args.window,
+               "latency_s": args.latency, "rpm_factor": args.rpm_factor}
+    results["modes"] = [await run_mode(mode, args) for mode in ("independent", "scheduler")]
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=200, help="requests sent at once")
+    parser.add_argument("--quota", type=int, default=30, help="requests the endpoint accepts per window")
+    parser.add_argument("--window", type=float, default=1.0, help="seconds standing for one minute of quota")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds the endpoint takes per request")
+    parser.add_argument("--concurrency", type=int, default=8, help="the scheduler's concurrency cap")
+    parser.add_argument("--rpm-factor", type=float, default=1.0,
+                        help="scheduler rate relative to the quota; above 1 tests adapting to 429s")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the JSON report to this file")
+    args = parser.parse_args()
+    results = asyncio.run(run(args))
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
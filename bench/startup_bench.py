@@ -0,0 +1,112 @@
+"""Measures import time and first-use cost of the agent modules, and guards against import-time work.
+
+Each module is imported in a fresh interpreter several times. The run fails (exit code 1) if an
+import prints anything, builds an agent/model/toolset, pulls in google.adk, the MCP client or NumPy
+before first use, or takes longer than its budget.
+
+    python -m bench.startup_bench --runs 5 --output startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Module -> import-time budget in seconds, in a fresh interpreter.
+IMPORT_BUDGETS = {
+    "service.db.database": 0.25,
+    "service.db.async_database": 0.3,
+    "service.agents.registry": 0.25,
+    "service.agents.database_agent": 0.3,
+    "service.agents.market_data_agent": 0.3,
+    "service.agents.adviser_agent": 0.3,
+    "service.agents.root_agent": 0.3,
+}
+# Heavy dependencies that must only be loaded when an agent is first built.
+LAZY_DEPENDENCIES = ("google.adk", "google.genai", "mcp", "numpy")
+
+_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+from service.agents import registry
+loaded = sorted(name for name in {lazy!r} if name in sys.modules)
+print(json.dumps({{"seconds": elapsed, "loaded": loaded, "built": registry.build_times()}}))
+"""
+
+_FIRST_USE = """
+import json, time
+started = time.perf_counter()
+from service.agents.root_agent import get_root_agent
+get_root_agent()
+from service.agents import registry
+print(json.dumps({"seconds": time.perf_counter() - started, "built": registry.build_times()}))
+"""
+
+
+def _run(code: str) -> tuple:
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr else "probe failed")
+    *printed, last = result.stdout.strip().splitlines()
+    return json.loads(last), printed
+
+
+def measure_imports(runs: int) -> dict:
+    report = {}
+    for module, budget in IMPORT_BUDGETS.items():
+        samples, problems = [], []
+        for _ in range(runs):
+            data, printed = _run(_PROBE.format(module=module, lazy=LAZY_DEPENDENCIES))
+            samples.append(data["seconds"])
+            if printed:
+                problems.append(f"printed at import: {printed[0]!r}")
+            if data["loaded"]:
+                problems.append(f"imported {', '.join(data['loaded'])} eagerly")
+            if data["built"]:
+                problems.append(f"built {', '.join(data['built'])} at import")
+        median = statistics.median(samples)
+        if median > budget:
+            problems.append(f"median import {median:.3f}s over budget {budget:.3f}s")
+        report[module] = {"median_s": round(median, 4), "max_s": round(max(samples), 4), "budget_s": budget,
+                          "problems": sorted(set(problems))}
+    return report
+
+
+def measure_first_use() -> dict:
+    """Cost of building the whole agent tree once (needs the ADK dependencies installed)."""
+    try:
+        data, _ = _run(_FIRST_USE)
+    except RuntimeError as e:
+        return {"error": str(e)}
+    return {"seconds": round(data["seconds"], 4), "built": {k: round(v, 4) for k, v in data["built"].items()}}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--skip-first-use", action="store_true", help="only measure imports")
+    args = parser.parse_args(argv)
+
+    report = {"imports": measure_imports(args.runs)}
+    if not args.skip_first_use:
+        report["first_use"] = measure_first_use()
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    print(text)
+
+    failures = {module: r["problems"] for module, r in report["imports"].items() if r["problems"]}
+    for module, problems in failures.items():
+        print(f"❌ {module}: {'; '.join(problems)}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""A local stand-in for the CoinGecko MCP server, speaking MCP over stdio.
+
+It answers the market tools the agents use with deterministic fake data after an artificial
+delay (STUB_MCP_LATENCY seconds, default 0.2) and counts how often each tool was really called,
+which `get_stub_stats` reports. Point an McpToolset at it with
+`StdioServerParameters(command=sys.executable, args=['bench/stub_mcp_server.py'])`.
+"""
+import os
+import time
+import zlib
+from collections import Counter
+
+from mcp.server.fastmcp import FastMCP
+
+LATENCY = float(os.getenv("STUB_MCP_LATENCY", "0.2"))
+
+server = FastMCP("coingecko-stub")
+calls = Counter()
+
+COINS = [
+    {"id": "bitcoin", "symbol": "btc", "name": "Bitcoin"},
+    {"id": "ethereum", "symbol": "eth", "name": "Ethereum"},
+    {"id": "solana", "symbol": "sol", "name": "Solana"},
+    {"id": "tether", "symbol": "usdt", "name": "Tether"},
+    {"id": "binancecoin", "symbol": "bnb", "name": "BNB"},
+    {"id": "ripple", "symbol": "xrp", "name": "XRP"},
+    {"id": "pax-gold", "symbol": "paxg", "name": "PAX Gold"},
+]
+
+
+def _price(coin_id: str) -> float:
+    # Stable pseudo-price per coin so repeated runs are comparable.
+    return round(1 + zlib.crc32(coin_id.encode()) % 100000 / 3.0, 2)
+
+
+def _called(name: str):
+    calls[name] += 1
+    time.sleep(LATENCY)
+
+
+@server.tool()
+def get_simple_price(ids: str, vs_currencies: str = "usd") -> dict:
+    """Get the current price of coins by their CoinGecko ids."""
+    _called("get_simple_price")
+    currencies = [c.strip() for c in vs_currencies.split(",") if c.strip()]
+    return {coin_id.strip(): {c: _price(coin_id.strip()) for c in currencies}
+            for coin_id in ids.split(",") if coin_id.strip()}
+
+
+@server.tool()
+def get_coins_markets(vs_currency: str = "usd", per_page: int = 10) -> list:
+    """Get market data (price, market cap, 24h change) for the top coins."""
+    _called("get_coins_markets")
+    return [{**coin, "current_price": _price(coin["id"]), "market_cap_rank": rank,
+             "price_change_percentage_24h": round((zlib.crc32(coin["id"].encode()) % 2000 - 1000) / 100, 2)}
+            for rank, coin in enumerate(COINS[:per_page], start=1)]
+
+
+@server.tool()
+def get_coins_list() -> list:
+    """List every supported coin with its id, symbol and name."""
+    _called("get_coins_list")
+    return COINS
+
+
+@server.tool()
+def get_search_trending() -> dict:
+    """Trending coins; listed before get_search so that a tool lookup by pattern would pick it."""
+    _called("get_search_trending")
+    return {"coins": [{"item": {"id": coin["id"], "symbol": coin["symbol"], "name": coin["name"]}}
+                      for coin in COINS[:3]]}
+
+
+@server.tool()
+def get_search(query: str) -> dict:
+    """Search coins by name or symbol."""
+    _called("get_search")
+    query = query.strip().lower()
+    return {"coins": [coin for coin in COINS if query in (coin["id"], coin["symbol"], coin["name"].lower())]}
+
+
+@server.tool()
+def get_stub_stats() -> dict:
+    """Number of times each tool was actually executed by this stub."""
+    return dict(calls)
+
+
+if __name__ == "__main__":
+    server.run()
@@ -0,0 +1,142 @@
+"""Synthetic financial data for benchmarks.
+
+Generates deterministic (seeded) histories with realistic shapes: a monthly salary plus occasional
+side income, many small log-normally distributed expenses spread over the last few years, a
+handful of goals and investment lots concentrated in a few assets. Rows are streamed into the
+database through the regular bulk insert path, so millions of rows never sit in memory.
+
+    python -m bench.synthetic_data --users 3 --transactions 1000000 --directory bench_data
+"""
+import argparse
+import json
+import math
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+from service.db import database
+
+DEFAULT_YEARS = 3
+EXPENSE_MU, EXPENSE_SIGMA = 3.2, 1.0  # median expense about 25
+SALARY_MEAN, SALARY_SD = 4200, 900
+SIDE_INCOME_SHARE = 0.02
+GOAL_NOTES = ("Emergency fund", "New car", "House deposit", "Vacation", "Wedding", "Retirement top-up",
+              "New laptop", "Education fund")
+ASSETS = (("BTC", 0.30, 45000), ("ETH", 0.20, 2500), ("Gold", 0.15, 1900), ("S&P 500 ETF", 0.20, 450),
+          ("SOL", 0.08, 90), ("AAPL", 0.07, 180))
+EXPENSE_CATEGORIES = (("groceries", 0.30), ("food", 0.20), ("transport", 0.15), ("shopping", 0.12),
+                      ("bills", 0.08), ("entertainment", 0.08), ("health", 0.04), ("travel", 0.03))
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def generate_transactions(count: int, seed: int = 0, years: float = DEFAULT_YEARS, end: datetime = None):
+    """Yields `count` (type, amount, created_at, category) tuples in chronological order, ending at `end` (default now)."""
+    rng = random.Random(seed)
+    # Categories come from a generator of their own, so amounts and times match those of earlier runs.
+    category_rng = random.Random(seed + 1)
+    names, weights = zip(*EXPENSE_CATEGORIES)
+    end = end or datetime.utcnow().replace(microsecond=0)
+    start = end - timedelta(days=365 * years)
+    span = (end - start).total_seconds()
+    months = max(int(years * 12), 1)
+    salaries = min(months, count)
+    others = count - salaries
+    salary_every = others / salaries if salaries else 0
+    gap = span / max(count, 1)
+    at = start
+    produced_salaries, produced_others = 0, 0
+    while produced_salaries + produced_others < count:
+        at += timedelta(seconds=rng.expovariate(1 / gap))
+        if at > end:
+            at = end
+        if produced_salaries < salaries and produced_others >= produced_salaries * salary_every:
+            produced_salaries += 1
+            amount = max(round(rng.gauss(SALARY_MEAN, SALARY_SD), 2), 500.0)
+            yield 'income', amount, at.strftime(TIMESTAMP_FORMAT), 'salary'
+            continue
+        produced_others += 1
+        if rng.random() < SIDE_INCOME_SHARE:
+            yield 'income', round(rng.lognormvariate(5.5, 0.8), 2), at.strftime(TIMESTAMP_FORMAT), 'side income'
+        else:
+            yield ('expense', round(min(rng.lognormvariate(EXPENSE_MU, EXPENSE_SIGMA), 20000), 2),
+                   at.strftime(TIMESTAMP_FORMAT), category_rng.choices(names, weights)[0])
+
+
+def generate_goals(count: int, seed: int = 0, today: datetime = None) -> list:
+    """Returns `count` (note, date_target, money_target) tuples with targets 6 months to 5 years ahead."""
+    rng = random.Random(seed + 1)
+    today = today or datetime.utcnow()
+    goals = []
+    for index in range(count):
+        note = GOAL_NOTES[index % len(GOAL_NOTES)]
+        target_date = today + timedelta(days=rng.randint(180, 5 * 365))
+        goals.append((note, target_date.strftime('%Y-%m-%d'), int(round(rng.lognormvariate(9, 0.9), -2)) or 100))
+    return goals
+
+
+def generate_investments(count: int, seed: int = 0, years: float = DEFAULT_YEARS, end: datetime = None):
+    """Yields `count` (amount, title, price, created_at) lots, most of them in a few popular assets."""
+    rng = random.Random(seed + 2)
+    end = end or datetime.utcnow().replace(microsecond=0)
+    span = 365 * years * 86400
+    titles = [title for title, _, _ in ASSETS]
+    weights = [weight for _, weight, _ in ASSETS]
+    base_prices = {title: price for title, _, price in ASSETS}
+    for _ in range(count):
+        title = rng.choices(titles, weights)[0]
+        price = round(base_prices[title] * math.exp(rng.gauss(0, 0.35)), 2)
+        spend = rng.lognormvariate(6, 1)
+        created_at = end - timedelta(seconds=rng.uniform(0, span))
+        yield round(spend / price, 6), title, price, created_at.strftime(TIMESTAMP_FORMAT)
+
+
+def populate(path: str, transactions: int, goals: int = 5, investments: int = None, seed: int = 0) -> dict:
+    """Creates (or extends) the database at `path` with synthetic data; returns counts and timings."""
+    investments = investments if investments is not None else max(transactions // 200, 10)
+    with database.use_database(path):
+        database.init_db(verbose=False)
+        started = time.perf_counter()
+        inserted = database.add_transactions(generate_transactions(transactions, seed))
+        transactions_seconds = time.perf_counter() - started
+        with database.get_db_transaction() as conn:
+            conn.executemany('INSERT INTO goal (note, date_target, money_target) VALUES (?, ?, ?)',
+                             generate_goals(goals, seed))
+        database.add_investments(generate_investments(investments, seed))
+    return {
+        "database": path,
+        "transactions": inserted,
+        "goals": goals,
+        "investments": investments,
+        "insert_seconds": round(transactions_seconds, 3),
+        "insert_rows_per_s": round(inserted / transactions_seconds) if transactions_seconds else None,
+    }
+
+
+def populate_users(users: int, transactions: int, directory: str, seed: int = 0, **kwargs) -> list:
+    """Gives `users` users (bench-user-0, ...) a per-user database with `transactions` rows each."""
+    os.makedirs(directory, exist_ok=True)
+    return [
+        populate(database.user_database_path(f'bench-user-{index}', directory), transactions, seed=seed + index,
+                 **kwargs)
+        for index in range(users)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--users", type=int, default=1)
+    parser.add_argument("--transactions", type=int, default=100000, help="transactions per user")
+    parser.add_argument("--goals", type=int, default=5, help="goals per user")
+    parser.add_argument("--investments", type=int, default=None, help="investment lots per user")
+    parser.add_argument("--directory", default="bench_data")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    results = populate_users(args.users, args.transactions, args.directory, seed=args.seed, goals=args.goals,
+                             investments=args.investments)
+    database.close_all_pools()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""Multi-user server mode: many conversations at once over a JSON-lines TCP protocol.
+
+Each request is one line of JSON, each reply one line of JSON with the same "id":
+
+    {"id": 1, "user_id": "alice", "session_id": "s1", "message": "spent 12 on lunch"}
+    {"id": 1, "ok": true, "reply": "...", "source": "router", "route": "add_expense", "latency_ms": 3.1}
+
+    {"id": 2, "op": "stats"}  -> {"id": 2, "ok": true, "stats": {...}}
+
+With tracing enabled (--trace-file, or ASSISTANT_TRACE=1), replies also carry a "trace" summary.
+Errors come back as {"id": ..., "ok": false, "error": "busy" | "bad_request" | "internal", "detail": ...}.
+Every user gets a database file of their own (user_data/ by default); conversations are kept in
+sessions.db and compacted as they grow. Requests on one connection
+are processed concurrently up to a limit; past it the server stops reading from the socket, so a
+client sending faster than it is served is slowed down by TCP instead of queueing unboundedly.
+
+    python server.py --port 8765
+    python server.py --stub-model --stub-mcp     # offline, for load tests (see bench/load_test.py)
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+from dotenv import load_dotenv
+
+from service.agents.assistant import (
+    MAX_CONCURRENT_TURNS, MAX_PENDING_PER_USER, DEFAULT_SESSION_ID, Assistant, AssistantBusy,
+)
+from service.agents.registry import MODEL_BACKEND_ENV
+from service.db.async_database import shutdown_executor
+from service.db.database import USER_DATABASE_DIR, close_all_pools
+from service.db.response_cache import ResponseCache
+from service.db.session_store import SESSION_DB
+from service.tracing import tracer
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+MAX_REQUEST_BYTES = 64 * 1024
+MAX_IN_FLIGHT_PER_CONNECTION = 8
+APP_NAME = 'financial_assistant'
+STUB_MCP_SERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench', 'stub_mcp_server.py')
+
+
+class AssistantServer:
+    def __init__(self, assistant: Assistant, max_in_flight: int = MAX_IN_FLIGHT_PER_CONNECTION):
+        self.assistant = assistant
+        self.max_in_flight = max_in_flight
+        self.connections = 0
+
+    async def _process(self, request: dict) -> dict:
+        if request.get('op') == 'stats':
+            return {"ok": True, "stats": self.assistant.stats()}
+        if request.get('op') == 'ping':
+            return {"ok": True}
+        user_id, message = request.get('user_id'), request.get('message')
+        if not isinstance(user_id, str) or not user_id or not isinstance(message, str) or not message.strip():
+            return {"ok": False, "error": "bad_request", "detail": "'user_id' and 'message' are required strings"}
+        session_id = str(request.get('session_id') or DEFAULT_SESSION_ID)
+        try:
+            reply = await self.assistant.handle(message, user_id=user_id, session_id=session_id)
+        except AssistantBusy as e:
+            return {"ok": False, "error": "busy", "detail": str(e)}
+        except Exception as e:
+            print(f"⚠️ Turn failed for user '{user_id}': {e}")
+            return {"ok": False, "error": "internal", "detail": str(e)}
+        response = {"ok": True, "reply": reply.text, "source": reply.source, "route": reply.route,
+                    "latency_ms": round(reply.latency_ms, 1)}
+        if reply.trace:
+            response["trace"] = reply.trace
+        return response
+
+    async def _respond(self, line: bytes, writer: asyncio.StreamWriter, write_lock: asyncio.Lock,
+                       in_flight: asyncio.Semaphore):
+        try:
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise ValueError("a request must be a JSON object")
+            except ValueError as e:
+                request, response = {}, {"ok": False, "error": "bad_request", "detail": str(e)}
+            else:
+                response = await self._process(request)
+            payload = json.dumps({"id": request.get('id'), **response}, default=str).encode() + b'\n'
+            async with write_lock:
+                writer.write(payload)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            in_flight.release()
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        write_lock = asyncio.Lock()
+        in_flight = asyncio.Semaphore(self.max_in_flight)
+        tasks = set()
+        try:
+            while True:
+                # Don't read the next request until one of this connection's slots is free.
+                await in_flight.acquire()
+                try:
+                    line = await reader.readline()
+                except (ValueError, ConnectionError):  # line over MAX_REQUEST_BYTES, or reset
+                    in_flight.release()
+                    break
+                if not line:
+                    in_flight.release()
+                    break
+                if not line.strip():
+                    in_flight.release()
+                    continue
+                task = asyncio.create_task(self._respond(line, writer, write_lock, in_flight))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            # Answer what was already accepted before closing.
+            await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            for task in tasks:
+                task.cancel()
+            self.connections -= 1
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+
+async def serve(args):
+    load_dotenv()
+    if args.stub_model:
+        os.environ[MODEL_BACKEND_ENV] = 'stub'
+    if args.stub_mcp:
+        os.environ['MARKET_MCP_COMMAND'] = f'"{sys.executable}" "{STUB_MCP_SERVER}"'
+    elif not os.getenv("GOOGLE_API_KEY") and not args.stub_model:
+        print("⚠️ GOOGLE_API_KEY is not set; use --stub-model to run without Gemini.")
+    os.environ.setdefault("GOOGLE_GENAI_USE_VERTEXAI", "FALSE")
+    tracer.configure_from_env()
+    if args.trace_file:
+        tracer.configure(path=args.trace_file)
+
+    from google.adk.runners import Runner
+
+    from service.agents.intent_router import IntentRouter
+    from service.agents.root_agent import get_root_agent
+    from service.agents.session_service import SqliteSessionService
+    from service.agents.tracing_plugin import tracing_plugins
+    from service.db.session_store import SessionStore
+    from service.market.sessions import mcp_registry
+
+    server = None
+    try:
+        runner = Runner(app_name=APP_NAME, agent=get_root_agent(),
+                        session_service=SqliteSessionService(SessionStore(args.sessions_db)),
+                        plugins=tracing_plugins())
+        mcp_registry.start()
+        assistant = Assistant(
+            runner,
+            router=IntentRouter(),
+            response_cache=None if args.no_response_cache else ResponseCache(),
+            per_user_databases=True,
+            user_database_dir=args.user_data_dir,
+            max_concurrent_turns=args.max_concurrent_turns,
+            max_pending_per_user=args.max_pending_per_user,
+        )
+        handler = AssistantServer(assistant, max_in_flight=args.max_in_flight)
+        server = await asyncio.start_server(handler.handle_connection, args.host, args.port, limit=MAX_REQUEST_BYTES)
+        print(f"🤖 Financial assistant serving on {args.host}:{args.port} "
+              f"({'stub' if args.stub_model else 'gemini'} model). Ctrl+C to stop.")
+        async with server:
+            await server.serve_forever()
+    finally:
+        if server is not None:
+            server.close()
+        await mcp_registry.close()
+        shutdown_executor()
+        close_all_pools()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--user-data-dir", default=USER_DATABASE_DIR, help="directory of the per-user databases")
+    parser.add_argument("--sessions-db", default=SESSION_DB, help="SQLite file of the conversation sessions")
+    parser.add_argument("--max-concurrent-turns", type=int, default=MAX_CONCURRENT_TURNS)
+    parser.add_argument("--max-pending-per-user", type=int, default=MAX_PENDING_PER_USER)
+    parser.add_argument("--max-in-flight", type=int, default=MAX_IN_FLIGHT_PER_CONNECTION,
+                        help="requests processed at once per connection")
+    parser.add_argument("--no-response-cache", action="store_true")
+    parser.add_argument("--trace-file", help="export the spans of every turn to this OTLP/JSON lines file")
+    parser.add_argument("--stub-model", action="store_true", help="answer with the offline StubLlm instead of Gemini")
+    parser.add_argument("--stub-mcp", action="store_true", help="use bench/stub_mcp_server.py for market data")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        print("\nServer stopped.")
+
+
+if __name__ == '__main__':
+    main()
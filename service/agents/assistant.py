@@ -0,0 +1,195 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from service.agents import model_client
+from service.agents.intent_router import IntentRouter
+from service.agents.registry import get_model_scheduler
+from service.agents.turns import summarize_turn
+from service.db import async_database, database
+from service.db.response_cache import ResponseCache, is_cacheable_prompt
+from service.tracing import summarize_spans, tracer
+
+# One conversation turn, from the user's message to the reply: the fast-path router first,
+# then the response cache, then the agent tree. Shared by the single-user REPL (main.py) and
+# the multi-user server (server.py); in server mode every user works on a database of their own
+# and the number of turns running at once is bounded per user and for the whole process.
+
+DEFAULT_USER_ID = 'user'
+DEFAULT_SESSION_ID = 'default'
+MAX_CONCURRENT_TURNS = 32
+# Turns of the same user run one after the other, so that each one sees the previous one's writes
+# and the conversation history stays in order.
+MAX_TURNS_PER_USER = 1
+# Turns a user may have waiting behind the running one before new ones are refused.
+MAX_PENDING_PER_USER = 4
+# A message this soon after the session's last turn may follow up on it, so its answer is neither
+# taken from nor stored in the response cache.
+FOLLOW_UP_SECONDS = 600
+
+
+class AssistantBusy(Exception):
+    """Raised when a turn is refused because too many are already waiting."""
+
+
+@dataclass
+class Reply:
+    text: str
+    source: str  # 'router', 'cache' or 'agent'
+    route: str
+    latency_ms: float
+    user_id: str = DEFAULT_USER_ID
+    session_id: str = DEFAULT_SESSION_ID
+    trace: Optional[dict] = None  # summarize_spans() of the turn, when tracing is enabled
+
+
+class _UserSlot:
+    def __init__(self, max_turns: int):
+        self.semaphore = asyncio.Semaphore(max_turns)
+        self.pending = 0
+
+
+class Assistant:
+    """Answers messages for any number of users and sessions over one shared runner."""
+
+    def __init__(self, runner, router: IntentRouter = None, response_cache: ResponseCache = None,
+                 per_user_databases: bool = False, user_database_dir: str = database.USER_DATABASE_DIR,
+                 max_concurrent_turns: int = MAX_CONCURRENT_TURNS, max_turns_per_user: int = MAX_TURNS_PER_USER,
+                 max_pending_per_user: int = MAX_PENDING_PER_USER):
+        self.runner = runner
+        self.router = router
+        self.response_cache = response_cache
+        self.per_user_databases = per_user_databases
+        self.user_database_dir = user_database_dir
+        self.max_turns_per_user = max_turns_per_user
+        self.max_pending_per_user = max_pending_per_user
+        self._turns = asyncio.Semaphore(max_concurrent_turns)
+        self._users = {}
+        self._sessions = set()
+        self._stats = {"turns": 0, "router": 0, "cache": 0, "agent": 0, "busy": 0, "errors": 0, "running": 0}
+
+    async def _ensure_session(self, user_id: str, session_id: str):
+        if (user_id, session_id) in self._sessions:
+            return
+        await self._get_session(user_id, session_id)
+
+    async def _get_session(self, user_id: str, session_id: str):
+        service, app_name = self.runner.session_service, self.runner.app_name
+        session = await service.get_session(app_name=app_name, user_id=user_id, session_id=session_id)
+        if session is None:
+            session = await service.create_session(app_name=app_name, user_id=user_id, session_id=session_id)
+        self._sessions.add((user_id, session_id))
+        return session
+
+    def _cache_agent(self, session) -> Optional[str]:
+        """The agent a new message of `session` goes to, or None if the message may follow up on a recent turn."""
+        if session.events and session.events[-1].timestamp > time.time() - FOLLOW_UP_SECONDS:
+            return None
+        return self.runner._find_agent_to_run(session, self.runner.agent).name
+
+    async def _append_cached_turn(self, session, message: str, cached: dict):
+        """Records a turn answered from the cache in the session, as the agents would have."""
+        from google.adk.agents.invocation_context import new_invocation_context_id
+        from google.adk.events import Event
+        from google.genai import types
+
+        invocation_id = new_invocation_context_id()
+        author = cached['route'].split('>')[-1] or self.runner.agent.name
+        for event in (
+            Event(invocation_id=invocation_id, author='user',
+                  content=types.Content(role='user', parts=[types.Part(text=message)])),
+            Event(invocation_id=invocation_id, author=author,
+                  content=types.Content(role='model', parts=[types.Part(text=cached['response'])])),
+        ):
+            await self.runner.session_service.append_event(session, event)
+
+    async def _run_agents(self, message: str, user_id: str, session_id: str):
+        from google.genai import types
+
+        await self._ensure_session(user_id, session_id)
+        content = types.Content(role='user', parts=[types.Part(text=message)])
+        events = [event async for event in self.runner.run_async(
+            user_id=user_id, session_id=session_id, new_message=content)]
+        return summarize_turn(events)
+
+    async def _answer(self, message: str, user_id: str, session_id: str) -> tuple:
+        if self.router is not None:
+            routed = await self.router.route(message)
+            if routed is not None:
+                return routed.reply, 'router', routed.intent
+
+        data_version = await async_database.get_data_version()
+        agent = None
+        if self.response_cache is not None and is_cacheable_prompt(message):
+            session = await self._get_session(user_id, session_id)
+            agent = self._cache_agent(session)
+        if agent is not None:
+            cached = await async_database.run_db(self.response_cache.lookup, message, data_version, user_id, agent)
+            if cached is not None:
+                await self._append_cached_turn(session, message, cached)
+                return cached['response'], 'cache', cached['route']
+
+        turn = await self._run_agents(message, user_id, session_id)
+        # Turns that changed the data (e.g. added an expense) are not worth replaying.
+        if agent is not None and turn.response and await async_database.get_data_version() == data_version:
+            await async_database.run_db(self.response_cache.store, message, turn.response, turn.route,
+                                        data_version, turn.uses_market, user_id, agent)
+        return turn.response, 'agent', turn.route
+
+    async def handle(self, message: str, user_id: str = DEFAULT_USER_ID,
+                     session_id: str = DEFAULT_SESSION_ID) -> Reply:
+        """Answers one message; raises AssistantBusy if the user already has too many turns waiting."""
+        slot = self._users.get(user_id)
+        if slot is None:
+            slot = self._users[user_id] = _UserSlot(self.max_turns_per_user)
+        if slot.pending >= self.max_turns_per_user + self.max_pending_per_user:
+            self._stats["busy"] += 1
+            raise AssistantBusy(f"Too many requests in progress for user '{user_id}'")
+
+        started = time.perf_counter()
+        slot.pending += 1
+        try:
+            with tracer.span('turn', 'turn', root=True, user_id=user_id, session_id=session_id) as turn_span:
+                async with slot.semaphore, self._turns:
+                    if turn_span is not None:
+                        turn_span.set(queued_ms=round((time.perf_counter() - started) * 1000, 3))
+                    self._stats["running"] += 1
+                    try:
+                        if self.per_user_databases:
+                            path = await async_database.ensure_user_database(user_id, self.user_database_dir)
+                            with database.use_database(path):
+                                text, source, route = await self._answer(message, user_id, session_id)
+                        else:
+                            text, source, route = await self._answer(message, user_id, session_id)
+                    finally:
+                        self._stats["running"] -= 1
+                if turn_span is not None:
+                    turn_span.set(source=source, route=route)
+        except Exception:
+            self._stats["errors"] += 1
+            raise
+        finally:
+            slot.pending -= 1
+            if slot.pending == 0:
+                self._users.pop(user_id, None)
+        self._stats["turns"] += 1
+        self._stats[source] += 1
+        trace = summarize_spans(turn_span.spans) if turn_span is not None else None
+        return Reply(text, source, route, (time.perf_counter() - started) * 1000, user_id, session_id, trace)
+
+    def stats(self) -> dict:
+        stats = {**self._stats, "active_users": len(self._users), "sessions": len(self._sessions)}
+        if self.router is not None:
+            stats["router_stats"] = self.router.stats()
+        if self.response_cache is not None:
+            stats["response_cache"] = self.response_cache.stats()
+        if tracer.enabled:
+            stats["tracing"] = tracer.stats()
+        if get_model_scheduler.is_built():
+            stats["model_scheduler"] = get_model_scheduler().stats()
+        stats["model_http"] = model_client.stats()
+        session_stats = getattr(self.runner.session_service, 'stats', None)
+        if session_stats is not None:
+            stats["session_store"] = session_stats()
+        return stats
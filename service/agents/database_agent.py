@@ -1,49 +1,79 @@
 from datetime import datetime
-from google.adk.agents import LlmAgent
-from google.adk.models import Gemini
-from google.genai import types
 
-from service.db.database import add_transaction, get_all_transactions, add_goal, get_all_goals, add_investment, \
-    get_all_investments, get_transaction_totals_by_date_range, get_transactions_by_type
+from service.agents.registry import get_model, lazy_singleton
+from service.agents.result_encoding import TABLE_FORMAT_NOTE, compact_page, compact_result
+from service.db.async_database import add_transaction, add_goal, get_all_goals, add_investment, \
+    get_transaction_totals_by_date_range, get_transactions_page, get_investments_page, get_profile_snapshot, \
+    import_records, get_investment_positions, get_category_totals, run_db
+from service.db.database import DEFAULT_PAGE_SIZE
 
-retry_config = types.HttpRetryOptions(
-            attempts=5,  # Maximum retry attempts
-            exp_base=7,  # Delay multiplier
-            initial_delay=1,
-            http_status_codes=[429, 500, 503, 504],  # Retry on these HTTP errors
-        )
 
-def AddNewTransaction(transaction_type:str,transaction_amount:float)->dict:
+async def AddNewTransaction(transaction_type:str,transaction_amount:float,category:str="")->dict:
     """
     Adds a new transaction (income or expense) to the database.
     Use this when a user wants to record a new income or expense.
     Args:
         transaction_type: The type of transaction. Must be either 'income' or 'expense'.
         transaction_amount: The amount of the transaction as a float.
+        category: A short category such as 'food', 'rent', 'transport' or 'salary', or an empty string if unknown.
     Returns:
         A dictionary with a status and a message.
     """
 
     try:
-        add_transaction(type = transaction_type,amount = transaction_amount)
+        await add_transaction(type = transaction_type,amount = transaction_amount,category = category or None)
         return {"status": "success", "message": "Your transaction saved successfully"}
     except Exception as e:
         return {"status": "error", "message": f"An error occurred: {e}"}
 
-def GetAllTransactions() -> dict:
+def _parse_optional_date(value: str):
+    """Normalizes an optional 'YYYY-MM-DD' tool argument; empty strings mean no bound."""
+    if not value:
+        return None
+    return datetime.strptime(value, '%Y-%m-%d').strftime('%Y-%m-%d')
+
+
+async def AddNewTransactions(transactions: list[dict]) -> dict:
+    """
+    Adds many transactions (income or expense) to the database in one go.
+    Use this instead of calling `AddNewTransaction` repeatedly when the user gives several transactions at once,
+    e.g. a list of expenses or a pasted bank statement.
+    Args:
+        transactions: The transactions to add. Each one is an object with `type` ('income' or 'expense'),
+            `amount` (a positive number), optionally a short `category` (e.g. 'food') and, if it did not happen
+            today, `date` in 'YYYY-MM-DD' format.
+    Returns:
+        A dictionary with a status, the number of saved and skipped transactions and the reasons for skipped ones.
+    """
+    try:
+        result = await import_records(transactions)
+        return compact_result({"status": "success", **result})
+    except Exception as e:
+        return {"status": "error", "message": f"An error occurred: {e}"}
+
+async def GetAllTransactions(limit: int = DEFAULT_PAGE_SIZE, cursor: str = "", start_date: str = "",
+                       end_date: str = "") -> dict:
     """
-    Retrieves all transactions (both income and expense) from the database.
+    Retrieves transactions (both income and expense) from the database, newest first, one page at a time.
     Use this when a user asks to see their transaction history or a list of their transactions.
+    If the result has a `next_cursor`, call again with that cursor only when the user needs older transactions.
+    Args:
+        limit: The maximum number of transactions to return (at most 200).
+        cursor: The `next_cursor` of the previous page, or an empty string for the first page.
+        start_date: Optional first day to include, in 'YYYY-MM-DD' format.
+        end_date: Optional last day to include, in 'YYYY-MM-DD' format.
     Returns:
-        A dictionary containing the list of transactions or an error message.
+        A dictionary containing the page of transactions and the next cursor, or an error message.
     """
     try:
-        transactions = get_all_transactions()
-        return {"status": "success", "data": transactions}
+        page = await get_transactions_page(limit=limit, cursor=cursor or None,
+                                           start_date=_parse_optional_date(start_date),
+                                           end_date=_parse_optional_date(end_date))
+        return compact_page(page)
     except Exception as e:
         return {"status": "error", "message": f"An error occurred: {e}"}
 
-def AddNewGoal(note: str, date_target: str, money_target: int) -> dict:
+async def AddNewGoal(note: str, date_target: str, money_target: int) -> dict:
     """
     Adds a new financial goal to the database.
     Use this when a user wants to set a new goal.
@@ -56,29 +86,38 @@ def AddNewGoal(note: str, date_target: str, money_target: int) -> dict:
     """
     try:
         target_date = datetime.strptime(date_target, '%Y-%m-%d')
-        add_goal(note=note, date_target=target_date, money_target=money_target)
+        await add_goal(note=note, date_target=target_date, money_target=money_target)
         return {"status": "success", "message": "Your goal was saved successfully."}
     except Exception as e:
         return {"status": "error", "message": f"An error occurred: {e}"}
 
 
-def GetTransactionsByType(transaction_type: str) -> dict:
+async def GetTransactionsByType(transaction_type: str, limit: int = DEFAULT_PAGE_SIZE, cursor: str = "",
+                          start_date: str = "", end_date: str = "", category: str = "") -> dict:
     """
-    Retrieves all transactions of a specific type from the database.
-    Use this when a user asks for a list of only their income or only their expenses.
+    Retrieves transactions of a specific type from the database, newest first, one page at a time.
+    Use this when a user asks for a list of only their income or only their expenses, optionally of one category.
+    If the result has a `next_cursor`, call again with that cursor only when the user needs older transactions.
     Args:
         transaction_type: The type of transaction to retrieve. Must be either 'income' or 'expense'.
+        limit: The maximum number of transactions to return (at most 200).
+        cursor: The `next_cursor` of the previous page, or an empty string for the first page.
+        start_date: Optional first day to include, in 'YYYY-MM-DD' format.
+        end_date: Optional last day to include, in 'YYYY-MM-DD' format.
+        category: Optional category to keep, e.g. 'food'; an empty string for all categories.
     Returns:
-        A dictionary containing the list of transactions or an error message.
+        A dictionary containing the page of transactions and the next cursor, or an error message.
     """
     try:
-        transactions = get_transactions_by_type(transaction_type=transaction_type)
-        return {"status": "success", "data": transactions}
+        page = await get_transactions_page(limit=limit, cursor=cursor or None, transaction_type=transaction_type,
+                                           start_date=_parse_optional_date(start_date),
+                                           end_date=_parse_optional_date(end_date), category=category or None)
+        return compact_page(page)
     except Exception as e:
         return {"status": "error", "message": f"An error occurred: {e}"}
 
 
-def GetTransactionTotalsByDateRange(start_date: str, end_date: str) -> dict:
+async def GetTransactionTotalsByDateRange(start_date: str, end_date: str) -> dict:
     """
     Calculates the total income and total expense over a specified date range.
     Use this when a user asks for a summary of their finances between two dates, like "how much did I spend last month?"
@@ -93,13 +132,36 @@ def GetTransactionTotalsByDateRange(start_date: str, end_date: str) -> dict:
         # The LLM might pass dates in different formats, so we parse and reformat them.
         start = datetime.strptime(start_date, '%Y-%m-%d').strftime('%Y-%m-%d')
         end = datetime.strptime(end_date, '%Y-%m-%d').strftime('%Y-%m-%d')
-        totals = get_transaction_totals_by_date_range(start_date=start, end_date=end)
+        totals = await get_transaction_totals_by_date_range(start_date=start, end_date=end)
         return {"status": "success", "data": totals}
     except Exception as e:
         return {"status": "error", "message": f"An error occurred: {e}"}
 
 
-def GetAllGoals() -> dict:
+async def GetCategoryTotals(transaction_type: str = "expense", start_date: str = "", end_date: str = "",
+                            category: str = "") -> dict:
+    """
+    Calculates the total amount and number of transactions per category, largest first.
+    Use this when a user asks how much they spent on something, e.g. "how much did I spend on food last month?",
+    or where their money goes.
+    Args:
+        transaction_type: 'expense' (the default) or 'income'.
+        start_date: Optional first day to include, in 'YYYY-MM-DD' format.
+        end_date: Optional last day to include, in 'YYYY-MM-DD' format.
+        category: Optional single category to total, e.g. 'food'; an empty string for every category.
+    Returns:
+        A dictionary containing the totals per category, or an error message.
+    """
+    try:
+        totals = await get_category_totals(start_date=_parse_optional_date(start_date),
+                                           end_date=_parse_optional_date(end_date),
+                                           transaction_type=transaction_type, category=category or None)
+        return compact_result({"status": "success", "data": totals})
+    except Exception as e:
+        return {"status": "error", "message": f"An error occurred: {e}"}
+
+
+async def GetAllGoals() -> dict:
     """
     Retrieves all financial goals from the database.
     Use this when a user asks to see their list of goals.
@@ -107,15 +169,16 @@ def GetAllGoals() -> dict:
         A dictionary containing the list of goals or an error message.
     """
     try:
-        goals = get_all_goals()
-        return {"status": "success", "data": goals}
+        goals = await get_all_goals()
+        return compact_result({"status": "success", "data": goals})
     except Exception as e:
         return {"status": "error", "message": f"An error occurred: {e}"}
 
-def AddNewInvestment(amount: float, title: str, price: float) -> dict:
+async def AddNewInvestment(amount: float, title: str, price: float) -> dict:
     """
     Adds a new investment record to the database.
-    Use this when a user wants to record a new investment they made.
+    Use this when a user wants to record a new investment they made. Do not also record it as an expense:
+    the money invested is counted as part of the savings that bought it.
     Args:
         amount: The quantity or amount of the asset invested.
         title: The name or symbol of the investment (e.g., 'Bitcoin', 'AAPL').
@@ -124,72 +187,160 @@ def AddNewInvestment(amount: float, title: str, price: float) -> dict:
         A dictionary with a status and a message.
     """
     try:
-        add_investment(amount=amount, title=title, price=price)
+        await add_investment(amount=amount, title=title, price=price)
         return {"status": "success", "message": "Your investment was saved successfully."}
     except Exception as e:
         return {"status": "error", "message": f"An error occurred: {e}"}
 
-def GetAllInvestments() -> dict:
+async def GetAllInvestments(limit: int = DEFAULT_PAGE_SIZE, cursor: str = "", start_date: str = "",
+                      end_date: str = "") -> dict:
     """
-    Retrieves all investment records from the database.
+    Retrieves investment records from the database, newest first, one page at a time.
     Use this when a user asks to see their list of investments.
+    If the result has a `next_cursor`, call again with that cursor only when the user needs older investments.
+    Args:
+        limit: The maximum number of investments to return (at most 200).
+        cursor: The `next_cursor` of the previous page, or an empty string for the first page.
+        start_date: Optional first day to include, in 'YYYY-MM-DD' format.
+        end_date: Optional last day to include, in 'YYYY-MM-DD' format.
     Returns:
-        A dictionary containing the list of investments or an error message.
+        A dictionary containing the page of investments and the next cursor, or an error message.
     """
     try:
-        investments = get_all_investments()
-        return {"status": "success", "data": investments}
+        page = await get_investments_page(limit=limit, cursor=cursor or None,
+                                          start_date=_parse_optional_date(start_date),
+                                          end_date=_parse_optional_date(end_date))
+        return compact_page(page)
     except Exception as e:
         return {"status": "error", "message": f"An error occurred: {e}"}
 
-def GoalAndInvestment() -> dict:
+async def GoalAndInvestment() -> dict:
     """
-    Retrieves a comprehensive overview of the user's financial data, including all goals, investments, and transactions.
+    Retrieves a compact overview of the user's financial data: cash flow totals and monthly averages,
+    savings rate, progress on every goal, investment positions per asset and the most recent transactions.
     Use this when the user asks for a full summary of their finances or to analyze goals in relation to their investments and transaction history.
     Returns:
-        A dictionary containing lists of goals, investments, and transactions, or an error message.
+        A dictionary containing the financial profile snapshot, or an error message.
+    """
+    try:
+        return compact_result({"status": "success", "data": await get_profile_snapshot()})
+    except Exception as e:
+        return {"status": "error", "message": f"An error occurred: {e}"}
+
+async def GetCashflowAnalytics(period: str = "month", window: int = 3, start_date: str = "",
+                               end_date: str = "") -> dict:
+    """
+    Analyzes cash flow over time: income, expenses and net savings per month or week, rolling averages,
+    volatility and whether spending and savings are rising or falling.
+    Use this when the user asks about spending trends, how stable their income is, how their savings rate evolves
+    or how this month compares to previous ones, instead of reading every transaction.
+    Args:
+        period: 'month' or 'week'.
+        window: The number of periods in the rolling averages.
+        start_date: Optional first day to include, in 'YYYY-MM-DD' format.
+        end_date: Optional last day to include, in 'YYYY-MM-DD' format.
+    Returns:
+        A dictionary containing the per-period figures and the trend statistics, or an error message.
     """
     try:
-        goals = get_all_goals()
-        investments = get_all_investments()
-        transactions = get_all_transactions()
+        # NumPy is only loaded the first time the analytics are requested.
+        from service.analytics import cashflow
+
+        analytics = await run_db(cashflow.get_cashflow_analytics, period, window,
+                                 _parse_optional_date(start_date), _parse_optional_date(end_date))
+        return compact_result({"status": "success", "data": analytics})
+    except Exception as e:
+        return {"status": "error", "message": f"An error occurred: {e}"}
 
-        combined_data = {
-            "goals": goals,
-            "investments": investments,
-            "transactions": transactions
-        }
+async def GetGoalProjections(annual_return: float = 0.05, annual_volatility: float = 0.15,
+                             simulations: int = 2000) -> dict:
+    """
+    Simulates thousands of possible futures to estimate, for every goal, the probability of reaching its money target
+    by its target date and the monthly saving needed to reach it with 80% probability.
+    The simulation starts from the user's savings and investments and uses their historical monthly net cash flow.
+    Use this when the user asks whether their goals are realistic or achievable, or how much they need to save.
+    Args:
+        annual_return: The expected yearly return of the investments, e.g. 0.05 for 5%.
+        annual_volatility: The yearly volatility of the investments, e.g. 0.15 for 15%.
+        simulations: The number of simulated paths (at most 20000, fewer for goals decades away).
+    Returns:
+        A dictionary containing the projection of each goal and the assumptions used, or an error message.
+    """
+    try:
+        from service.analytics import goals
 
-        return {"status": "success", "data": combined_data}
+        projections = await run_db(goals.get_goal_projections, float(annual_return), float(annual_volatility),
+                                   int(simulations))
+        return compact_result({"status": "success", "data": projections})
     except Exception as e:
         return {"status": "error", "message": f"An error occurred: {e}"}
 
-database_agent = LlmAgent(
-    name="database_agent",
-    model=Gemini(
-        model="gemini-2.5-flash",
-        retry_options=retry_config
-    ),
-    output_key="database_result",
+async def GetPortfolioValuation(tool_context=None) -> dict:
+    """
+    Values all of the user's investments at current market prices: quantity, cost basis, average purchase price,
+    current price, market value and profit/loss per asset, plus the portfolio totals.
+    Use this when the user asks what their investments are worth, how their portfolio is performing
+    or how much they gained or lost, instead of listing investments and looking up each price.
+    Returns:
+        A dictionary containing the valuation of every position and the totals, or an error message.
+    """
+    try:
+        from service.market.sessions import get_market_toolset
+        from service.market.valuation import value_portfolio
+
+        positions = await get_investment_positions()
+        if not positions:
+            return {"status": "success", "data": {"positions": [], "message": "No investments recorded."}}
+        tools = await get_market_toolset().get_tools()
+        valuation = await value_portfolio(positions, tools, tool_context)
+        return compact_result({"status": "success", "data": valuation})
+    except Exception as e:
+        return {"status": "error", "message": f"An error occurred: {e}"}
 
-    instruction="""You are a database agent responsible for managing user's financial data.
+DATABASE_AGENT_INSTRUCTION = """You are a database agent responsible for managing user's financial data.
 You can add and retrieve records from the database.
 
  Use the following tools based on the user's request:
  - To add a new transaction (income or expense), use the `AddNewTransaction` tool.
- - To get a list of all transactions, use the `GetAllTransactions` tool.
+ - To add several transactions at once, use the `AddNewTransactions` tool with all of them in a single call.
+ - To get a list of transactions, use the `GetAllTransactions` tool.
  - To get a list of only income or only expenses, use the `GetTransactionsByType` tool.
+   Both return the newest transactions first, one page at a time; pass `start_date`/`end_date` to narrow the period
+   and only follow `next_cursor` when the user really needs older records.
  - To get a summary of total income and expenses for a specific period (e.g., last month, this year), use the `GetTransactionTotalsByDateRange` tool.
+ - To know how much was spent on a category (e.g., food) or where the money goes, use the `GetCategoryTotals` tool.
+   When adding transactions, pass a short `category` whenever the user mentions what it was for.
  - To add a new financial goal, use the `AddNewGoal` tool.
  - To get a list of all goals, use the `GetAllGoals` tool.
- - To add a new investment, use the `AddNewInvestment` tool.
- - To get a list of all investments, use the `GetAllInvestments` tool. 
+ - To add a new investment, use the `AddNewInvestment` tool (and never also as an expense transaction).
+ - To get a list of investments, use the `GetAllInvestments` tool (paginated the same way).
+ - To analyze spending, income or savings trends over months or weeks, use the `GetCashflowAnalytics` tool.
+ - To check whether goals are achievable or how much must be saved for them, use the `GetGoalProjections` tool.
+ - To value the investments at current prices with profit/loss per asset, use the `GetPortfolioValuation` tool.
  - To get a full financial overview and advise user(goals, investments, and transactions), use the `GoalAndInvestment` tool.
  NEVER print your response just save that in the memory to allow other agents use that
- """,
-     tools=[
-         AddNewTransaction, GetAllTransactions, GetTransactionsByType, GetTransactionTotalsByDateRange,
-         AddNewGoal, GetAllGoals, AddNewInvestment, GetAllInvestments,GoalAndInvestment
-     ]
-)
-print("✅ Database Agent defined.")
\ No newline at end of file
+ """ + TABLE_FORMAT_NOTE + "\n"
+
+DATABASE_TOOLS = [
+    AddNewTransaction, AddNewTransactions, GetAllTransactions, GetTransactionsByType, GetTransactionTotalsByDateRange,
+    GetCategoryTotals, AddNewGoal, GetAllGoals, AddNewInvestment, GetAllInvestments, GoalAndInvestment, GetCashflowAnalytics,
+    GetGoalProjections, GetPortfolioValuation,
+]
+# Database tools whose results also depend on live market data (they call the market toolset).
+MARKET_TOOLS = [GetPortfolioValuation]
+
+
+@lazy_singleton
+def get_database_agent():
+    """The agent that reads and writes the user's financial data; the root agent transfers to it by name."""
+    from google.adk.agents import LlmAgent
+
+    agent = LlmAgent(
+        name="root_database_agent",
+        model=get_model(),
+        output_key="database_result",
+        instruction=DATABASE_AGENT_INSTRUCTION,
+        tools=DATABASE_TOOLS,
+    )
+    print("✅ Database Agent defined.")
+    return agent
@@ -0,0 +1,320 @@
+import calendar
+import re
+import statistics
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from service.db import async_database
+
+# Fast path in front of the agent tree. Messages such as "spent 40 on lunch" or "show my goals"
+# used to cost a root Gemini call, a transfer to root_database_agent (another Gemini call) and a
+# tool call. Here they are recognized with anchored patterns and answered straight from the
+# database; anything the patterns don't fully explain goes to the agents as before.
+
+CONFIDENCE_THRESHOLD = 0.75
+LIST_LIMIT = 10
+MAX_NOTE_LENGTH = 60
+MAX_NOTE_WORDS = 3
+LATENCY_SAMPLES = 1000
+
+_AMOUNT = r'(?:[$€£]\s*)?(?P<amount>\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d+(?:\.\d+)?)(?:\s*(?:\$|€|£|usd|eur|dollars?|euros?|bucks))?'
+# A note is a few plain words; punctuation and digits end it, and _WHEN may follow it.
+_NOTE = r'(?P<note>[^\d?!.,;:()]+?)'
+_WEEKDAYS = r'monday|tuesday|wednesday|thursday|friday|saturday|sunday'
+# When a new transaction happened, if not now.
+_WHEN = (rf'(?:\s+(?P<when>today|yesterday|\d+\s+days?\s+ago|last\s+(?:week|month|{_WEEKDAYS})'
+         rf'|on\s+(?:\d{{4}}-\d{{2}}-\d{{2}}|{_WEEKDAYS})))?')
+_PERIOD = r'(?:\s+(?P<period>.+))?'
+_MY = r'(?:me\s+)?(?:all\s+)?(?:of\s+)?(?:my\s+)?'
+
+# (intent, confidence, pattern); patterns must match the whole normalized message.
+_RULES = [
+    ('add_expense', 0.95, rf'(?:i\s+)?(?:just\s+)?(?:spent|spend|paid|pay)\s+{_AMOUNT}(?:\s+(?:on|for)\s+{_NOTE})?{_WHEN}'),
+    ('add_expense', 0.9, rf'(?:i\s+)?(?:just\s+)?(?:bought|purchased)\s+{_NOTE}\s+for\s+{_AMOUNT}{_WHEN}'),
+    ('add_expense', 0.95, rf'(?:add|record|log|save)?\s*(?:an?\s+|new\s+)?expense(?:\s+of)?\s+{_AMOUNT}(?:\s+(?:on|for)\s+{_NOTE})?{_WHEN}'),
+    ('add_expense', 0.8, rf'{_AMOUNT}\s+(?:on|for)\s+{_NOTE}{_WHEN}'),
+    ('add_income', 0.95, rf'(?:i\s+)?(?:just\s+)?(?:got\s+paid|earned|received|made)\s+{_AMOUNT}(?:\s+(?:from|for|as)\s+{_NOTE})?{_WHEN}'),
+    ('add_income', 0.95, rf'(?:add|record|log|save)?\s*(?:an?\s+|new\s+)?income(?:\s+of)?\s+{_AMOUNT}(?:\s+(?:from|for|as)\s+{_NOTE})?{_WHEN}'),
+    ('add_income', 0.9, rf'(?:i\s+)?(?:got\s+)?(?:my\s+)?(?:salary|paycheck|paycheque)(?:\s+of)?\s+{_AMOUNT}{_WHEN}'),
+    ('list_goals', 0.95, rf'(?:(?:show|list|display|view|get)\s+{_MY}|what\s+are\s+my\s+|my\s+)?goals'),
+    ('list_investments', 0.95, rf'(?:(?:show|list|display|view|get)\s+{_MY}|what\s+are\s+my\s+|my\s+)?investments'),
+    ('list_transactions', 0.9,
+     rf'(?:show|list|display|view|get)\s+{_MY}(?:last\s+|recent\s+|latest\s+)?(?P<kind>transactions|expenses|spending|incomes?){_PERIOD}'),
+    ('totals', 0.9, rf'how\s+much\s+(?:did|have)\s+i\s+(?P<kind>spend|spent|earn|earned|make|made){_PERIOD}'),
+    ('category_totals', 0.9, rf'how\s+much\s+(?:did|have)\s+i\s+(?:spend|spent)\s+(?:on|for)\s+{_NOTE}{_PERIOD}'),
+    ('totals', 0.9,
+     rf'(?:what\s+(?:is|was|were)\s+)?(?:my\s+)?total\s+(?P<kind>income|expenses?|spending|earnings){_PERIOD}'),
+]
+# Words that don't belong in a note: a message still holding them says more than the rule can
+# record (a date, a question), so it goes to the agents instead of being misfiled.
+_NOTE_STOP_WORDS = frozenset(
+    'today yesterday tomorrow ago last this next week month year on in since before after '
+    'is was are were that too much many how what why when should could can do does did but'.split())
+_COMPILED_RULES = [(intent, confidence, re.compile(pattern)) for intent, confidence, pattern in _RULES]
+
+_KIND_TO_TYPE = {
+    'expenses': 'expense', 'expense': 'expense', 'spending': 'expense', 'spend': 'expense', 'spent': 'expense',
+    'income': 'income', 'incomes': 'income', 'earn': 'income', 'earned': 'income', 'earnings': 'income',
+    'make': 'income', 'made': 'income', 'transactions': None,
+}
+_MONTHS = {name.lower(): number for number, name in enumerate(calendar.month_name) if name}
+_MONTHS.update({name.lower(): number for number, name in enumerate(calendar.month_abbr) if name})
+_WEEKDAY_NUMBERS = {name.lower(): number for number, name in enumerate(calendar.day_name)}
+
+_EXPENSE_TIPS = (
+    "Tip: small daily expenses add up, so try setting a weekly budget for them.",
+    "Tip: moving a fixed amount to savings right after payday makes saving automatic.",
+    "Tip: review subscriptions once a month and cancel the ones you don't use.",
+    "Tip: waiting 24 hours before non-essential purchases cuts impulse spending.",
+)
+
+
+@dataclass
+class RouteResult:
+    intent: str
+    confidence: float
+    reply: str
+    latency_ms: float
+
+
+def _normalize(message: str) -> str:
+    text = message.strip().lower()
+    text = re.sub(r'\s+', ' ', text)
+    return text.rstrip('.!?')
+
+
+def _parse_amount(text: str) -> float:
+    return float(text.replace(',', ''))
+
+
+def _month_bounds(year: int, month: int) -> tuple:
+    return date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1])
+
+
+def parse_period(text: Optional[str], today: date = None) -> Optional[tuple]:
+    """Turns phrases like 'last month', 'this year', 'in march' or 'from 2024-01-01 to 2024-02-01'
+    into inclusive (start, end) 'YYYY-MM-DD' strings. Returns None for anything it doesn't understand."""
+    today = today or date.today()
+    if not text:
+        return None
+    text = text.strip()
+    if text == 'today':
+        start = end = today
+    elif text == 'yesterday':
+        start = end = today - timedelta(days=1)
+    elif text == 'this week':
+        start, end = today - timedelta(days=today.weekday()), today
+    elif text == 'last week':
+        start = today - timedelta(days=today.weekday() + 7)
+        end = start + timedelta(days=6)
+    elif text == 'this month':
+        start, end = today.replace(day=1), today
+    elif text == 'last month':
+        last_month_end = today.replace(day=1) - timedelta(days=1)
+        start, end = _month_bounds(last_month_end.year, last_month_end.month)
+    elif text == 'this year':
+        start, end = date(today.year, 1, 1), today
+    elif text == 'last year':
+        start, end = date(today.year - 1, 1, 1), date(today.year - 1, 12, 31)
+    elif match := re.fullmatch(r'(?:in\s+)?(\d{4})', text):
+        start, end = date(int(match.group(1)), 1, 1), date(int(match.group(1)), 12, 31)
+    elif match := re.fullmatch(r'(?:in\s+)?([a-z]+)(?:\s+(\d{4}))?', text):
+        month = _MONTHS.get(match.group(1))
+        if month is None:
+            return None
+        year = int(match.group(2)) if match.group(2) else today.year - (month > today.month)
+        start, end = _month_bounds(year, month)
+    elif match := re.fullmatch(r'(?:from|between)\s+(\d{4}-\d{2}-\d{2})\s+(?:to|and|until)\s+(\d{4}-\d{2}-\d{2})', text):
+        start, end = date.fromisoformat(match.group(1)), date.fromisoformat(match.group(2))
+    elif match := re.fullmatch(r'since\s+(\d{4}-\d{2}-\d{2})', text):
+        start, end = date.fromisoformat(match.group(1)), today
+    else:
+        return None
+    return start.isoformat(), end.isoformat()
+
+
+def parse_day(text: str, today: date = None) -> Optional[date]:
+    """Turns the _WHEN phrases ('yesterday', '3 days ago', 'last month', 'on friday', 'on 2024-05-01')
+    into the day they name. Returns None for days in the future or that don't exist."""
+    today = today or date.today()
+    text = ' '.join(text.split())
+    if text == 'today':
+        return today
+    if text == 'yesterday':
+        return today - timedelta(days=1)
+    if text == 'last week':
+        return today - timedelta(days=7)
+    if text == 'last month':
+        year, month = (today.year, today.month - 1) if today.month > 1 else (today.year - 1, 12)
+        return date(year, month, min(today.day, calendar.monthrange(year, month)[1]))
+    if match := re.fullmatch(r'(\d+) days? ago', text):
+        return today - timedelta(days=int(match.group(1)))
+    if match := re.fullmatch(r'(on|last) ([a-z]+)', text):
+        if match.group(2) in _WEEKDAY_NUMBERS:
+            back = (today.weekday() - _WEEKDAY_NUMBERS[match.group(2)]) % 7
+            return today - timedelta(days=back or (7 if match.group(1) == 'last' else 0))
+    if match := re.fullmatch(r'on (\d{4}-\d{2}-\d{2})', text):
+        try:
+            day = date.fromisoformat(match.group(1))
+        except ValueError:
+            return None
+        return day if day <= today else None
+    return None
+
+
+def _note_is_plain(note: str) -> bool:
+    words = note.split()
+    return len(note) <= MAX_NOTE_LENGTH and len(words) <= MAX_NOTE_WORDS and not _NOTE_STOP_WORDS.intersection(words)
+
+
+def parse_intent(message: str, today: date = None):
+    """Returns (intent, confidence, slots) for the best matching rule, or None."""
+    text = _normalize(message)
+    best = None
+    for intent, confidence, pattern in _COMPILED_RULES:
+        match = pattern.fullmatch(text)
+        if not match:
+            continue
+        slots = {key: value for key, value in match.groupdict().items() if value is not None}
+        if 'note' in slots and not _note_is_plain(slots['note']):
+            # Leftover words: leave the message to the agents.
+            continue
+        if 'when' in slots:
+            slots['when'] = parse_day(slots['when'], today)
+            if slots['when'] is None:
+                continue
+        if 'period' in slots:
+            period = parse_period(slots['period'], today)
+            if period is None:
+                # Unexplained trailing words: leave the message to the agents.
+                continue
+            slots['period'] = period
+        if best is None or confidence > best[1]:
+            best = (intent, confidence, slots)
+    return best
+
+
+class IntentRouter:
+    """Answers simple bookkeeping messages directly from the database, and keeps hit-rate/latency stats."""
+
+    def __init__(self, threshold: float = CONFIDENCE_THRESHOLD):
+        self.threshold = threshold
+        self._tip = 0
+        self._latencies_ms = deque(maxlen=LATENCY_SAMPLES)
+        self._stats = {"messages": 0, "hits": 0, "misses": 0, "errors": 0}
+        self._intents = {}
+
+    async def route(self, message: str) -> Optional[RouteResult]:
+        """Handles `message` locally and returns the reply, or returns None when the agents should handle it."""
+        started = time.perf_counter()
+        self._stats["messages"] += 1
+        parsed = parse_intent(message)
+        if parsed is None or parsed[1] < self.threshold:
+            self._stats["misses"] += 1
+            return None
+        intent, confidence, slots = parsed
+        try:
+            reply = await getattr(self, f'_handle_{intent}')(slots)
+        except Exception:
+            # Whatever went wrong, the agents can still deal with the message (and report errors properly).
+            self._stats["errors"] += 1
+            self._stats["misses"] += 1
+            return None
+        latency_ms = (time.perf_counter() - started) * 1000
+        self._stats["hits"] += 1
+        self._intents[intent] = self._intents.get(intent, 0) + 1
+        self._latencies_ms.append(latency_ms)
+        return RouteResult(intent=intent, confidence=confidence, reply=reply, latency_ms=latency_ms)
+
+    def _next_tip(self) -> str:
+        tip = _EXPENSE_TIPS[self._tip % len(_EXPENSE_TIPS)]
+        self._tip += 1
+        return tip
+
+    @staticmethod
+    def _created_at(slots) -> tuple:
+        """The created_at of a new transaction (None for now) and how the reply names its day."""
+        day = slots.get('when')
+        if day is None or day == date.today():
+            return None, ""
+        # Noon UTC keeps the day the same in every timezone near UTC.
+        return datetime.combine(day, datetime.min.time()).replace(hour=12).isoformat(' '), f" dated {day.isoformat()}"
+
+    async def _handle_add_expense(self, slots) -> str:
+        amount = _parse_amount(slots['amount'])
+        created_at, dated = self._created_at(slots)
+        await async_database.add_transaction(type='expense', amount=amount, created_at=created_at,
+                                             category=slots.get('note'))
+        on = f" on {slots['note'].strip()}" if slots.get('note') else ""
+        return f"✅ Saved an expense of {amount:,.2f}{on}{dated}.\n{self._next_tip()}"
+
+    async def _handle_add_income(self, slots) -> str:
+        amount = _parse_amount(slots['amount'])
+        created_at, dated = self._created_at(slots)
+        await async_database.add_transaction(type='income', amount=amount, created_at=created_at,
+                                             category=slots.get('note'))
+        source = f" from {slots['note'].strip()}" if slots.get('note') else ""
+        return f"✅ Saved an income of {amount:,.2f}{source}{dated}."
+
+    async def _handle_list_goals(self, slots) -> str:
+        goals = await async_database.get_all_goals()
+        if not goals:
+            return "You have no goals yet. Tell me one, e.g. 'save 5000 for a car by 2026-12-31'."
+        lines = [f"- {goal['note']}: {goal['money_target']:,} by {str(goal['date_target'])[:10]}" for goal in goals]
+        return "Your goals:\n" + "\n".join(lines)
+
+    async def _handle_list_investments(self, slots) -> str:
+        page = await async_database.get_investments_page(limit=LIST_LIMIT)
+        if not page["items"]:
+            return "You have no investments recorded yet."
+        lines = [f"- {row['created_at'][:10]} {row['title']}: {row['amount']:g} @ {row['price']:,.2f}"
+                 for row in page["items"]]
+        more = "\n(older investments not shown)" if page["next_cursor"] else ""
+        return "Your latest investments:\n" + "\n".join(lines) + more
+
+    async def _handle_list_transactions(self, slots) -> str:
+        transaction_type = _KIND_TO_TYPE[slots['kind']]
+        start, end = slots.get('period', (None, None))
+        page = await async_database.get_transactions_page(limit=LIST_LIMIT, transaction_type=transaction_type,
+                                                          start_date=start, end_date=end)
+        label = {None: "transactions", 'income': "income", 'expense': "expenses"}[transaction_type]
+        if not page["items"]:
+            return f"No {label} found for that period."
+        lines = [f"- {row['created_at'][:10]} {row['type']}: {row['amount']:,.2f}" for row in page["items"]]
+        more = "\n(older ones not shown)" if page["next_cursor"] else ""
+        return f"Your latest {label}:\n" + "\n".join(lines) + more
+
+    async def _handle_totals(self, slots) -> str:
+        transaction_type = _KIND_TO_TYPE[slots['kind']]
+        start, end = slots.get('period', ('1970-01-01', date.today().isoformat()))
+        totals = await async_database.get_transaction_totals_by_date_range(start_date=start, end_date=end)
+        income, expense = totals.get('income') or 0, totals.get('expense') or 0
+        span = f"from {start} to {end}" if 'period' in slots else "in total"
+        if transaction_type == 'expense':
+            return f"You spent {expense:,.2f} {span}."
+        if transaction_type == 'income':
+            return f"You earned {income:,.2f} {span}."
+        return f"Income {income:,.2f}, expenses {expense:,.2f}, net {income - expense:,.2f} {span}."
+
+    async def _handle_category_totals(self, slots) -> str:
+        category = slots['note'].strip()
+        start, end = slots.get('period', (None, None))
+        totals = await async_database.get_category_totals(start_date=start, end_date=end, category=category)
+        spent = totals[0]['total'] if totals else 0
+        span = f"from {start} to {end}" if 'period' in slots else "in total"
+        return f"You spent {spent:,.2f} on {category} {span}."
+
+    def stats(self) -> dict:
+        """Hit rate and latency of the locally handled messages."""
+        messages = self._stats["messages"]
+        latencies = sorted(self._latencies_ms)
+        return {
+            **self._stats,
+            "hit_rate": round(self._stats["hits"] / messages, 3) if messages else 0.0,
+            "intents": dict(self._intents),
+            "latency_ms_p50": round(statistics.median(latencies), 2) if latencies else None,
+            "latency_ms_max": round(latencies[-1], 2) if latencies else None,
+        }
@@ -0,0 +1,80 @@
+import importlib.util
+import os
+
+# HTTP settings of the Gemini model's google-genai client. registry.get_model() already shares one
+# Gemini object between all agents, and ADK builds that object's Client (and so its httpx
+# connection pool) once per event loop. With httpx's defaults, though, idle connections are
+# dropped after 5 seconds, so a user's next message, or the next agent of a turn after a slow tool
+# call, usually pays for a new TCP+TLS handshake. The pooled settings keep connections alive for
+# two minutes, speak HTTP/2 when the `h2` package is installed (all requests then share a few
+# multiplexed connections) and bound the pool.
+#
+# They are handed to ADK through Gemini.client_kwargs, so ADK still builds, caches per loop and
+# configures the Client (base_url, api_version, Vertex AI). bench/http_pool_bench.py measures
+# the connections they save against a local fake endpoint.
+
+MAX_CONNECTIONS_ENV = 'ASSISTANT_HTTP_MAX_CONNECTIONS'
+MAX_KEEPALIVE_ENV = 'ASSISTANT_HTTP_MAX_KEEPALIVE'
+# Points the models at another endpoint, e.g. the fake server of bench/http_pool_bench.py.
+BASE_URL_ENV = 'ASSISTANT_MODEL_BASE_URL'
+DEFAULT_MAX_CONNECTIONS = 20
+DEFAULT_MAX_KEEPALIVE = 10
+# Idle connections are closed after this many seconds.
+KEEPALIVE_EXPIRY = 120.0
+
+
+def http2_available() -> bool:
+    """httpx only speaks HTTP/2 with the optional `h2` package."""
+    return importlib.util.find_spec('h2') is not None
+
+
+def transport_args() -> dict:
+    """Keyword arguments of the httpx clients behind the model's Client."""
+    import httpx
+
+    limits = httpx.Limits(
+        max_connections=int(os.getenv(MAX_CONNECTIONS_ENV, DEFAULT_MAX_CONNECTIONS)),
+        max_keepalive_connections=int(os.getenv(MAX_KEEPALIVE_ENV, DEFAULT_MAX_KEEPALIVE)),
+        keepalive_expiry=KEEPALIVE_EXPIRY,
+    )
+    return {"http2": http2_available(), "limits": limits}
+
+
+def pool_http_options(model):
+    """The HttpOptions ADK would build for the Gemini `model`, plus transport_args().
+
+    ADK replaces its own http_options with one given in client_kwargs, so this starts from the
+    same headers, retry options, base_url and api_version ADK uses, and keeps any http_options
+    already in the model's client_kwargs.
+    """
+    from google.genai import types
+
+    base_url, api_version = model._base_url_and_api_version
+    options = {
+        "headers": model._tracking_headers(),
+        "retry_options": model.retry_options,
+        "base_url": base_url,
+        "api_version": api_version or model._configured_api_version(),
+        "client_args": transport_args(),
+        "async_client_args": transport_args(),
+    }
+    given = (model.client_kwargs or {}).get('http_options')
+    if given is not None:
+        given = given.model_dump(exclude_none=True) if isinstance(given, types.HttpOptions) else dict(given)
+        options.update(given)
+    return types.HttpOptions(**options)
+
+
+def use_pool(model):
+    """Makes the Gemini `model` build its Clients with the pooled HTTP settings; returns it."""
+    model.client_kwargs = {**(model.client_kwargs or {}), "http_options": pool_http_options(model)}
+    return model
+
+
+def stats() -> dict:
+    return {
+        "http2": http2_available(),
+        "max_connections": int(os.getenv(MAX_CONNECTIONS_ENV, DEFAULT_MAX_CONNECTIONS)),
+        "max_keepalive": int(os.getenv(MAX_KEEPALIVE_ENV, DEFAULT_MAX_KEEPALIVE)),
+        "keepalive_expiry": KEEPALIVE_EXPIRY,
+    }
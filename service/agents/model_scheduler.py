@@ -0,0 +1,298 @@
+import asyncio
+import heapq
+import itertools
+import os
+import random
+import statistics
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
+
+# One scheduler for every model call of the process. Requests wait in a priority queue until a
+# concurrency slot is free and the request-per-minute and token-per-minute buckets allow them, so
+# the quota is shared instead of each agent discovering it with its own 429s. Retries are driven
+# from here as well: a 429 pauses dispatching for everyone for the delay the server asks for (or a
+# jittered exponential backoff) and lowers the request rate, which then recovers with every
+# success. Interactive turns (the root agent and the database agent) are dispatched before
+# background advice.
+#
+# The scheduler is pure asyncio; ScheduledLlm (scheduled_model.py) plugs it into ADK, and
+# bench/rate_limit_bench.py exercises it against a fake endpoint that answers with 429s.
+
+INTERACTIVE = 0
+BACKGROUND = 1
+PRIORITY_NAMES = {INTERACTIVE: 'interactive', BACKGROUND: 'background'}
+
+# Limits, overridable per deployment; 0 means unlimited.
+RPM_ENV = 'ASSISTANT_MODEL_RPM'
+TPM_ENV = 'ASSISTANT_MODEL_TPM'
+CONCURRENCY_ENV = 'ASSISTANT_MODEL_CONCURRENCY'
+DEFAULT_RPM = 60
+DEFAULT_TPM = 1_000_000
+DEFAULT_CONCURRENCY = 8
+
+MAX_ATTEMPTS = 5
+RETRY_STATUS_CODES = (429, 500, 503, 504)
+BASE_BACKOFF = 1.0
+MAX_BACKOFF = 60.0
+# Share of the server's retry delay added as jitter, so paused callers do not all return at once.
+RETRY_AFTER_JITTER = 0.2
+# A 429 halves the request rate (down to MIN_RATE_SHARE of the limit); each success gives back RECOVERY_SHARE.
+THROTTLE_FACTOR = 0.5
+MIN_RATE_SHARE = 0.1
+RECOVERY_SHARE = 0.05
+WAIT_SAMPLES = 10000
+
+
+def status_code_of(error: BaseException) -> Optional[int]:
+    """The HTTP status of a failed model call (google-genai's APIError.code, or an httpx response)."""
+    for attribute in ('code', 'status_code'):
+        value = getattr(error, attribute, None)
+        if isinstance(value, int):
+            return value
+    return getattr(getattr(error, 'response', None), 'status_code', None)
+
+
+def _find_key(value, key: str):
+    if isinstance(value, dict):
+        if key in value:
+            return value[key]
+        value = list(value.values())
+    if isinstance(value, list):
+        for item in value:
+            found = _find_key(item, key)
+            if found is not None:
+                return found
+    return None
+
+
+def retry_after_of(error: BaseException) -> Optional[float]:
+    """Seconds the server asked to wait: a Retry-After header, or the RetryInfo of a Gemini error."""
+    retry_after = getattr(error, 'retry_after', None)
+    if isinstance(retry_after, (int, float)):
+        return float(retry_after)
+    headers = getattr(getattr(error, 'response', None), 'headers', None)
+    try:
+        if headers is not None and headers.get('retry-after'):
+            return float(headers.get('retry-after'))
+    except (TypeError, ValueError):
+        pass
+    delay = _find_key(getattr(error, 'details', None), 'retryDelay')  # e.g. "7s" or "0.5s"
+    if isinstance(delay, str) and delay.endswith('s'):
+        try:
+            return float(delay[:-1])
+        except ValueError:
+            return None
+    return None
+
+
+class TokenBucket:
+    """Refills `rate` units per minute up to `capacity`. Usage reconciled afterwards may push it below zero."""
+
+    def __init__(self, rate: float, capacity: float = None, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._clock = clock
+        self._level = self.capacity
+        self._updated = clock()
+
+    def _refill(self):
+        now = self._clock()
+        self._level = min(self.capacity, self._level + (now - self._updated) * self.rate / 60)
+        self._updated = now
+
+    def delay(self, amount: float) -> float:
+        """Seconds until `amount` units are available; 0 if they are now."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        return 0.0 if self._level >= amount else (amount - self._level) * 60 / self.rate
+
+    def take(self, amount: float):
+        self._refill()
+        self._level -= amount
+
+    def set_rate(self, rate: float):
+        self._refill()
+        self.rate = rate
+
+    @property
+    def level(self) -> float:
+        self._refill()
+        return self._level
+
+
+class ModelScheduler:
+    def __init__(self, rpm: float = DEFAULT_RPM, tpm: float = DEFAULT_TPM,
+                 max_concurrent: int = DEFAULT_CONCURRENCY, max_attempts: int = MAX_ATTEMPTS,
+                 base_backoff: float = BASE_BACKOFF, max_backoff: float = MAX_BACKOFF, burst: float = None,
+                 clock=time.monotonic):
+        """`burst` is how many requests may start at once after an idle period; a minute's worth by default."""
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_concurrent = max_concurrent
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self._clock = clock
+        self._requests = TokenBucket(rpm, burst, clock=clock) if rpm else None
+        self._tokens = TokenBucket(tpm, clock=clock) if tpm else None
+        self._queue = []  # heap of (priority, sequence, tokens, future)
+        self._sequence = itertools.count()
+        self._in_flight = 0
+        self._cooldown_until = 0.0
+        self._rate_share = 1.0
+        self._timer = None
+        self._waits = {priority: [] for priority in PRIORITY_NAMES}
+        self._stats = {"requests": 0, "throttled": 0, "retries": 0, "failures": 0, "max_queue_depth": 0,
+                       "pauses": 0}
+
+    @classmethod
+    def from_env(cls, unlimited: bool = False) -> 'ModelScheduler':
+        """Limits from ASSISTANT_MODEL_RPM/TPM/CONCURRENCY; without them, the defaults (or none if `unlimited`)."""
+        def limit(name, default):
+            return float(os.getenv(name, 0 if unlimited else default))
+        return cls(rpm=limit(RPM_ENV, DEFAULT_RPM), tpm=limit(TPM_ENV, DEFAULT_TPM),
+                   max_concurrent=int(limit(CONCURRENCY_ENV, DEFAULT_CONCURRENCY)))
+
+    def _dispatch(self):
+        """Grants slots from the head of the queue while the limits allow it, else wakes up when they will."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._queue:
+            _, _, tokens, future = self._queue[0]
+            if future.done():  # cancelled while queued
+                heapq.heappop(self._queue)
+                continue
+            if self.max_concurrent and self._in_flight >= self.max_concurrent:
+                return
+            delay = max(self._cooldown_until - self._clock(),
+                        self._requests.delay(1) if self._requests else 0.0,
+                        self._tokens.delay(tokens) if self._tokens else 0.0)
+            if delay > 0:
+                self._timer = asyncio.get_running_loop().call_later(delay, self._dispatch)
+                return
+            heapq.heappop(self._queue)
+            if self._requests:
+                self._requests.take(1)
+            if self._tokens:
+                self._tokens.take(tokens)
+            self._in_flight += 1
+            future.set_result(None)
+
+    async def acquire(self, priority: int = INTERACTIVE, tokens: int = 0) -> float:
+        """Waits for a slot; returns the seconds spent queued. Every acquire() needs a release()."""
+        started = self._clock()
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (priority, next(self._sequence), tokens, future))
+        self._stats["requests"] += 1
+        self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], len(self._queue))
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()  # granted just before the caller was cancelled
+            raise
+        waited = self._clock() - started
+        samples = self._waits.setdefault(priority, [])
+        if len(samples) < WAIT_SAMPLES:
+            samples.append(waited)
+        return waited
+
+    def release(self):
+        self._in_flight -= 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, priority: int = INTERACTIVE, tokens: int = 0):
+        """Holds a slot for one model request; yields the seconds spent queued."""
+        waited = await self.acquire(priority, tokens)
+        try:
+            yield waited
+        finally:
+            self.release()
+
+    def record_usage(self, estimated: int, actual: int):
+        """Corrects the token bucket once the real token count of a request is known."""
+        if self._tokens and actual:
+            self._tokens.take(actual - estimated)
+
+    def should_retry(self, error: BaseException, attempt: int) -> bool:
+        retry = attempt + 1 < self.max_attempts and status_code_of(error) in RETRY_STATUS_CODES
+        if not retry:
+            self._stats["failures"] += 1
+        return retry
+
+    def backoff(self, attempt: int, error: BaseException = None) -> float:
+        """Seconds to wait before retrying after `error`; a 429 also pauses and slows down every other request."""
+        retry_after = retry_after_of(error) if error is not None else None
+        if retry_after is not None:
+            delay = retry_after * random.uniform(1, 1 + RETRY_AFTER_JITTER)
+        else:
+            delay = random.uniform(0, min(self.max_backoff, self.base_backoff * 2 ** attempt))
+        if status_code_of(error) == 429:
+            self._stats["throttled"] += 1
+            self._set_rate_share(max(self._rate_share * THROTTLE_FACTOR, MIN_RATE_SHARE))
+            pause_until = self._clock() + (retry_after if retry_after is not None else delay)
+            if pause_until > self._cooldown_until:
+                self._cooldown_until = pause_until
+                self._stats["pauses"] += 1
+        return delay
+
+    def succeeded(self):
+        if self._rate_share < 1.0:
+            self._set_rate_share(min(self._rate_share + RECOVERY_SHARE, 1.0))
+
+    def _set_rate_share(self, share: float):
+        self._rate_share = share
+        if self._requests:
+            self._requests.set_rate(self.rpm * share)
+
+    async def call(self, func, priority: int = INTERACTIVE, tokens: int = 0):
+        """Awaits `func()` in a slot, retrying retryable errors with the scheduler's backoff."""
+        for attempt in range(self.max_attempts):
+            async with self.slot(priority, tokens):
+                try:
+                    result = await func()
+                except Exception as e:
+                    if not self.should_retry(e, attempt):
+                        raise
+                    delay = self.backoff(attempt, e)
+                else:
+                    self.succeeded()
+                    return result
+            await self.retry_wait(delay)
+
+    async def retry_wait(self, delay: float):
+        self._stats["retries"] += 1
+        await asyncio.sleep(delay)
+
+    def queue_depth(self) -> dict:
+        depth = {name: 0 for name in PRIORITY_NAMES.values()}
+        for priority, _, _, future in self._queue:
+            if not future.done():
+                name = PRIORITY_NAMES.get(priority, str(priority))
+                depth[name] = depth.get(name, 0) + 1
+        return depth
+
+    def stats(self) -> dict:
+        waits = {}
+        for priority, samples in self._waits.items():
+            ordered = sorted(samples)
+            waits[PRIORITY_NAMES.get(priority, str(priority))] = {
+                "p50_ms": round(statistics.median(ordered) * 1000, 1) if ordered else None,
+                "p95_ms": round(ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)] * 1000, 1)
+                if ordered else None,
+            }
+        return {
+            "queue_depth": self.queue_depth(),
+            "in_flight": self._in_flight,
+            "rpm_limit": self.rpm or None,
+            "rpm_effective": round(self.rpm * self._rate_share, 1) if self.rpm else None,
+            "tpm_limit": self.tpm or None,
+            "tpm_available": round(self._tokens.level) if self._tokens else None,
+            "paused_for_s": round(max(self._cooldown_until - self._clock(), 0.0), 2),
+            "queue_wait": waits,
+            **self._stats,
+        }
@@ -0,0 +1,27 @@
+import json
+from typing import AsyncGenerator
+
+from google.adk.agents import BaseAgent
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.events import Event, EventActions
+
+from service.agents.database_agent import GoalAndInvestment
+
+
+class ProfileSnapshotAgent(BaseAgent):
+    """Deterministic replacement for the LLM-driven profile gatherer.
+
+    The old `profile_gatherer` spent a whole model round trip deciding to call `GoalAndInvestment`
+    with no arguments. This agent calls the tool directly and writes its result into session state.
+    """
+
+    output_key: str = "database_result"
+
+    async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        result = await GoalAndInvestment()
+        yield Event(
+            author=self.name,
+            invocation_id=ctx.invocation_id,
+            branch=ctx.branch,
+            actions=EventActions(state_delta={self.output_key: json.dumps(result, default=str)}),
+        )
@@ -0,0 +1,95 @@
+import functools
+import os
+import threading
+import time
+
+from service.agents.model_scheduler import INTERACTIVE
+
+# Lazily built, process-wide shared agents, models and toolsets. Importing an agent module only
+# defines functions: the ADK/Gemini imports and the object construction happen on the first
+# call of the corresponding get_* function, and every later call returns the same instance.
+
+DEFAULT_MODEL = "gemini-2.5-flash"
+# 'gemini', or 'stub' for the offline StubLlm used in load tests.
+MODEL_BACKEND_ENV = "ASSISTANT_MODEL_BACKEND"
+
+_build_times = {}
+_models = {}
+_models_lock = threading.Lock()
+
+
+def lazy_singleton(factory):
+    """Turns a zero-argument factory into a getter that builds its object once (thread-safely) and shares it."""
+    lock = threading.Lock()
+    instance = []
+
+    @functools.wraps(factory)
+    def get():
+        if not instance:
+            with lock:
+                if not instance:
+                    started = time.perf_counter()
+                    instance.append(factory())
+                    _build_times[factory.__name__] = time.perf_counter() - started
+        return instance[0]
+
+    get.is_built = lambda: bool(instance)
+    return get
+
+
+@lazy_singleton
+def get_retry_config():
+    from google.genai import types
+
+    # A single attempt: retries go through the model scheduler, which paces them for the whole
+    # process instead of every request backing off on its own (see model_scheduler.py).
+    return types.HttpRetryOptions(attempts=1)
+
+
+@lazy_singleton
+def get_model_scheduler():
+    """The scheduler every model call goes through; the stub backend is unlimited unless limits are set."""
+    from service.agents.model_scheduler import ModelScheduler
+
+    return ModelScheduler.from_env(unlimited=os.getenv(MODEL_BACKEND_ENV, 'gemini') == 'stub')
+
+
+def _build_model(model: str):
+    if os.getenv(MODEL_BACKEND_ENV, 'gemini') == 'stub':
+        from service.agents.stub_model import STUB_LATENCY, StubLlm
+
+        latency = float(os.getenv('STUB_MODEL_LATENCY', STUB_LATENCY))
+        return StubLlm(model=f'stub-{model}', latency=latency)
+    from google.adk.models import Gemini
+
+    from service.agents import model_client
+
+    # Keep-alive, HTTP/2 and pool limits for the model's HTTP client (see model_client.py).
+    return model_client.use_pool(Gemini(model=model, retry_options=get_retry_config(),
+                                        base_url=os.getenv(model_client.BASE_URL_ENV)))
+
+
+def get_model(model: str = DEFAULT_MODEL, priority: int = INTERACTIVE):
+    """Returns the shared model object for `model` (Gemini, or its stub, see MODEL_BACKEND_ENV), creating it on first use.
+
+    Its requests are queued at `priority` in the model scheduler; agents doing background work
+    pass BACKGROUND so that interactive turns go first.
+    """
+    instance = _models.get((model, priority))
+    if instance is None:
+        with _models_lock:
+            instance = _models.get((model, priority))
+            if instance is None:
+                from service.agents.scheduled_model import ScheduledLlm
+
+                llm = _models.get(model)
+                if llm is None:
+                    llm = _models[model] = _build_model(model)
+                instance = _models[(model, priority)] = ScheduledLlm(
+                    model=llm.model, llm=llm, scheduler=get_model_scheduler(), priority=priority)
+    return instance
+
+
+def build_times() -> dict:
+    """Seconds spent building each lazily created object so far, by factory name."""
+    return dict(_build_times)
@@ -0,0 +1,206 @@
+import json
+import re
+
+from service.db.database import encode_cursor
+from service.tokens import estimate_tokens
+
+# Compact encoding of the database tools' results, which end up in the prompt of every following
+# model call of the turn. Lists of rows become a table: the column names once, then one array per
+# row. On top of that:
+# - timestamps are cut to the minute (to the day when they are all at midnight)
+# - money is rounded to the cent; quantities (e.g. coins bought) keep their full precision
+# - a column holding the same value on every row is given once under "common"
+# - long strings repeated across rows are given once under "lookup", the rows holding their index
+# A result over its token budget keeps as many rows as fit and summarizes the others under
+# "truncated"; for pages, next_cursor then continues right after the last row kept.
+
+RESULT_TOKEN_BUDGET = 1500
+MIN_TABLE_ROWS = 2
+# Strings shorter than this cost about as much as their index in the lookup list.
+LOOKUP_MIN_CHARS = 5
+SUMMARY_MAX_VALUES = 10
+
+# Columns holding money, rounded to the cent. In investment rows `amount` is the quantity bought
+# (see _money_columns).
+MONEY_COLUMNS = frozenset({
+    'amount', 'price', 'total', 'income', 'expense', 'net', 'savings', 'average', 'median', 'volatility',
+    'cost_basis', 'average_price', 'current_price', 'market_value', 'pnl', 'total_cost_basis',
+    'total_market_value', 'total_pnl', 'total_income', 'total_expense', 'net_savings', 'average_monthly_income',
+    'average_monthly_expense', 'money_target', 'projected_wealth', 'required_monthly_contribution',
+    'monthly_net_mean', 'monthly_net_std', 'starting_savings', 'starting_holdings', 'holdings',
+})
+
+_TIMESTAMP = re.compile(r'^\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}(:\d{2}(\.\d+)?)?$')
+
+# For the instructions of agents reading these results.
+TABLE_FORMAT_NOTE = ("Tables in tool results list their `columns` once, then one array per row; `common` holds the "
+                     "columns that have the same value on every row, and a column listed in `lookup` holds indexes "
+                     "into that list of values.")
+
+
+def _json(value) -> str:
+    return json.dumps(value, default=str, separators=(',', ':'))
+
+
+def _money_columns(columns) -> frozenset:
+    """MONEY_COLUMNS, less `amount` in investment rows, where it is the quantity bought at `price`."""
+    return MONEY_COLUMNS - {'amount'} if 'price' in columns and 'title' in columns else MONEY_COLUMNS
+
+
+def _compact_number(value):
+    """Rounds an amount of money: to the cent, or to 4 significant digits under 1 (e.g. coin prices)."""
+    if isinstance(value, float):
+        return round(value, 2) if abs(value) >= 1 else float(f'{value:.4g}')
+    return value
+
+
+def _compact_cell(value, money: bool = False):
+    """Compacts a value; `money` tells whether numbers in it are amounts of money."""
+    if isinstance(value, dict):
+        columns = _money_columns(value)
+        return {key: _compact_cell(item, key in columns) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_compact_cell(item, money) for item in value]
+    return _compact_number(value) if money else value
+
+
+def _coarsen_timestamps(values: list) -> list:
+    """Minutes for a column of timestamps, or days when every one of them is at midnight."""
+    if not values or not all(isinstance(value, str) and _TIMESTAMP.match(value) for value in values):
+        return values
+    minutes = [value[:16].replace('T', ' ') for value in values]
+    if all(value.endswith('00:00') for value in minutes):
+        return [value[:10] for value in minutes]
+    return minutes
+
+
+def is_table(value) -> bool:
+    return isinstance(value, list) and len(value) >= MIN_TABLE_ROWS and all(isinstance(row, dict) for row in value)
+
+
+def encode_table(rows: list) -> dict:
+    """Encodes a list of dicts as {"columns", "rows"} plus, when they pay off, "common" and "lookup"."""
+    columns = list(dict.fromkeys(key for row in rows for key in row))
+    money = _money_columns(columns)
+    values = {column: _coarsen_timestamps([_compact_cell(row.get(column), column in money) for row in rows])
+              for column in columns}
+    table = {"columns": [], "rows": None}
+    common, lookup = {}, {}
+    for column in columns:
+        column_values = values[column]
+        first = column_values[0]
+        if len(rows) > 1 and all(value == first for value in column_values):
+            common[column] = first
+            continue
+        table["columns"].append(column)
+        strings = [value for value in column_values if isinstance(value, str)]
+        if len(strings) == len(column_values):
+            distinct = list(dict.fromkeys(strings))
+            saved = sum(len(value) for value in strings) - sum(len(value) for value in distinct) \
+                - len(strings) * len(str(len(distinct)))
+            if len(distinct) < len(strings) and saved > 0 and max(map(len, distinct)) >= LOOKUP_MIN_CHARS:
+                index = {value: position for position, value in enumerate(distinct)}
+                lookup[column] = distinct
+                values[column] = [index[value] for value in strings]
+    table["rows"] = [[values[column][position] for column in table["columns"]] for position in range(len(rows))]
+    if common:
+        table["common"] = common
+    if lookup:
+        table["lookup"] = lookup
+    return table
+
+
+def summarize_rows(rows: list) -> dict:
+    """Totals and ranges of rows left out of a result, so the model still knows what they hold."""
+    summary = {"rows": len(rows)}
+    if not rows:
+        return summary
+    columns = list(dict.fromkeys(key for row in rows for key in row))
+    money = _money_columns(columns)
+    for column in columns:
+        if column == 'id':
+            continue
+        values = [row.get(column) for row in rows if row.get(column) is not None]
+        if not values:
+            continue
+        if all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in values):
+            compact = _compact_number if column in money else (lambda value: value)
+            summary[column] = {"sum": compact(float(sum(values))), "min": compact(min(values)),
+                               "max": compact(max(values))}
+        elif all(isinstance(value, str) for value in values):
+            coarse = _coarsen_timestamps(values)
+            if coarse is not values:
+                summary[column] = {"from": min(coarse), "to": max(coarse)}
+            else:
+                counts = {}
+                for value in values:
+                    counts[value] = counts.get(value, 0) + 1
+                if len(counts) <= SUMMARY_MAX_VALUES:
+                    summary[column] = counts
+    return summary
+
+
+def encode_rows(rows: list, budget: int, hint: str = None) -> tuple:
+    """Encodes `rows` within `budget` tokens; returns the table and how many rows it kept.
+
+    At least one row is always kept, even when it alone is over the budget.
+    """
+    table = encode_table(rows) if len(rows) >= MIN_TABLE_ROWS else {"rows": [_compact_cell(row) for row in rows]}
+    if len(rows) <= 1 or estimate_tokens(_json(table)) <= budget:
+        return table, len(rows)
+
+    def truncated(kept: int) -> dict:
+        kept_rows = rows[:kept]
+        result = encode_table(kept_rows) if kept >= MIN_TABLE_ROWS else {"rows": [_compact_cell(r) for r in kept_rows]}
+        result["truncated"] = {"omitted": summarize_rows(rows[kept:]), **({"hint": hint} if hint else {})}
+        return result
+
+    # The largest prefix of rows (at least one) that fits together with the summary of the rest.
+    low, high = 1, len(rows) - 1
+    while low < high:
+        middle = (low + high + 1) // 2
+        if estimate_tokens(_json(truncated(middle))) <= budget:
+            low = middle
+        else:
+            high = middle - 1
+    return truncated(low), low
+
+
+def compact_result(result: dict, budget: int = RESULT_TOKEN_BUDGET) -> dict:
+    """Encodes every list of rows in a tool result as a table, truncating the largest ones to fit `budget`."""
+    tables = []  # (container, key, rows)
+
+    def encode(value: dict) -> dict:
+        # Builds new dicts: results may be shared with a cache and must not be modified.
+        encoded = {}
+        for key, item in value.items():
+            if is_table(item):
+                encoded[key] = encode_table(item)
+                tables.append((encoded, key, item))
+            else:
+                encoded[key] = encode(item) if isinstance(item, dict) else item
+        return encoded
+
+    result = encode(result)
+    for container, key, rows in sorted(tables, key=lambda table: -len(_json(table[0][table[1]]))):
+        excess = estimate_tokens(_json(result)) - budget
+        if excess <= 0:
+            break
+        own = estimate_tokens(_json(container[key]))
+        container[key], _ = encode_rows(rows, max(own - excess, 0), hint="Ask for a narrower range to see them.")
+    return result
+
+
+def compact_page(page: dict, budget: int = RESULT_TOKEN_BUDGET) -> dict:
+    """A tool result for one page of database.get_*_page(), as a table within `budget` tokens.
+
+    When rows have to be dropped, the returned next_cursor starts right after the last row kept,
+    so following it loses nothing.
+    """
+    items = page["items"]
+    table, kept = encode_rows(items, budget, hint="They come next when calling again with next_cursor.")
+    next_cursor = page["next_cursor"]
+    if kept < len(items):
+        last = items[kept - 1]
+        next_cursor = encode_cursor(last['created_at'], last['id'])
+    return {"status": "success", "data": table, "next_cursor": next_cursor}
@@ -0,0 +1,43 @@
+from service.agents.registry import get_model, lazy_singleton
+
+ROOT_AGENT_INSTRUCTION = """You are a helpful financial assistant. you are responsible to help user to make better investment to reach their goals.
+                        Your crucial rules:
+                        1- if user send greeting message say how can i help you?
+                        2- if user ask out of topic question answer very short
+                        3- Tell a short tip to user after every expense
+                        4- suggest best investments to user based on current market data, goals and income amount
+                        5- Answer Straight to the user investment questions and offer direct answer,
+                        For example:
+                            what is best investment for next year:
+                                Correct answer: BTC or Gold
+                                Wrong answer: I cannot offer advice. Predicting the future market is impossible and goes against my guidelines as a financial assistant.
+                        You are high risk Financial assistant, tell the investment signal to the user based the market data,
+                        do not limit your self
+                        Your tools:
+                        1. For simple database tasks (adding/retrieving data), use the `root_database_agent`.
+                        2. For  market data lookups (like the current price of an asset,future prediction), use the `coinapi_toolset` .
+                            Never say  cannot provide real-time market data
+                        3. For complex questions that require financial advise, a plan to reach a goal, or suggestions , use the `adviser_agent`.
+                        Summary of the earlier conversation (older messages are no longer shown):
+                        {conversation_summary?}
+                        """
+
+
+@lazy_singleton
+def get_root_agent():
+    """The Financial_Assistant agent the runner talks to; it delegates to the database and adviser agents."""
+    from google.adk import Agent
+    from service.agents.adviser_agent import get_adviser_agent
+    from service.agents.database_agent import get_database_agent
+    from service.market.sessions import get_market_toolset
+
+    agent = Agent(
+        name="Financial_Assistant",
+        model=get_model(),
+        description="A financial assistant help users to manage their finances.",
+        instruction=ROOT_AGENT_INSTRUCTION,
+        tools=[get_market_toolset()],
+        sub_agents=[get_database_agent(), get_adviser_agent()],
+    )  # ✅ ONLY put actual tools here, not agents
+    print("✅ Root Agent defined.")
+    return agent
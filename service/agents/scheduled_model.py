@@ -0,0 +1,68 @@
+from typing import AsyncGenerator
+
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from pydantic import Field
+
+from service.agents.model_scheduler import INTERACTIVE, ModelScheduler
+from service.agents.stub_model import prompt_chars
+from service.tracing import current_span
+
+# Expected response size when the request does not cap it, for the token-per-minute bucket; the
+# real count replaces the estimate once the response reports its usage.
+ESTIMATED_RESPONSE_TOKENS = 500
+
+
+def estimate_tokens(llm_request: LlmRequest) -> int:
+    config = llm_request.config
+    response_tokens = (config.max_output_tokens if config else None) or ESTIMATED_RESPONSE_TOKENS
+    return (prompt_chars(llm_request) + 3) // 4 + response_tokens
+
+
+class ScheduledLlm(BaseLlm):
+    """Sends every request of the wrapped model through the process-wide ModelScheduler.
+
+    The wrapped model must not retry on its own (see registry.get_retry_config): retries are the
+    scheduler's, so that they respect the shared limits. Responses are collected while the slot is
+    held and handed to the caller afterwards, so tool calls run by the caller never hold a slot.
+    """
+
+    llm: BaseLlm
+    scheduler: ModelScheduler = Field(exclude=True)
+    priority: int = INTERACTIVE
+
+    @classmethod
+    def supported_models(cls) -> list[str]:
+        return []
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        scheduler = self.scheduler
+        estimate = estimate_tokens(llm_request)
+        span = current_span()
+        for attempt in range(scheduler.max_attempts):
+            async with scheduler.slot(self.priority, estimate) as waited:
+                if span is not None:
+                    span.add('scheduler.wait_ms', round(waited * 1000, 1))
+                responses = []
+                try:
+                    async for response in self.llm.generate_content_async(llm_request, stream):
+                        responses.append(response)
+                except Exception as e:
+                    if not scheduler.should_retry(e, attempt):
+                        raise
+                    delay = scheduler.backoff(attempt, e)
+                else:
+                    scheduler.succeeded()
+                    usage = responses[-1].usage_metadata if responses else None
+                    if usage is not None:
+                        scheduler.record_usage(estimate, usage.total_token_count or (
+                            (usage.prompt_token_count or 0) + (usage.candidates_token_count or 0)))
+                    break
+            if span is not None:
+                span.add('scheduler.retries')
+            await scheduler.retry_wait(delay)
+        for response in responses:
+            yield response
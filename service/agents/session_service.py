@@ -0,0 +1,120 @@
+import json
+import uuid
+from typing import Any, Optional
+
+from google.adk.events import Event
+from google.adk.sessions import BaseSessionService, Session
+from google.adk.sessions.base_session_service import GetSessionConfig, ListSessionsResponse
+
+from service.db.async_database import run_db
+from service.db.session_store import SessionStore, SUMMARY_LINE_CHARS
+from service.tokens import estimate_tokens
+
+# ADK session service on top of service/db/session_store.py, replacing InMemoryRunner's
+# in-memory sessions: sessions survive restarts and their stored history is compacted to a
+# token budget (see SessionStore).
+
+# Agent outputs (output_key) that also live in the session state. The full value is kept there
+# once; the copy in the stored event is cut to a preview so it isn't replayed on every later turn.
+OUTPUT_STATE_KEYS = ('database_result', 'market_data_result')
+OUTPUT_PREVIEW_CHARS = 300
+
+
+def _event_text(event: Event) -> str:
+    if not event.content or not event.content.parts:
+        return ''
+    texts = []
+    for part in event.content.parts:
+        if part.text and not getattr(part, 'thought', False):
+            texts.append(part.text)
+        elif part.function_call:
+            texts.append(f"[called {part.function_call.name}]")
+    return ' '.join(texts).strip()
+
+
+def _summary_line(event: Event) -> Optional[str]:
+    """One line describing the event for the rolling summary, or None for tool plumbing."""
+    text = ' '.join(_event_text(event).split())
+    if not text or text.startswith('[called transfer_to_agent'):
+        return None
+    if len(text) > SUMMARY_LINE_CHARS:
+        text = text[:SUMMARY_LINE_CHARS - 1] + '…'
+    return f"{event.author}: {text}"
+
+
+def _storable_event(event: Event) -> Event:
+    """The event as it is written to disk: agent outputs that are kept in the state are shortened."""
+    delta = event.actions.state_delta if event.actions else None
+    keys = [key for key in OUTPUT_STATE_KEYS if delta and key in delta]
+    if not keys:
+        return event
+    stored = event.model_copy(deep=True)
+    for key in keys:
+        value = stored.actions.state_delta.pop(key)
+        text = value if isinstance(value, str) else json.dumps(value, default=str)
+        if stored.content and stored.content.parts and len(text) > OUTPUT_PREVIEW_CHARS:
+            for part in stored.content.parts:
+                if part.text and part.text.strip() == text.strip():
+                    part.text = f"{text[:OUTPUT_PREVIEW_CHARS]}… (full result in state '{key}')"
+    return stored
+
+
+class SqliteSessionService(BaseSessionService):
+    """Persistent, compacting session service backed by SQLite."""
+
+    def __init__(self, store: SessionStore = None):
+        super().__init__()
+        self.store = store or SessionStore()
+
+    @staticmethod
+    def _to_session(row: dict) -> Session:
+        return Session(
+            id=row['id'],
+            app_name=row['app_name'],
+            user_id=row['user_id'],
+            state=row['state'],
+            events=[Event.model_validate_json(event) for event in row['events']],
+            last_update_time=row['update_time'],
+        )
+
+    async def create_session(self, *, app_name: str, user_id: str, state: Optional[dict[str, Any]] = None,
+                             session_id: Optional[str] = None) -> Session:
+        session_id = session_id.strip() if session_id and session_id.strip() else uuid.uuid4().hex
+        row = await run_db(self.store.create_session, app_name, user_id, session_id, state)
+        return self._to_session(row)
+
+    async def get_session(self, *, app_name: str, user_id: str, session_id: str,
+                          config: Optional[GetSessionConfig] = None) -> Optional[Session]:
+        row = await run_db(
+            self.store.get_session, app_name, user_id, session_id,
+            config.num_recent_events if config else None,
+            config.after_timestamp if config else None,
+        )
+        return self._to_session(row) if row is not None else None
+
+    async def list_sessions(self, *, app_name: str, user_id: Optional[str] = None) -> ListSessionsResponse:
+        rows = await run_db(self.store.list_sessions, app_name, user_id)
+        return ListSessionsResponse(sessions=[self._to_session(row) for row in rows])
+
+    async def delete_session(self, *, app_name: str, user_id: str, session_id: str) -> None:
+        await run_db(self.store.delete_session, app_name, user_id, session_id)
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        if event.partial:
+            return event
+        # Updates the in-memory session the runner is working with (state and events).
+        event = await super().append_event(session=session, event=event)
+        session.last_update_time = event.timestamp
+        stored = _storable_event(event)
+        content_json = stored.content.model_dump_json(exclude_none=True) if stored.content else ''
+        await run_db(
+            self.store.append_event, session.app_name, session.user_id, session.id,
+            stored.model_dump_json(exclude_none=True), event.invocation_id, event.timestamp,
+            estimate_tokens(content_json),
+            dict(event.actions.state_delta) if event.actions and event.actions.state_delta else None,
+            _summary_line(event),
+        )
+        return event
+
+    def stats(self) -> dict:
+        return self.store.stats()
@@ -0,0 +1,141 @@
+import asyncio
+import re
+import statistics
+import threading
+from typing import AsyncGenerator, Optional
+
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+
+# Stand-in for Gemini used to load test and benchmark locally: no network, no API key, no quota.
+# It is deterministic and follows a small script so that the agent tree is exercised the way the
+# real model would: the root agent transfers to root_database_agent or adviser_agent, agents call
+# their database or market tools, and every agent ends with a text answer once it has a tool result.
+# Selected with ASSISTANT_MODEL_BACKEND=stub (see registry.get_model).
+
+STUB_LATENCY = 0.05
+PROMPT_SAMPLES = 10000
+
+# (pattern on the user's message, tool to call, arguments); the first rule whose tool the agent
+# has (and, for transfers, whose target agent it is allowed to transfer to) wins.
+STUB_TOOL_RULES = (
+    (r'\b(advice|advise|plan|suggest|should|recommend)\b', 'transfer_to_agent', {'agent_name': 'adviser_agent'}),
+    (r'\b(goals?)\b', 'GetAllGoals', {}),
+    (r'\b(investments|portfolio)\b', 'GetAllInvestments', {}),
+    (r'\b(transactions?|spent|spend|expenses?|income|show|list|add)\b', 'GetAllTransactions', {}),
+    (r'\b(goals?|investments|transactions?|spent|spend|expenses?|income|show|list|add)\b',
+     'transfer_to_agent', {'agent_name': 'root_database_agent'}),
+    (r'\b(price|market|bitcoin|btc|eth|crypto|coins?|invest\w*)\b', 'get_simple_price',
+     {'ids': 'bitcoin,ethereum', 'vs_currencies': 'usd'}),
+)
+_COMPILED_RULES = [(re.compile(pattern, re.IGNORECASE), tool, args) for pattern, tool, args in STUB_TOOL_RULES]
+
+_stats_lock = threading.Lock()
+_stats = {"calls": 0, "tool_calls": 0, "prompt_chars": []}
+
+
+def _text_of(content) -> str:
+    return ''.join(part.text or '' for part in content.parts or () if part.text)
+
+
+def _last_user_text(llm_request: LlmRequest) -> str:
+    # Skips the "For context: ..." messages ADK inserts for other agents' events.
+    for content in reversed(llm_request.contents or []):
+        if content.role == 'user' and content.parts:
+            text = _text_of(content)
+            if text.strip() and not text.startswith('For context:'):
+                return text
+    return ''
+
+
+def _system_instruction(llm_request: LlmRequest) -> str:
+    instruction = llm_request.config.system_instruction if llm_request.config else None
+    if instruction is None:
+        return ''
+    return instruction if isinstance(instruction, str) else _text_of(instruction)
+
+
+def prompt_chars(llm_request: LlmRequest) -> int:
+    """Size of everything sent to the model for `llm_request`: instruction, history and tool declarations."""
+    size = len(_system_instruction(llm_request))
+    size += sum(len(content.model_dump_json(exclude_none=True)) for content in llm_request.contents or [])
+    for tool in (llm_request.config.tools or []) if llm_request.config else []:
+        size += len(tool.model_dump_json(exclude_none=True)) if hasattr(tool, 'model_dump_json') else 0
+    return size
+
+
+def _pick_tool_call(llm_request: LlmRequest, text: str) -> Optional[tuple]:
+    tools = llm_request.tools_dict or {}
+    instruction = _system_instruction(llm_request)
+    for pattern, tool, args in _COMPILED_RULES:
+        if tool not in tools or not pattern.search(text):
+            continue
+        if tool == 'transfer_to_agent' and (
+                args['agent_name'] not in instruction or f'name is "{args["agent_name"]}"' in instruction):
+            continue  # not a target this agent knows about, or the agent itself
+        return tool, args
+    return None
+
+
+def stub_stats() -> dict:
+    """Model calls made so far and the prompt sizes they carried."""
+    with _stats_lock:
+        sizes = sorted(_stats["prompt_chars"])
+    return {
+        "calls": _stats["calls"],
+        "tool_calls": _stats["tool_calls"],
+        "prompt_chars_p50": statistics.median(sizes) if sizes else None,
+        "prompt_chars_p95": sizes[min(int(len(sizes) * 0.95), len(sizes) - 1)] if sizes else None,
+        "prompt_chars_max": sizes[-1] if sizes else None,
+    }
+
+
+def reset_stub_stats():
+    with _stats_lock:
+        _stats.update(calls=0, tool_calls=0, prompt_chars=[])
+
+
+class StubLlm(BaseLlm):
+    """A scripted model: calls the tool a rule picks for the user's message, then answers in text."""
+
+    latency: float = STUB_LATENCY
+
+    @classmethod
+    def supported_models(cls) -> list[str]:
+        return [r'stub-.*']
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        size = prompt_chars(llm_request)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        last = llm_request.contents[-1] if llm_request.contents else None
+        responses = [part.function_response for part in (last.parts or ()) if part.function_response] if last else []
+        text = _last_user_text(llm_request)
+        call = None if responses else _pick_tool_call(llm_request, text)
+        with _stats_lock:
+            _stats["calls"] += 1
+            _stats["tool_calls"] += call is not None
+            if len(_stats["prompt_chars"]) < PROMPT_SAMPLES:
+                _stats["prompt_chars"].append(size)
+
+        if call is not None:
+            name, args = call
+            part = types.Part(function_call=types.FunctionCall(name=name, args=dict(args)))
+        elif responses:
+            names = ', '.join(response.name for response in responses)
+            result_chars = sum(len(str(response.response)) for response in responses)
+            part = types.Part(text=f"[stub] Answer to '{text[:80]}' from {names} ({result_chars} chars of results).")
+        else:
+            part = types.Part(text=f"[stub] {text}")
+        # Reported like Gemini's, at about 4 characters per token.
+        response_chars = len(part.text) if part.text else len(str(part.function_call.args))
+        usage = types.GenerateContentResponseUsageMetadata(
+            prompt_token_count=(size + 3) // 4,
+            candidates_token_count=(response_chars + 3) // 4,
+        )
+        yield LlmResponse(content=types.Content(role='model', parts=[part]), usage_metadata=usage)
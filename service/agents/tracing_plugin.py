@@ -0,0 +1,100 @@
+import json
+from typing import Any, Optional
+
+from google.adk.agents.base_agent import BaseAgent
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.adk.plugins.base_plugin import BasePlugin
+from google.adk.tools.base_tool import BaseTool
+from google.adk.tools.tool_context import ToolContext
+
+from service.market.cache import CachedTool
+from service.tracing import tracer
+
+# Runner plugin opening a span for every agent run, model call and tool call of a turn (see
+# service/tracing.py). Only registered when tracing is enabled, so it costs nothing otherwise.
+
+
+def _payload_size(value) -> int:
+    try:
+        return len(json.dumps(value, default=str))
+    except (TypeError, ValueError):
+        return len(repr(value))
+
+
+class TracingPlugin(BasePlugin):
+    def __init__(self, name: str = 'tracing'):
+        super().__init__(name=name)
+        self._spans = {}
+
+    def _begin(self, key, name: str, kind: str, **attributes):
+        span = tracer.begin(name, kind, **attributes)
+        if span is not None:
+            self._spans[key] = span
+
+    def _end(self, key, error: BaseException = None, **attributes):
+        span = self._spans.pop(key, None)
+        if span is not None:
+            span.set(**attributes)
+            tracer.end(span, error)
+
+    async def before_agent_callback(self, *, agent: BaseAgent, callback_context: CallbackContext) -> None:
+        self._begin(('agent', callback_context.invocation_id, agent.name), agent.name, 'agent')
+
+    async def after_agent_callback(self, *, agent: BaseAgent, callback_context: CallbackContext) -> None:
+        self._end(('agent', callback_context.invocation_id, agent.name))
+
+    async def before_model_callback(self, *, callback_context: CallbackContext,
+                                    llm_request: LlmRequest) -> Optional[LlmResponse]:
+        contents = sum(len(content.model_dump_json(exclude_none=True)) for content in llm_request.contents or [])
+        self._begin(('model', callback_context.invocation_id, callback_context.agent_name),
+                    f"model {callback_context.agent_name}", 'model', model=llm_request.model,
+                    agent=callback_context.agent_name, **{'prompt.contents_bytes': contents,
+                                                          'prompt.tools': len(llm_request.tools_dict or {})})
+        return None
+
+    async def after_model_callback(self, *, callback_context: CallbackContext,
+                                   llm_response: LlmResponse) -> Optional[LlmResponse]:
+        if llm_response.partial:
+            return None
+        usage = llm_response.usage_metadata
+        self._end(
+            ('model', callback_context.invocation_id, callback_context.agent_name),
+            **{'tokens.prompt': usage.prompt_token_count if usage else None,
+               'tokens.response': usage.candidates_token_count if usage else None,
+               'tokens.cached': usage.cached_content_token_count if usage else None,
+               'response.bytes': _payload_size(llm_response.content.model_dump(exclude_none=True))
+               if llm_response.content else 0,
+               'response.error_code': llm_response.error_code},
+        )
+        return None
+
+    async def on_model_error_callback(self, *, callback_context: CallbackContext, llm_request: LlmRequest,
+                                      error: Exception) -> Optional[LlmResponse]:
+        self._end(('model', callback_context.invocation_id, callback_context.agent_name), error)
+        return None
+
+    async def before_tool_callback(self, *, tool: BaseTool, tool_args: dict[str, Any],
+                                   tool_context: ToolContext) -> Optional[dict]:
+        self._begin(('tool', tool_context.function_call_id), tool.name, 'tool',
+                    agent=tool_context.agent_name, mcp=isinstance(tool, CachedTool),
+                    **{'args.bytes': _payload_size(tool_args)})
+        return None
+
+    async def after_tool_callback(self, *, tool: BaseTool, tool_args: dict[str, Any], tool_context: ToolContext,
+                                  result: dict) -> Optional[dict]:
+        status = result.get('status') if isinstance(result, dict) else None
+        self._end(('tool', tool_context.function_call_id), **{'result.bytes': _payload_size(result),
+                                                              'result.status': status})
+        return None
+
+    async def on_tool_error_callback(self, *, tool: BaseTool, tool_args: dict[str, Any], tool_context: ToolContext,
+                                     error: Exception) -> Optional[dict]:
+        self._end(('tool', tool_context.function_call_id), error)
+        return None
+
+
+def tracing_plugins() -> list:
+    """Plugins to pass to the Runner: the TracingPlugin if tracing is enabled, else none."""
+    return [TracingPlugin()] if tracer.enabled else []
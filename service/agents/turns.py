@@ -0,0 +1,46 @@
+from dataclasses import dataclass, field
+
+from service.agents.database_agent import DATABASE_TOOLS, MARKET_TOOLS
+
+# Helpers for reading what happened during one runner turn from its events.
+
+DATABASE_TOOL_NAMES = frozenset(tool.__name__ for tool in DATABASE_TOOLS)
+MARKET_TOOL_NAMES = frozenset(tool.__name__ for tool in MARKET_TOOLS)
+# Function calls that only move control between agents.
+CONTROL_FUNCTIONS = frozenset({'transfer_to_agent'})
+MARKET_AGENTS = frozenset({'market_data_agent'})
+
+
+@dataclass
+class TurnSummary:
+    response: str = ""
+    agents: list = field(default_factory=list)
+    tools: list = field(default_factory=list)
+
+    @property
+    def route(self) -> str:
+        """The agents that took part, in order, e.g. 'Financial_Assistant>adviser_agent>...'."""
+        return '>'.join(self.agents)
+
+    @property
+    def uses_market(self) -> bool:
+        """Whether the answer depends on live market data (market agent, market tool or any non-database tool)."""
+        return bool(MARKET_AGENTS.intersection(self.agents)) or any(
+            tool in MARKET_TOOL_NAMES or (tool not in DATABASE_TOOL_NAMES and tool not in CONTROL_FUNCTIONS)
+            for tool in self.tools
+        )
+
+
+def summarize_turn(events) -> TurnSummary:
+    """Collects the route, the tools called and the final text response from a turn's events."""
+    summary = TurnSummary()
+    for event in events or ():
+        if event.author and event.author != 'user' and event.author not in summary.agents:
+            summary.agents.append(event.author)
+        for call in event.get_function_calls():
+            summary.tools.append(call.name)
+        if event.is_final_response() and event.content and event.content.parts:
+            text = ''.join(part.text or '' for part in event.content.parts if not getattr(part, 'thought', False))
+            if text.strip():
+                summary.response = text
+    return summary
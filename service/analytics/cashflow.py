@@ -0,0 +1,218 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+
+from service.db import database
+
+# Cash-flow trend analysis done in NumPy instead of by the model reading raw rows. The whole
+# transaction history is loaded once into columnar arrays (epoch seconds, amounts and an income
+# mask) and kept until the next write to the database (data_version changes), so repeated
+# questions only pay for the vectorized bucketing and statistics.
+
+PERIODS = ('month', 'week')
+DEFAULT_WINDOW = 3
+# Periods listed in the result; the statistics use every complete period in the range.
+MAX_LISTED_PERIODS = 24
+# A trend smaller than this share of the average per period is reported as flat.
+FLAT_TREND_RATIO = 0.01
+
+# Arrays of the most recently used databases kept in memory; beyond this many, the least recently
+# used are dropped (like the connection pools beyond database.MAX_OPEN_POOLS).
+MAX_CACHED_DATABASES = 32
+
+_ROW_DTYPE = np.dtype([('epoch', 'i8'), ('income', '?'), ('cents', 'i8')])
+
+
+@dataclass(frozen=True)
+class CashflowArrays:
+    epoch: np.ndarray  # int64 seconds, ascending
+    amount: np.ndarray  # float64, always positive
+    income: np.ndarray  # bool, False for expenses
+    data_version: int
+
+
+_arrays = OrderedDict()  # database path -> CashflowArrays, least recently used first
+_arrays_lock = threading.Lock()
+_stats = {"loads": 0, "hits": 0, "load_seconds": 0.0}
+
+
+def _load_arrays() -> CashflowArrays:
+    with database.get_db_connection() as conn:
+        # One read transaction, so the version, the count and the rows all come from the same
+        # snapshot even while other connections write.
+        conn.execute('BEGIN')
+        data_version = conn.execute('SELECT version FROM data_version WHERE id = 1').fetchone()[0]
+        count = conn.execute('SELECT COUNT(*) FROM transaction_history').fetchone()[0]
+        # Rows are stored as epoch seconds and integer cents, so they load without any conversion.
+        cursor = conn.execute(
+            "SELECT created_ts, type = 'income', amount_cents FROM transaction_history ORDER BY created_ts"
+        )
+        rows = np.fromiter(map(tuple, cursor), dtype=_ROW_DTYPE, count=count)
+    return CashflowArrays(rows['epoch'].copy(), np.abs(rows['cents']) / 100, rows['income'].copy(), data_version)
+
+
+def get_arrays() -> CashflowArrays:
+    """Returns the current database's transactions as arrays, reloading them only after a write."""
+    path = database.current_database()
+    version = database.get_data_version()
+    with _arrays_lock:
+        cached = _arrays.get(path)
+        if cached is not None and cached.data_version == version:
+            _arrays.move_to_end(path)
+            _stats["hits"] += 1
+            return cached
+        started = time.perf_counter()
+        cached = _arrays[path] = _load_arrays()
+        _arrays.move_to_end(path)
+        while len(_arrays) > MAX_CACHED_DATABASES:
+            _arrays.popitem(last=False)
+        _stats["loads"] += 1
+        _stats["load_seconds"] += time.perf_counter() - started
+        return cached
+
+
+def clear_cache():
+    with _arrays_lock:
+        _arrays.clear()
+
+
+def cache_stats() -> dict:
+    return {"databases": len(_arrays), **_stats, "load_seconds": round(_stats["load_seconds"], 3)}
+
+
+def _epoch_of(date_str: str) -> int:
+    """Epoch seconds of a 'YYYY-MM-DD' date at 00:00 UTC, like SQLite's strftime('%s', ...)."""
+    return int(np.datetime64(date_str, 's').astype(np.int64))
+
+
+def _bucket_of(epoch: np.ndarray, period: str) -> np.ndarray:
+    """Period number of each timestamp: months since 1970-01, or Monday-based weeks since 1969-12-29."""
+    if period == 'month':
+        return epoch.astype('datetime64[s]').astype('datetime64[M]').astype(np.int64)
+    return (epoch // 86400 + 3) // 7
+
+
+def _bucket_label(bucket: int, period: str) -> str:
+    if period == 'month':
+        return str(np.datetime64(int(bucket), 'M'))
+    return str(np.datetime64(int(bucket) * 7 - 3, 'D'))
+
+
+def _rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """Trailing mean over `window` periods; NaN until there are enough."""
+    result = np.full(values.shape, np.nan)
+    if window <= len(values):
+        cumulative = np.cumsum(np.insert(values, 0, 0.0))
+        result[window - 1:] = (cumulative[window:] - cumulative[:-window]) / window
+    return result
+
+
+def _trend(values: np.ndarray) -> dict:
+    """Least-squares slope per period, and its direction relative to the mean."""
+    if len(values) < 2:
+        return {"slope_per_period": 0.0, "direction": "not enough data"}
+    slope = float(np.polyfit(np.arange(len(values), dtype=np.float64), values, 1)[0])
+    mean = float(values.mean())
+    ratio = slope / abs(mean) if mean else 0.0
+    direction = 'flat' if abs(ratio) < FLAT_TREND_RATIO else ('rising' if slope > 0 else 'falling')
+    return {"slope_per_period": round(slope, 2), "slope_percent_of_mean": round(ratio * 100, 2),
+            "direction": direction}
+
+
+def _series_stats(values: np.ndarray) -> dict:
+    if not len(values):
+        return {"average": 0.0, "median": 0.0, "volatility": 0.0, "coefficient_of_variation": None}
+    mean = float(values.mean())
+    std = float(values.std(ddof=1)) if len(values) > 1 else 0.0
+    return {"average": round(mean, 2), "median": round(float(np.median(values)), 2), "volatility": round(std, 2),
+            "coefficient_of_variation": round(std / mean, 3) if mean else None}
+
+
+def _rounded(values: np.ndarray) -> list:
+    return [None if value != value else round(value, 2) for value in values.tolist()]
+
+
+def cashflow_analytics(period: str = 'month', window: int = DEFAULT_WINDOW, start_date: str = None,
+                       end_date: str = None, now: float = None, arrays: CashflowArrays = None) -> dict:
+    """Income, expenses and net savings per period, with rolling averages, volatility and trends.
+
+    `start_date`/`end_date` ('YYYY-MM-DD', both included) narrow the range. Periods without any
+    transaction count as zero. The current, unfinished period is listed (marked partial) but left
+    out of the averages, volatility and trends, which it would otherwise drag down.
+    """
+    if period not in PERIODS:
+        raise ValueError(f"period must be one of {', '.join(PERIODS)}")
+    window = max(int(window), 1)
+    arrays = arrays if arrays is not None else get_arrays()
+    epoch, amount, income = arrays.epoch, arrays.amount, arrays.income
+
+    # Times are sorted, so the date range is two binary searches instead of a mask over everything;
+    # the end is the start of the day after end_date, which is included.
+    lo = np.searchsorted(epoch, _epoch_of(start_date)) if start_date else 0
+    hi = np.searchsorted(epoch, _epoch_of(end_date) + 86400) if end_date else len(epoch)
+    epoch, amount, income = epoch[lo:hi], amount[lo:hi], income[lo:hi]
+    if not len(epoch):
+        return {"period": period, "transactions": 0, "periods": [], "message": "No transactions in this range."}
+
+    buckets = _bucket_of(epoch, period)
+    now_bucket = int(_bucket_of(np.array([int(now if now is not None else time.time())], dtype=np.int64), period)[0])
+    first = int(buckets[0])
+    # Periods up to now (or to the end of the range) are included even if they have no transaction.
+    last = int(buckets[-1]) if end_date else max(int(buckets[-1]), now_bucket)
+    index = buckets - first
+    size = last - first + 1
+    income_per = np.bincount(index, weights=np.where(income, amount, 0.0), minlength=size)
+    expense_per = np.bincount(index, weights=np.where(income, 0.0, amount), minlength=size)
+    count_per = np.bincount(index, minlength=size)
+    net_per = income_per - expense_per
+
+    current = now_bucket - first
+    complete = slice(0, min(current, size)) if current >= 0 else slice(0, size)
+    complete_income, complete_expense = income_per[complete], expense_per[complete]
+    complete_net = net_per[complete]
+
+    total_income, total_expense = float(income_per.sum()), float(expense_per.sum())
+    listed = slice(max(size - MAX_LISTED_PERIODS, 0), size)
+    rolling_expense = _rolling_mean(expense_per, window)
+    rolling_net = _rolling_mean(net_per, window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        savings_rate_per = np.where(income_per > 0, net_per / income_per * 100, np.nan)
+    incomes, expenses, nets = _rounded(income_per), _rounded(expense_per), _rounded(net_per)
+    savings_rates = _rounded(savings_rate_per)
+    rolling_expenses, rolling_nets = _rounded(rolling_expense), _rounded(rolling_net)
+
+    return {
+        "period": period,
+        "window": window,
+        "transactions": int(len(epoch)),
+        "first_transaction": str(np.datetime64(int(epoch[0]), 's')).replace('T', ' '),
+        "last_transaction": str(np.datetime64(int(epoch[-1]), 's')).replace('T', ' '),
+        "complete_periods": int(len(complete_expense)),
+        "total_income": round(total_income, 2),
+        "total_expense": round(total_expense, 2),
+        "savings_rate_percent": round((total_income - total_expense) / total_income * 100, 2) if total_income else None,
+        "income": {**_series_stats(complete_income), "trend": _trend(complete_income)},
+        "expense": {**_series_stats(complete_expense), "trend": _trend(complete_expense)},
+        "net": {**_series_stats(complete_net), "trend": _trend(complete_net)},
+        "periods": [
+            {"period": _bucket_label(first + position, period),
+             "income": incomes[position],
+             "expense": expenses[position],
+             "net": nets[position],
+             "transactions": int(count_per[position]),
+             "savings_rate_percent": savings_rates[position],
+             f"expense_avg_{window}": rolling_expenses[position],
+             f"net_avg_{window}": rolling_nets[position],
+             **({"partial": True} if position == current else {})}
+            for position in range(listed.start, listed.stop)
+        ],
+    }
+
+
+def get_cashflow_analytics(period: str = 'month', window: int = DEFAULT_WINDOW, start_date: str = None,
+                           end_date: str = None) -> dict:
+    """cashflow_analytics() on the current database, using the cached arrays."""
+    return cashflow_analytics(period, window, start_date, end_date)
@@ -0,0 +1,187 @@
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from service.db import database
+
+# Monte Carlo projection of every goal at once. Each simulated path starts from the user's current
+# wealth (database.wealth_basis: cash, and investment holdings at cost basis), adds a monthly net
+# cash flow drawn from their own history and grows the holdings with random monthly returns. A goal
+# is reached on a path if the wealth on that path covers its money_target in the month of its
+# date_target. All goals share the same paths, and each is measured against the whole wealth, like
+# the goal progress of the profile snapshot.
+
+DEFAULT_SIMULATIONS = 2000
+MAX_SIMULATIONS = 20000
+# Cap on simulations x simulated months, so a long horizon gets fewer paths.
+MAX_SIMULATED_VALUES = 2_000_000
+# Paths are simulated in chunks of about this many values (~8 MB per float64 array), keeping only
+# the goals' target months of each chunk.
+CHUNK_VALUES = 1_000_000
+DEFAULT_ANNUAL_RETURN = 0.05
+DEFAULT_ANNUAL_VOLATILITY = 0.15
+# Probability the required monthly contribution is computed for.
+DEFAULT_CONFIDENCE = 0.8
+# Complete months of history the net cash flow distribution is estimated from.
+HISTORY_MONTHS = 36
+MAX_HORIZON_MONTHS = 600
+SEED = 7
+
+# Results of the most recently used databases; beyond this many, the least recently used is dropped.
+MAX_CACHED_RESULTS = 64
+
+_results = OrderedDict()  # database path -> (key, result), least recently used first
+_results_lock = threading.Lock()
+_stats = {"runs": 0, "hits": 0, "run_seconds": 0.0}
+
+
+def _month_number(date_str: str) -> int:
+    """Months since 1970-01 of a 'YYYY-MM...' string."""
+    return int(np.datetime64(str(date_str)[:7], 'M').astype(np.int64))
+
+
+def _load_inputs(current_month: int) -> dict:
+    with database.get_db_connection() as conn:
+        months = conn.execute('SELECT month, type, total_cents FROM monthly_totals').fetchall()
+        goals = conn.execute('SELECT id, note, date_target, money_target FROM goal ORDER BY date_target').fetchall()
+        holdings = conn.execute(
+            'SELECT COALESCE(SUM(cost_basis_cents), 0) / 100.0 FROM investment_positions').fetchone()[0]
+
+    # Net cash flow of the last complete months, zero for months without any transaction.
+    first = current_month - HISTORY_MONTHS
+    net = np.zeros(HISTORY_MONTHS)
+    saved, oldest = 0.0, current_month
+    for row in months:
+        amount = (row['total_cents'] if row['type'] == 'income' else -row['total_cents']) / 100
+        saved += amount
+        month = _month_number(row['month'])
+        oldest = min(oldest, month)
+        if first <= month < current_month:
+            net[month - first] += amount
+    history = net[max(oldest, first) - first:]
+    wealth = database.wealth_basis(saved, float(holdings))
+    return {"goals": [dict(goal) for goal in goals], "savings": wealth["cash"], "holdings": wealth["invested"],
+            "history": history}
+
+
+def simulate_goals(goals: list, savings: float, holdings: float, history: np.ndarray, current_month: int,
+                   annual_return: float = DEFAULT_ANNUAL_RETURN,
+                   annual_volatility: float = DEFAULT_ANNUAL_VOLATILITY,
+                   simulations: int = DEFAULT_SIMULATIONS, confidence: float = DEFAULT_CONFIDENCE,
+                   seed: int = SEED) -> dict:
+    """Probability of reaching each goal on time, and the monthly saving needed to reach it.
+
+    `history` is the net cash flow of past months, whose mean and standard deviation drive the
+    simulated monthly contributions. Holdings follow a geometric Brownian motion with the given
+    annual return and volatility; savings earn nothing. The number of paths is capped so that
+    simulations x months stays within MAX_SIMULATED_VALUES.
+    """
+    months_left = np.array([_month_number(goal['date_target']) - current_month for goal in goals], dtype=np.int64)
+    targets = np.array([float(goal['money_target']) for goal in goals])
+    horizon = int(min(max(months_left.max(initial=0), 1), MAX_HORIZON_MONTHS))
+    simulations = min(max(int(simulations), 100), MAX_SIMULATIONS, MAX_SIMULATED_VALUES // horizon)
+    confidence = min(max(float(confidence), 0.5), 0.99)
+    mean = float(history.mean()) if len(history) else 0.0
+    std = float(history.std(ddof=1)) if len(history) > 1 else 0.0
+
+    rng = np.random.default_rng(seed)
+    drift = (annual_return - annual_volatility ** 2 / 2) / 12
+    # Column t of a chunk holds month t + 1; a goal due this month (or overdue) reads today's values.
+    columns = np.clip(months_left, 0, horizon)
+    now = columns == 0
+    take = np.maximum(columns - 1, 0)
+    chunk = max(CHUNK_VALUES // horizon, 1)
+    cash_parts, portfolio_parts = [], []
+    for start in range(0, simulations, chunk):
+        size = min(chunk, simulations - start)
+        contributions = rng.normal(mean, std, size=(size, horizon)) if std else np.full((size, horizon), mean)
+        shocks = rng.normal(drift, annual_volatility / np.sqrt(12), size=(size, horizon))
+        # Only the goals' months of the cumulative sums are kept: (size, goals) per chunk.
+        cash = savings + np.cumsum(contributions, axis=1, out=contributions)[:, take]
+        portfolio = holdings * np.exp(np.cumsum(shocks, axis=1, out=shocks)[:, take])
+        cash[:, now], portfolio[:, now] = savings, holdings
+        cash_parts.append(cash)
+        portfolio_parts.append(portfolio)
+    cash, portfolio = np.vstack(cash_parts), np.vstack(portfolio_parts)
+
+    # Wealth of every path in each goal's target month, (simulations, goals).
+    wealth = cash + portfolio
+    reached = (wealth >= targets).mean(axis=0)
+    # Without contributions, what the holdings and savings alone are worth with `confidence` probability.
+    base = np.quantile(savings + portfolio, 1 - confidence, axis=0)
+    percentiles = np.percentile(wealth, [10, 50, 90], axis=0)
+
+    projections = []
+    for index, goal in enumerate(goals):
+        months = int(months_left[index])
+        shortfall = max(targets[index] - base[index], 0.0)
+        projections.append({
+            "id": goal['id'],
+            "note": goal['note'],
+            "money_target": goal['money_target'],
+            "date_target": str(goal['date_target'])[:10],
+            "months_left": max(months, 0),
+            "probability_percent": round(float(reached[index]) * 100, 1),
+            "projected_wealth": {"p10": round(float(percentiles[0, index]), 2),
+                                 "median": round(float(percentiles[1, index]), 2),
+                                 "p90": round(float(percentiles[2, index]), 2)},
+            "required_monthly_contribution": round(shortfall / months, 2) if months > 0 else round(shortfall, 2),
+            **({"note_on_horizon": f"Projected up to {MAX_HORIZON_MONTHS} months only."}
+               if months > MAX_HORIZON_MONTHS else {}),
+            **({"overdue": True} if months < 0 else {}),
+        })
+
+    return {
+        "simulations": simulations,
+        "confidence_percent": round(confidence * 100),
+        "assumptions": {"annual_return": annual_return, "annual_volatility": annual_volatility,
+                        "monthly_net_mean": round(mean, 2), "monthly_net_std": round(std, 2),
+                        "months_of_history": int(len(history))},
+        "starting_savings": round(savings, 2),
+        "starting_holdings": round(holdings, 2),
+        "goals": projections,
+    }
+
+
+def get_goal_projections(annual_return: float = DEFAULT_ANNUAL_RETURN,
+                         annual_volatility: float = DEFAULT_ANNUAL_VOLATILITY,
+                         simulations: int = DEFAULT_SIMULATIONS, confidence: float = DEFAULT_CONFIDENCE) -> dict:
+    """simulate_goals() on the current database; the result is reused until the data or the month changes.
+
+    The simulation runs outside the lock, so one user's projection never waits for another's.
+    """
+    path = database.current_database()
+    current_month = _month_number(time.strftime('%Y-%m', time.gmtime()))
+    key = (database.get_data_version(), current_month, annual_return, annual_volatility, simulations, confidence)
+    with _results_lock:
+        cached = _results.get(path)
+        if cached is not None and cached[0] == key:
+            _results.move_to_end(path)
+            _stats["hits"] += 1
+            return cached[1]
+    started = time.perf_counter()
+    inputs = _load_inputs(current_month)
+    if not inputs["goals"]:
+        result = {"goals": [], "message": "No goals to project."}
+    else:
+        result = simulate_goals(inputs["goals"], inputs["savings"], inputs["holdings"], inputs["history"],
+                                current_month, annual_return, annual_volatility, simulations, confidence)
+    with _results_lock:
+        _results[path] = (key, result)
+        _results.move_to_end(path)
+        while len(_results) > MAX_CACHED_RESULTS:
+            _results.popitem(last=False)
+        _stats["runs"] += 1
+        _stats["run_seconds"] += time.perf_counter() - started
+    return result
+
+
+def clear_cache():
+    with _results_lock:
+        _results.clear()
+
+
+def cache_stats() -> dict:
+    return {"databases": len(_results), **_stats, "run_seconds": round(_stats["run_seconds"], 3)}
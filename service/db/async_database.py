@@ -0,0 +1,120 @@
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from service.db import database, importer
+from service.tracing import tracer
+
+# Async counterparts of the functions in service/db/database.py, for code running inside the
+# asyncio event loop (agent tools, the runner). Every query runs on a dedicated, bounded thread
+# pool whose workers borrow connections from their own pool group, so a slow query never blocks
+# the loop and never starves the synchronous callers (scripts, CLI) of connections.
+
+DB_EXECUTOR_WORKERS = 4
+DB_POOL_GROUP = 'async'
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Returns the database executor, creating it on first use."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=DB_EXECUTOR_WORKERS,
+                    thread_name_prefix='db-async',
+                    initializer=database.use_pool_group,
+                    initargs=(DB_POOL_GROUP, DB_EXECUTOR_WORKERS),
+                )
+    return _executor
+
+
+def shutdown_executor(wait: bool = True):
+    """Stops the database executor; it is recreated on the next call."""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=wait)
+
+
+async def run_db(func, *args, **kwargs):
+    """Runs a synchronous database function on the database executor and awaits its result."""
+    loop = asyncio.get_running_loop()
+    # Carry the caller's context variables over to the worker thread, like asyncio.to_thread does.
+    call = functools.partial(contextvars.copy_context().run, func, *args, **kwargs)
+    with tracer.span(f"db {getattr(func, '__name__', 'call')}", 'db') as span:
+        result = await loop.run_in_executor(get_executor(), call)
+        if span is not None and isinstance(result, list):
+            span.set(rows=len(result))
+        return result
+
+
+def _async_version(func):
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await run_db(func, *args, **kwargs)
+    return wrapper
+
+
+init_db = _async_version(database.init_db)
+migrate = _async_version(database.migrate)
+ensure_user_database = _async_version(database.ensure_user_database)
+get_data_version = _async_version(database.get_data_version)
+
+add_goal = _async_version(database.add_goal)
+get_all_goals = _async_version(database.get_all_goals)
+
+add_transaction = _async_version(database.add_transaction)
+add_transactions = _async_version(database.add_transactions)
+get_all_transactions = _async_version(database.get_all_transactions)
+get_transactions_by_type = _async_version(database.get_transactions_by_type)
+get_transaction_totals_by_date_range = _async_version(database.get_transaction_totals_by_date_range)
+get_transaction_totals_from_history = _async_version(database.get_transaction_totals_from_history)
+get_category_totals = _async_version(database.get_category_totals)
+
+add_investment = _async_version(database.add_investment)
+add_investments = _async_version(database.add_investments)
+get_all_investments = _async_version(database.get_all_investments)
+get_investment_positions = _async_version(database.get_investment_positions)
+
+get_transactions_page = _async_version(database.get_transactions_page)
+get_investments_page = _async_version(database.get_investments_page)
+
+get_profile_snapshot = _async_version(database.get_profile_snapshot)
+import_records = _async_version(importer.import_records)
+rebuild_aggregates = _async_version(database.rebuild_aggregates)
+
+
+async def aiter_transactions(transaction_type: str = None, start_date: str = None, end_date: str = None,
+                             batch_size: int = database.STREAM_BATCH_SIZE):
+    """Async version of database.iter_transactions: each batch is fetched on the database executor."""
+    if transaction_type and transaction_type not in ('income', 'expense'):
+        raise ValueError("Transaction type must be 'income' or 'expense'")
+    filters = (('type', transaction_type),) if transaction_type else ()
+    cursor = None
+    while True:
+        items, cursor = await run_db(database._fetch_keyset_page, 'transaction_history', batch_size, cursor,
+                                     filters, start_date, end_date)
+        for item in items:
+            yield item
+        if cursor is None:
+            return
+
+
+async def aiter_investments(start_date: str = None, end_date: str = None,
+                            batch_size: int = database.STREAM_BATCH_SIZE):
+    """Async version of database.iter_investments."""
+    cursor = None
+    while True:
+        items, cursor = await run_db(database._fetch_keyset_page, 'invest', batch_size, cursor, (),
+                                     start_date, end_date)
+        for item in items:
+            yield item
+        if cursor is None:
+            return
@@ -1,64 +1,683 @@
+import base64
+import contextvars
+import hashlib
+import json
+import os
+import queue
+import re
 import sqlite3
-from datetime import datetime
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from itertools import islice
 
 DATABASE_NAME = 'my_database.db'
 
+# --- Connection Pool ---
+
+POOL_MAX_SIZE = 8
+POOL_TIMEOUT = 10.0
+# sqlite3 keeps an LRU of compiled statements per connection; since pooled
+# connections live for the whole process, the queries below are prepared once.
+STATEMENT_CACHE_SIZE = 256
+
+PRAGMAS = (
+    'PRAGMA journal_mode = WAL',
+    'PRAGMA synchronous = NORMAL',
+    'PRAGMA cache_size = -16000',  # negative value is KiB, i.e. ~16 MB
+    'PRAGMA mmap_size = 268435456',
+    'PRAGMA temp_store = MEMORY',
+    'PRAGMA busy_timeout = 5000',
+)
+
+
+class ConnectionPool:
+    """A bounded pool of long-lived SQLite connections to a single database file.
+
+    Readers borrow any idle connection and run concurrently thanks to WAL.
+    Writers additionally take the pool's write lock so that only one
+    transaction holds the database write lock at a time.
+    """
+
+    def __init__(self, database: str, max_size: int = POOL_MAX_SIZE, timeout: float = POOL_TIMEOUT,
+                 write_lock: threading.Lock = None):
+        self.database = database
+        self.max_size = max_size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._write_lock = write_lock or threading.Lock()
+        self._created = 0
+        self._closed = False
+        self._stats = {"acquired": 0, "waited": 0, "writes": 0}
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.database,
+            timeout=self.timeout,
+            check_same_thread=False,
+            cached_statements=STATEMENT_CACHE_SIZE,
+        )
+        # Allows accessing columns by name
+        conn.row_factory = sqlite3.Row
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def _acquire(self):
+        if self._closed:
+            raise sqlite3.ProgrammingError(f"Connection pool for {self.database} is closed")
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_create = self._created < self.max_size
+                if can_create:
+                    self._created += 1
+            if can_create:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                with self._lock:
+                    self._stats["waited"] += 1
+                try:
+                    conn = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    raise TimeoutError(
+                        f"No database connection available after {self.timeout}s (pool size {self.max_size})"
+                    ) from None
+        with self._lock:
+            self._stats["acquired"] += 1
+        return conn
+
+    def _release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        if self._closed:
+            conn.close()
+        else:
+            self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        """Borrows a connection; pending changes are committed on success and rolled back on error."""
+        conn = self._acquire()
+        try:
+            yield conn
+            if conn.in_transaction:
+                conn.commit()
+        finally:
+            self._release(conn)
+
+    @contextmanager
+    def transaction(self):
+        """Borrows a connection for a write transaction, serialized against other writers in this process."""
+        with self._write_lock, self.connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            with self._lock:
+                self._stats["writes"] += 1
+            yield conn
+
+    def stats(self) -> dict:
+        """Returns a snapshot of the pool's counters."""
+        with self._lock:
+            idle = self._idle.qsize()
+            return {
+                "database": self.database,
+                "max_size": self.max_size,
+                "open": self._created,
+                "idle": idle,
+                "in_use": self._created - idle,
+                **self._stats,
+            }
+
+    def close(self):
+        """Closes every idle connection; borrowed ones are closed when they are returned."""
+        self._closed = True
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+
+DEFAULT_POOL_GROUP = 'default'
+# Upper bound on open pools; in server mode every user has a database file of their own.
+MAX_OPEN_POOLS = 64
+
+# Pools are grouped so that a set of threads (e.g. the async layer's executor) can own its
+# connections instead of competing for the default ones. Writers to the same database
+# share one write lock whatever group their connection comes from.
+_pools = OrderedDict()  # (group, database) -> ConnectionPool, least recently used first
+_pool_group_sizes = {DEFAULT_POOL_GROUP: POOL_MAX_SIZE}
+_write_locks = {}
+_pools_lock = threading.Lock()
+_thread_state = threading.local()
+# Database used by get_pool() when none is given. A context variable, so that each server
+# request (and the executor threads it hands work to, see async_database.run_db) sees its own.
+_current_database = contextvars.ContextVar('current_database', default=None)
+
+
+def use_pool_group(group: str, max_size: int = POOL_MAX_SIZE):
+    """Makes the calling thread borrow connections from the pools of `group`.
+
+    Meant to be used as a thread pool `initializer` for worker threads.
+    """
+    with _pools_lock:
+        _pool_group_sizes.setdefault(group, max_size)
+    _thread_state.group = group
+
+
+@contextmanager
+def use_database(database: str):
+    """Makes `database` the default for get_pool() (and so for every function below) inside the `with` block."""
+    token = _current_database.set(database)
+    try:
+        yield database
+    finally:
+        _current_database.reset(token)
+
+
+def current_database() -> str:
+    return _current_database.get() or DATABASE_NAME
+
+
+def get_pool(database: str = None) -> ConnectionPool:
+    """Returns the calling thread's pool for `database` (defaults to current_database()), creating it on first use.
+
+    Beyond MAX_OPEN_POOLS, the least recently used pools with no borrowed connection are closed.
+    """
+    key = (getattr(_thread_state, 'group', DEFAULT_POOL_GROUP), database or current_database())
+    evicted = []
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            write_lock = _write_locks.setdefault(key[1], threading.Lock())
+            pool = _pools[key] = ConnectionPool(
+                key[1], max_size=_pool_group_sizes.get(key[0], POOL_MAX_SIZE), write_lock=write_lock
+            )
+            for old_key in list(_pools)[:max(len(_pools) - MAX_OPEN_POOLS, 0)]:
+                if _pools[old_key].stats()["in_use"] == 0:
+                    evicted.append(_pools.pop(old_key))
+        else:
+            _pools.move_to_end(key)
+    for old in evicted:
+        old.close()
+    return pool
+
+
+def get_pool_stats() -> list:
+    """Returns the counters of every open pool."""
+    return [{"group": group, **pool.stats()} for (group, _), pool in list(_pools.items())]
+
+
+def close_all_pools():
+    """Closes all pools, e.g. on shutdown or before deleting a database file."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+# --- Per-user Databases ---
+
+# In server mode every user gets a database file of their own, so one user's data can never
+# leak into another user's answers and their writes don't contend for the same write lock.
+USER_DATABASE_DIR = 'user_data'
+_initialized_databases = set()
+
+
+def user_database_path(user_id: str, directory: str = USER_DATABASE_DIR) -> str:
+    """Returns the database file of `user_id`; the hash suffix keeps ids that sanitize alike apart."""
+    safe_id = re.sub(r'[^A-Za-z0-9_-]', '_', user_id)[:40]
+    digest = hashlib.sha1(user_id.encode()).hexdigest()[:8]
+    return os.path.join(directory, f'{safe_id}-{digest}.db')
+
+
+def ensure_user_database(user_id: str, directory: str = USER_DATABASE_DIR) -> str:
+    """Returns the database file of `user_id`, creating and initializing it the first time."""
+    path = user_database_path(user_id, directory)
+    if path not in _initialized_databases:
+        os.makedirs(directory, exist_ok=True)
+        with use_database(path):
+            init_db(verbose=False)
+        _initialized_databases.add(path)
+    return path
+
+
 def get_db_connection():
-    """Establishes a connection to the SQLite database and returns the connection object."""
-    conn = sqlite3.connect(DATABASE_NAME)
-    # Allows accessing columns by name
-    conn.row_factory = sqlite3.Row
-    return conn
-
-def init_db():
-    """Initializes the database and creates tables if they don't exist."""
+    """Borrows a pooled connection to the SQLite database, for use in a `with` block."""
+    return get_pool().connection()
+
+
+def get_db_transaction():
+    """Borrows a pooled connection holding the write lock, for use in a `with` block."""
+    return get_pool().transaction()
+
+
+def init_db(verbose: bool = True):
+    """Creates the database, or brings an existing one up to the latest schema version."""
+    applied = migrate()
+    if verbose:
+        if applied:
+            print(f"Database migrated to schema version {applied[-1]} ({len(applied)} migrations applied)")
+        else:
+            print("Database schema is up to date")
+
+
+# --- Schema Migrations ---
+
+# The schema_version table holds the last migration applied to the database. init_db() applies the
+# pending ones in order, so an existing database is upgraded in place on startup and a new one is
+# built by replaying them all. A migration is (version, description, backfill, upgrade):
+# - backfill(conn, chunk_size), optional, converts the next chunk of data and returns True once
+#   done. Each chunk is a short write transaction of its own, so readers and writers keep going
+#   while a large table is converted, and an interrupted backfill resumes where it stopped.
+# - upgrade(conn) finishes the change in a single transaction, together with the version bump.
+# Never edit a migration that has shipped: add a new one.
+
+MIGRATION_CHUNK_SIZE = 5000
+_migration_locks = {}
+
+
+def _schema_version(conn) -> int:
+    return conn.execute('SELECT version FROM schema_version WHERE id = 1').fetchone()[0]
+
+
+def get_schema_version() -> int:
+    """Returns the version of the last migration applied to the current database."""
     with get_db_connection() as conn:
-        cursor = conn.cursor()
-
-        # Create 'goal' table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS goal (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                note TEXT NOT NULL,
-                date_target TIMESTAMP NOT NULL,
-                money_target INTEGER NOT NULL
-            );
-        ''')
-
-        # Create 'transaction' table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS transaction_history (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                type TEXT NOT NULL CHECK(type IN ('expense', 'income')),
-                amount REAL NOT NULL,
-                created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
-            );
-        ''')
-
-        # Create 'invest' table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS invest (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                amount REAL NOT NULL,
-                title TEXT NOT NULL,
-                price REAL NOT NULL,
-                created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
-            );
-        ''')
-
-        conn.commit()
-        print("Database initialized and tables created successfully!")
+        return _schema_version(conn)
+
+
+def migrate(chunk_size: int = MIGRATION_CHUNK_SIZE) -> list:
+    """Applies the pending migrations to the current database; returns the versions applied."""
+    with _pools_lock:
+        lock = _migration_locks.setdefault(current_database(), threading.Lock())
+    applied = []
+    with lock:
+        with get_db_transaction() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    version INTEGER NOT NULL
+                );
+            ''')
+            conn.execute('INSERT OR IGNORE INTO schema_version (id, version) VALUES (1, 0)')
+            current = _schema_version(conn)
+        for version, _, backfill, upgrade in MIGRATIONS:
+            if version <= current:
+                continue
+            done = backfill is None
+            while not done:
+                with get_db_transaction() as conn:
+                    # Another process may have finished this migration in the meantime.
+                    done = _schema_version(conn) >= version or backfill(conn, chunk_size)
+            with get_db_transaction() as conn:
+                if _schema_version(conn) < version:
+                    upgrade(conn)
+                    conn.execute('UPDATE schema_version SET version = ? WHERE id = 1', (version,))
+                    applied.append(version)
+            current = version
+    return applied
+
+
+def _create_data_version_triggers(conn):
+    for table in VERSIONED_TABLES:
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            conn.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_{event.lower()}_data_version
+                AFTER {event} ON {table}
+                BEGIN
+                    UPDATE data_version SET version = version + 1 WHERE id = 1;
+                END;
+            ''')
+
+
+def _upgrade_baseline(conn):
+    """Version 1: the schema as it was before migrations, created if missing."""
+    cursor = conn.cursor()
+
+    # Create 'goal' table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS goal (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            note TEXT NOT NULL,
+            date_target TIMESTAMP NOT NULL,
+            money_target INTEGER NOT NULL
+        );
+    ''')
+
+    # Create 'transaction' table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS transaction_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            type TEXT NOT NULL CHECK(type IN ('expense', 'income')),
+            amount REAL NOT NULL,
+            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        );
+    ''')
+
+    # Covering index for per-type range scans: (type, created_at) seeks, amount is read from the index.
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_transaction_type_created_at
+        ON transaction_history (type, created_at, amount);
+    ''')
+
+    # Create 'daily_totals' rollup, one row per day and type, kept up to date by a trigger
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS daily_totals (
+            day TEXT NOT NULL,
+            type TEXT NOT NULL,
+            total_amount REAL NOT NULL DEFAULT 0,
+            transaction_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, type)
+        ) WITHOUT ROWID;
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_transaction_history_daily_totals
+        AFTER INSERT ON transaction_history
+        BEGIN
+            INSERT INTO daily_totals (day, type, total_amount, transaction_count)
+            VALUES (date(NEW.created_at), NEW.type, NEW.amount, 1)
+            ON CONFLICT (day, type) DO UPDATE SET
+                total_amount = total_amount + excluded.total_amount,
+                transaction_count = transaction_count + 1;
+        END;
+    ''')
+
+    # Create 'monthly_totals' rollup, feeding the monthly averages of the profile snapshot
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS monthly_totals (
+            month TEXT NOT NULL,
+            type TEXT NOT NULL,
+            total_amount REAL NOT NULL DEFAULT 0,
+            transaction_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (month, type)
+        ) WITHOUT ROWID;
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_transaction_history_monthly_totals
+        AFTER INSERT ON transaction_history
+        BEGIN
+            INSERT INTO monthly_totals (month, type, total_amount, transaction_count)
+            VALUES (strftime('%Y-%m', NEW.created_at), NEW.type, NEW.amount, 1)
+            ON CONFLICT (month, type) DO UPDATE SET
+                total_amount = total_amount + excluded.total_amount,
+                transaction_count = transaction_count + 1;
+        END;
+    ''')
+
+    # Create 'invest' table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS invest (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            amount REAL NOT NULL,
+            title TEXT NOT NULL,
+            price REAL NOT NULL,
+            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        );
+    ''')
+
+    # Keyset pagination walks (created_at, id) newest first; the rowid is implicitly the last index column.
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_transaction_created_at ON transaction_history (created_at);')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_invest_created_at ON invest (created_at);')
+
+    # Create 'investment_positions' rollup, one row per asset title
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS investment_positions (
+            title TEXT PRIMARY KEY,
+            quantity REAL NOT NULL DEFAULT 0,
+            cost_basis REAL NOT NULL DEFAULT 0,
+            lot_count INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID;
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_invest_positions
+        AFTER INSERT ON invest
+        BEGIN
+            INSERT INTO investment_positions (title, quantity, cost_basis, lot_count)
+            VALUES (NEW.title, NEW.amount, NEW.amount * NEW.price, 1)
+            ON CONFLICT (title) DO UPDATE SET
+                quantity = quantity + excluded.quantity,
+                cost_basis = cost_basis + excluded.cost_basis,
+                lot_count = lot_count + 1;
+        END;
+    ''')
+
+    # Create 'data_version' counter, bumped by every change to the user's data, so that caches
+    # of answers derived from it can tell exactly when they went stale.
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS data_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL
+        );
+    ''')
+    cursor.execute('INSERT OR IGNORE INTO data_version (id, version) VALUES (1, 0)')
+    _create_data_version_triggers(conn)
+
+
+# Version 2 stores money as integer cents and times as integer epoch seconds (UTC), and gives
+# transactions a category. Sums are exact, date filters compare integers and the rollups are
+# integer additions. Both tables are copied chunk by chunk into their new shape, then swapped in.
+_CREATE_TRANSACTION_HISTORY_V2 = '''
+    CREATE TABLE IF NOT EXISTS transaction_history_v2 (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        type TEXT NOT NULL CHECK(type IN ('expense', 'income')),
+        amount_cents INTEGER NOT NULL,
+        created_ts INTEGER NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS INTEGER)),
+        category TEXT NOT NULL DEFAULT 'uncategorized'
+    );
+'''
+# `price` stays REAL: unit prices of some assets are fractions of a cent. The cost of each lot,
+# which is what gets summed, is kept in cents.
+_CREATE_INVEST_V2 = '''
+    CREATE TABLE IF NOT EXISTS invest_v2 (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        amount REAL NOT NULL,
+        title TEXT NOT NULL,
+        price REAL NOT NULL,
+        cost_cents INTEGER NOT NULL,
+        created_ts INTEGER NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS INTEGER))
+    );
+'''
+# (table, its new version, columns of the new version, the same computed from the old columns).
+# Unparseable timestamps become 0 rather than aborting the migration.
+_V2_COPIES = (
+    ('transaction_history', 'transaction_history_v2', 'id, type, amount_cents, created_ts, category',
+     "id, type, CAST(ROUND(amount * 100) AS INTEGER), "
+     "COALESCE(CAST(strftime('%s', created_at) AS INTEGER), 0), 'uncategorized'"),
+    ('invest', 'invest_v2', 'id, amount, title, price, cost_cents, created_ts',
+     "id, amount, title, price, CAST(ROUND(amount * price * 100) AS INTEGER), "
+     "COALESCE(CAST(strftime('%s', created_at) AS INTEGER), 0)"),
+)
+
+
+def _copy_new_rows(conn, source: str, target: str, columns: str, select: str, limit: int = -1) -> int:
+    """Copies up to `limit` rows of `source` past the last id already in `target`; returns how many."""
+    last_id = conn.execute(f'SELECT COALESCE(MAX(id), 0) FROM {target}').fetchone()[0]
+    return conn.execute(
+        f'INSERT INTO {target} ({columns}) SELECT {select} FROM {source} WHERE id > ? ORDER BY id LIMIT ?',
+        (last_id, limit)
+    ).rowcount
+
+
+def _backfill_v2(conn, chunk_size: int) -> bool:
+    conn.execute(_CREATE_TRANSACTION_HISTORY_V2)
+    conn.execute(_CREATE_INVEST_V2)
+    for copy in _V2_COPIES:
+        if _copy_new_rows(conn, *copy, limit=chunk_size) == chunk_size:
+            return False
+    return True
+
+
+def _upgrade_v2(conn):
+    """Version 2: integer cents, epoch timestamps and transaction categories."""
+    cursor = conn.cursor()
+    for source, target, columns, select in _V2_COPIES:
+        # Rows written since the last backfill chunk; transactions and investments are append-only.
+        _copy_new_rows(conn, source, target, columns, select)
+        cursor.execute(f'DROP TABLE {source}')
+        cursor.execute(f'ALTER TABLE {target} RENAME TO {source}')
+
+    # Covering index for per-type range scans and per-category breakdowns.
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_transaction_type_created_ts
+        ON transaction_history (type, created_ts, amount_cents, category);
+    ''')
+    # Covering index for the totals of one category over a date range.
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_transaction_category_created_ts
+        ON transaction_history (category, created_ts, type, amount_cents);
+    ''')
+    # Keyset pagination walks (created_ts, id) newest first; the rowid is implicitly the last index column.
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_transaction_created_ts ON transaction_history (created_ts);')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_invest_created_ts ON invest (created_ts);')
+
+    # The rollups are recreated in cents and refilled from the converted rows.
+    for table in ('daily_totals', 'monthly_totals', 'investment_positions'):
+        cursor.execute(f'DROP TABLE IF EXISTS {table}')
+    cursor.execute('''
+        CREATE TABLE daily_totals (
+            day TEXT NOT NULL,
+            type TEXT NOT NULL,
+            total_cents INTEGER NOT NULL DEFAULT 0,
+            transaction_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, type)
+        ) WITHOUT ROWID;
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER trg_transaction_history_daily_totals
+        AFTER INSERT ON transaction_history
+        BEGIN
+            INSERT INTO daily_totals (day, type, total_cents, transaction_count)
+            VALUES (date(NEW.created_ts, 'unixepoch'), NEW.type, NEW.amount_cents, 1)
+            ON CONFLICT (day, type) DO UPDATE SET
+                total_cents = total_cents + excluded.total_cents,
+                transaction_count = transaction_count + 1;
+        END;
+    ''')
+    cursor.execute('''
+        CREATE TABLE monthly_totals (
+            month TEXT NOT NULL,
+            type TEXT NOT NULL,
+            total_cents INTEGER NOT NULL DEFAULT 0,
+            transaction_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (month, type)
+        ) WITHOUT ROWID;
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER trg_transaction_history_monthly_totals
+        AFTER INSERT ON transaction_history
+        BEGIN
+            INSERT INTO monthly_totals (month, type, total_cents, transaction_count)
+            VALUES (strftime('%Y-%m', NEW.created_ts, 'unixepoch'), NEW.type, NEW.amount_cents, 1)
+            ON CONFLICT (month, type) DO UPDATE SET
+                total_cents = total_cents + excluded.total_cents,
+                transaction_count = transaction_count + 1;
+        END;
+    ''')
+    cursor.execute('''
+        CREATE TABLE investment_positions (
+            title TEXT PRIMARY KEY,
+            quantity REAL NOT NULL DEFAULT 0,
+            cost_basis_cents INTEGER NOT NULL DEFAULT 0,
+            lot_count INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID;
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER trg_invest_positions
+        AFTER INSERT ON invest
+        BEGIN
+            INSERT INTO investment_positions (title, quantity, cost_basis_cents, lot_count)
+            VALUES (NEW.title, NEW.amount, NEW.cost_cents, 1)
+            ON CONFLICT (title) DO UPDATE SET
+                quantity = quantity + excluded.quantity,
+                cost_basis_cents = cost_basis_cents + excluded.cost_basis_cents,
+                lot_count = lot_count + 1;
+        END;
+    ''')
+    for _, _, query in _AGGREGATES:
+        cursor.execute(query)
+
+    # Dropping the old tables dropped their data_version triggers. Rows now carry categories, so
+    # cached answers are invalidated as well.
+    _create_data_version_triggers(conn)
+    cursor.execute('UPDATE data_version SET version = version + 1 WHERE id = 1')
+
+
+MIGRATIONS = (
+    (1, 'baseline tables, rollups and data_version', None, _upgrade_baseline),
+    (2, 'integer cents, epoch timestamps and transaction categories', _backfill_v2, _upgrade_v2),
+)
+
+# --- Data Version ---
+
+VERSIONED_TABLES = ('goal', 'transaction_history', 'invest')
+
+
+def get_data_version() -> int:
+    """Returns a counter that changes whenever a goal, transaction or investment is added, edited or deleted."""
+    with get_db_connection() as conn:
+        return conn.execute('SELECT version FROM data_version WHERE id = 1').fetchone()[0]
+
+# --- Amounts and Timestamps ---
+
+# Amounts are stored in integer cents and timestamps in integer epoch seconds (UTC). The functions
+# below take and return amounts in units and timestamps as 'YYYY-MM-DD HH:MM:SS' UTC strings.
+DEFAULT_CATEGORY = 'uncategorized'
+
+# Select lists presenting stored rows in that form.
+_ROW_COLUMNS = {
+    'transaction_history': "id, type, amount_cents / 100.0 AS amount, "
+                           "datetime(created_ts, 'unixepoch') AS created_at, category",
+    'invest': "id, amount, title, price, datetime(created_ts, 'unixepoch') AS created_at",
+}
+
+
+def to_cents(amount) -> int:
+    return int(round(float(amount) * 100))
+
+
+def to_epoch(value) -> int:
+    """Epoch seconds of a datetime or of its ISO text ('YYYY-MM-DD[ HH:MM:SS]'), naive values being UTC."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return int(value)
+    parsed = value if isinstance(value, datetime) else datetime.fromisoformat(str(value).strip().replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp())
+
+
+def _day_epoch(date_str: str) -> int:
+    """Epoch seconds of 00:00 UTC on the 'YYYY-MM-DD' day `date_str`."""
+    return to_epoch(datetime.strptime(date_str, '%Y-%m-%d'))
+
+
+def normalize_category(category) -> str:
+    """Lowercases and collapses the blanks of a category; no category is DEFAULT_CATEGORY."""
+    category = ' '.join(str(category or '').split()).lower()
+    return category or DEFAULT_CATEGORY
 
 # --- Goal Functions ---
 
 def add_goal(note: str, date_target: datetime, money_target: int):
     """Adds a new goal to the database."""
-    with get_db_connection() as conn:
+    with get_db_transaction() as conn:
         conn.execute(
             'INSERT INTO goal (note, date_target, money_target) VALUES (?, ?, ?)',
             (note, date_target, money_target)
         )
-        conn.commit()
 
 def get_all_goals():
     """Retrieves all goals from the database."""
@@ -68,39 +687,98 @@ def get_all_goals():
 
 # --- Transaction Functions ---
 
-def add_transaction(type: str, amount: float):
-    """Adds a new transaction (expense or income)."""
-    with get_db_connection() as conn:
-        conn.execute(
-            'INSERT INTO transaction_history (type, amount) VALUES (?, ?)',
-            (type, amount)
-        )
-        conn.commit()
+IMPORT_CHUNK_SIZE = 1000
+_INSERT_TRANSACTION = \
+    'INSERT INTO transaction_history (type, amount_cents, created_ts, category) VALUES (?, ?, ?, ?)'
+
+
+def _transaction_row(type: str, amount: float, created_at=None, category: str = None) -> tuple:
+    created_ts = to_epoch(created_at) if created_at is not None else int(time.time())
+    return type, to_cents(amount), created_ts, normalize_category(category)
+
+
+def add_transaction(type: str, amount: float, created_at: str = None, category: str = None):
+    """Adds a new transaction (expense or income), timestamped now unless `created_at` is given."""
+    with get_db_transaction() as conn:
+        conn.execute(_INSERT_TRANSACTION, _transaction_row(type, amount, created_at, category))
+
+
+def add_transactions(transactions, chunk_size: int = IMPORT_CHUNK_SIZE) -> int:
+    """Adds many transactions in a single write transaction and returns how many were inserted.
+
+    `transactions` is any iterable of (type, amount, created_at) or (type, amount, created_at,
+    category) tuples, `created_at` being a 'YYYY-MM-DD HH:MM:SS' UTC string or None for now. It
+    is consumed `chunk_size` rows at a time, so a generator is never materialized. The rollup
+    tables are updated by their triggers in the same transaction, and nothing is inserted if any
+    row fails.
+    """
+    inserted = 0
+    iterator = iter(transactions)
+    with get_db_transaction() as conn:
+        while True:
+            chunk = list(islice(iterator, chunk_size))
+            if not chunk:
+                break
+            conn.executemany(_INSERT_TRANSACTION, [_transaction_row(*row) for row in chunk])
+            inserted += len(chunk)
+    return inserted
 
 def get_all_transactions():
     """Retrieves all transactions from the database."""
     with get_db_connection() as conn:
-        transactions = conn.execute('SELECT * FROM transaction_history ORDER BY created_at DESC').fetchall()
+        transactions = conn.execute(
+            f"SELECT {_ROW_COLUMNS['transaction_history']} FROM transaction_history ORDER BY created_ts DESC"
+        ).fetchall()
         print(f"transactions: {transactions}")
         return [dict(row) for row in transactions]
 
 # --- Investment Functions ---
 
+_INSERT_INVESTMENT = 'INSERT INTO invest (amount, title, price, cost_cents, created_ts) VALUES (?, ?, ?, ?, ?)'
+
+
+def _investment_row(amount: float, title: str, price: float, created_at=None) -> tuple:
+    created_ts = to_epoch(created_at) if created_at is not None else int(time.time())
+    return amount, title, price, to_cents(amount * price), created_ts
+
+
 def add_investment(amount: float, title: str, price: float):
     """Adds a new investment to the database."""
-    with get_db_connection() as conn:
-        conn.execute(
-            'INSERT INTO invest (amount, title, price) VALUES (?, ?, ?)',
-            (amount, title, price)
-        )
-        conn.commit()
+    with get_db_transaction() as conn:
+        conn.execute(_INSERT_INVESTMENT, _investment_row(amount, title, price))
+
+
+def add_investments(investments) -> int:
+    """Adds many (amount, title, price, created_at) lots in a single write transaction; returns how many."""
+    rows = [_investment_row(*row) for row in investments]
+    with get_db_transaction() as conn:
+        conn.executemany(_INSERT_INVESTMENT, rows)
+    return len(rows)
 
 def get_all_investments():
     """Retrieves all investments from the database."""
     with get_db_connection() as conn:
-        investments = conn.execute('SELECT * FROM invest ORDER BY created_at DESC').fetchall()
+        investments = conn.execute(
+            f"SELECT {_ROW_COLUMNS['invest']} FROM invest ORDER BY created_ts DESC"
+        ).fetchall()
         return [dict(row) for row in investments]
 
+def get_investment_positions():
+    """Returns one row per asset with its quantity, cost basis, average price and number of lots.
+
+    Lots are summed from the investment_positions rollup; titles differing only in case or
+    surrounding blanks ('btc', 'BTC ') are the same asset.
+    """
+    with get_db_connection() as conn:
+        positions = conn.execute('''
+            SELECT MIN(title) AS title, SUM(quantity) AS quantity, SUM(cost_basis_cents) / 100.0 AS cost_basis,
+                   SUM(cost_basis_cents) / 100.0 / NULLIF(SUM(quantity), 0) AS average_price, SUM(lot_count) AS lots
+            FROM investment_positions
+            GROUP BY UPPER(TRIM(title))
+            ORDER BY cost_basis DESC
+        ''').fetchall()
+        return [dict(row) for row in positions]
+
 
 def get_transactions_by_type(transaction_type: str):
     """Retrieves all transactions of a specific type ('income' or 'expense')."""
@@ -108,30 +786,319 @@ def get_transactions_by_type(transaction_type: str):
         raise ValueError("Transaction type must be 'income' or 'expense'")
     with get_db_connection() as conn:
         transactions = conn.execute(
-            'SELECT * FROM transaction_history WHERE type = ? ORDER BY created_at DESC',
+            f"SELECT {_ROW_COLUMNS['transaction_history']} FROM transaction_history WHERE type = ? "
+            "ORDER BY created_ts DESC",
             (transaction_type,)
         ).fetchall()
         return [dict(row) for row in transactions]
 
 
+def _next_day(date_str: str) -> str:
+    """Returns the 'YYYY-MM-DD' string of the day after `date_str`."""
+    return (datetime.strptime(date_str, '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d')
+
+
+# Each rollup table, with the source table it is derived from and the query that recomputes it.
+_AGGREGATES = (
+    ('daily_totals', 'transaction_history', '''
+        INSERT INTO daily_totals (day, type, total_cents, transaction_count)
+        SELECT date(created_ts, 'unixepoch'), type, SUM(amount_cents), COUNT(*)
+        FROM transaction_history
+        GROUP BY date(created_ts, 'unixepoch'), type
+    '''),
+    ('monthly_totals', 'transaction_history', '''
+        INSERT INTO monthly_totals (month, type, total_cents, transaction_count)
+        SELECT strftime('%Y-%m', created_ts, 'unixepoch'), type, SUM(amount_cents), COUNT(*)
+        FROM transaction_history
+        GROUP BY strftime('%Y-%m', created_ts, 'unixepoch'), type
+    '''),
+    ('investment_positions', 'invest', '''
+        INSERT INTO investment_positions (title, quantity, cost_basis_cents, lot_count)
+        SELECT title, SUM(amount), SUM(cost_cents), COUNT(*)
+        FROM invest
+        GROUP BY title
+    '''),
+)
+
+
+def rebuild_aggregates():
+    """Recomputes every rollup table, e.g. after editing transaction_history or invest by hand."""
+    with get_db_transaction() as conn:
+        for table, _, query in _AGGREGATES:
+            conn.execute(f'DELETE FROM {table}')
+            conn.execute(query)
+
+
 def get_transaction_totals_by_date_range(start_date: str, end_date: str):
-    """Calculates the total income and expense within a given date range."""
+    """Calculates the total income and expense within a given date range (both ends inclusive).
+
+    Totals are read from the daily_totals rollup, so the cost depends on the number of days
+    in the range rather than on the number of transactions.
+    """
     with get_db_connection() as conn:
-        # The query sums up amounts for 'income' and 'expense' separately within the date range.
-        # The date() function in SQLite ensures we compare only the date part of the timestamp.
         totals = conn.execute('''
                               SELECT type,
-                                     SUM(amount) as total_amount
-                              FROM transaction_history
-                              WHERE
-                                  date (created_at) BETWEEN ?
-                                AND ?
-                              GROUP BY
-                                  type;
+                                     SUM(total_cents) as total_cents
+                              FROM daily_totals
+                              WHERE day BETWEEN ? AND ?
+                              GROUP BY type;
                               ''', (start_date, end_date)).fetchall()
-        # The result is a list of rows, e.g., [('income', 5000), ('expense', 2500)].
-        # We convert this into a more usable dictionary.
-        return {row['type']: row['total_amount'] for row in totals}
+        # The result is a list of rows, e.g., [('income', 500000), ('expense', 250000)].
+        # We convert this into a more usable dictionary of amounts.
+        return {row['type']: row['total_cents'] / 100 for row in totals}
+
+
+def get_transaction_totals_from_history(start_date: str, end_date: str):
+    """Same as get_transaction_totals_by_date_range, but summed from the raw transaction_history rows."""
+    # A half-open range of epoch seconds lets SQLite seek the (type, created_ts, amount_cents) index for each type.
+    start, end_exclusive = _day_epoch(start_date), _day_epoch(_next_day(end_date))
+    with get_db_connection() as conn:
+        totals = {}
+        for transaction_type in ('income', 'expense'):
+            total = conn.execute(
+                'SELECT SUM(amount_cents) FROM transaction_history WHERE type = ? AND created_ts >= ? AND created_ts < ?',
+                (transaction_type, start, end_exclusive)
+            ).fetchone()[0]
+            if total is not None:
+                totals[transaction_type] = total / 100
+        return totals
+
+
+def get_category_totals(start_date: str = None, end_date: str = None, transaction_type: str = 'expense',
+                        category: str = None):
+    """Totals per category of one transaction type, largest first, optionally for a date range and one category.
+
+    Returns a list of {"category", "total", "transactions"} rows.
+    """
+    if transaction_type not in ('income', 'expense'):
+        raise ValueError("Transaction type must be 'income' or 'expense'")
+    clauses, params = ['type = ?'], [transaction_type]
+    if category is not None:
+        clauses.append('category = ?')
+        params.append(normalize_category(category))
+    if start_date:
+        clauses.append('created_ts >= ?')
+        params.append(_day_epoch(start_date))
+    if end_date:
+        clauses.append('created_ts < ?')
+        params.append(_day_epoch(_next_day(end_date)))
+    with get_db_connection() as conn:
+        rows = conn.execute(
+            f"SELECT category, SUM(amount_cents) AS total_cents, COUNT(*) AS transactions FROM transaction_history "
+            f"WHERE {' AND '.join(clauses)} GROUP BY category ORDER BY total_cents DESC",
+            params
+        ).fetchall()
+    return [{"category": row['category'], "total": row['total_cents'] / 100, "transactions": row['transactions']}
+            for row in rows]
+
+
+# --- Paginated Retrieval ---
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+STREAM_BATCH_SIZE = 500
+
+
+def encode_cursor(created_at, row_id: int) -> str:
+    """Encodes the (created_at, id) keyset position of a row as an opaque cursor string."""
+    return base64.urlsafe_b64encode(json.dumps([to_epoch(created_at), row_id]).encode()).decode()
+
+
+def decode_cursor(cursor: str):
+    """Decodes a cursor produced by encode_cursor back into a (created_ts, id) tuple."""
+    try:
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        # Cursors handed out before timestamps were stored as epochs hold the 'YYYY-MM-DD HH:MM:SS' text.
+        return to_epoch(created_at), int(row_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+
+
+def _fetch_keyset_page(table: str, limit: int, cursor=None, filters=(), start_date=None, end_date=None):
+    """Fetches up to `limit` rows of `table` newest first, starting strictly after the `cursor` position.
+
+    `filters` is a sequence of (column, value) equality conditions. Dates are inclusive
+    'YYYY-MM-DD' bounds. Returns the rows and the cursor of the next page (None on the last page).
+    """
+    clauses, params = [], []
+    for column, value in filters:
+        clauses.append(f'{column} = ?')
+        params.append(value)
+    if start_date:
+        clauses.append('created_ts >= ?')
+        params.append(_day_epoch(start_date))
+    if end_date:
+        clauses.append('created_ts < ?')
+        params.append(_day_epoch(_next_day(end_date)))
+    if cursor:
+        clauses.append('(created_ts, id) < (?, ?)')
+        params.extend(decode_cursor(cursor))
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+    with get_db_connection() as conn:
+        # One extra row tells us whether another page exists without a COUNT(*).
+        rows = conn.execute(
+            f'SELECT {_ROW_COLUMNS[table]} FROM {table} {where} ORDER BY created_ts DESC, id DESC LIMIT ?',
+            (*params, limit + 1)
+        ).fetchall()
+    items = [dict(row) for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        last = items[-1]
+        next_cursor = encode_cursor(last['created_at'], last['id'])
+    return items, next_cursor
+
+
+def _clamp_page_size(limit) -> int:
+    return max(1, min(int(limit or DEFAULT_PAGE_SIZE), MAX_PAGE_SIZE))
+
+
+def get_transactions_page(limit: int = DEFAULT_PAGE_SIZE, cursor: str = None, transaction_type: str = None,
+                          start_date: str = None, end_date: str = None, category: str = None):
+    """Retrieves one page of transactions, newest first, optionally filtered by type, category and date range.
+
+    Returns a dictionary with the `items` of the page and the `next_cursor` to pass back for
+    the following page (None when there are no more transactions).
+    """
+    filters = ()
+    if transaction_type:
+        if transaction_type not in ('income', 'expense'):
+            raise ValueError("Transaction type must be 'income' or 'expense'")
+        filters = (('type', transaction_type),)
+    if category:
+        filters += (('category', normalize_category(category)),)
+    items, next_cursor = _fetch_keyset_page(
+        'transaction_history', _clamp_page_size(limit), cursor, filters, start_date, end_date
+    )
+    return {"items": items, "next_cursor": next_cursor}
+
+
+def get_investments_page(limit: int = DEFAULT_PAGE_SIZE, cursor: str = None, start_date: str = None,
+                         end_date: str = None):
+    """Retrieves one page of investments, newest first, optionally filtered by date range."""
+    items, next_cursor = _fetch_keyset_page('invest', _clamp_page_size(limit), cursor, (), start_date, end_date)
+    return {"items": items, "next_cursor": next_cursor}
+
+
+def iter_transactions(transaction_type: str = None, start_date: str = None, end_date: str = None,
+                      batch_size: int = STREAM_BATCH_SIZE):
+    """Yields transactions newest first, fetching `batch_size` rows at a time.
+
+    Each batch borrows a pooled connection only for the duration of its query, so a slow
+    consumer never pins a connection and at most one batch is held in memory.
+    """
+    if transaction_type and transaction_type not in ('income', 'expense'):
+        raise ValueError("Transaction type must be 'income' or 'expense'")
+    filters = (('type', transaction_type),) if transaction_type else ()
+    cursor = None
+    while True:
+        items, cursor = _fetch_keyset_page('transaction_history', batch_size, cursor, filters, start_date, end_date)
+        yield from items
+        if cursor is None:
+            return
+
+
+def iter_investments(start_date: str = None, end_date: str = None, batch_size: int = STREAM_BATCH_SIZE):
+    """Yields investments newest first, fetching `batch_size` rows at a time."""
+    cursor = None
+    while True:
+        items, cursor = _fetch_keyset_page('invest', batch_size, cursor, (), start_date, end_date)
+        yield from items
+        if cursor is None:
+            return
+
+
+# --- Profile Snapshot ---
+
+PROFILE_RECENT_TRANSACTIONS = 10
+
+
+def _month_span(first_month: str, last_month: str) -> int:
+    """Returns the number of calendar months from `first_month` to `last_month` ('YYYY-MM'), inclusive."""
+    first_year, first = map(int, first_month.split('-'))
+    last_year, last = map(int, last_month.split('-'))
+    return (last_year - first_year) * 12 + (last - first) + 1
+
+
+def wealth_basis(net_savings: float, invested: float) -> dict:
+    """The user's wealth: cash plus investments at cost basis.
+
+    Investments are recorded apart from transactions (never also as expenses), so the money that
+    bought them is part of the net savings: cash is only what the net savings hold beyond the cost
+    basis. Goal progress and goal projections both measure goals against this wealth.
+    """
+    cash = max(net_savings - invested, 0.0)
+    return {"cash": cash, "invested": invested, "total": cash + invested}
+
+
+def _goal_progress(goal: dict, saved: float, today: datetime) -> dict:
+    """Measures a goal against the user's wealth (see wealth_basis)."""
+    target = goal['money_target']
+    target_date = datetime.strptime(str(goal['date_target'])[:10], '%Y-%m-%d')
+    remaining = max(target - saved, 0)
+    months_left = max(_month_span(today.strftime('%Y-%m'), target_date.strftime('%Y-%m')) - 1, 0)
+    return {
+        "id": goal['id'],
+        "note": goal['note'],
+        "money_target": target,
+        "date_target": target_date.strftime('%Y-%m-%d'),
+        "progress_percent": round(min(saved / target, 1) * 100, 1) if target > 0 else 100.0,
+        "remaining_amount": round(remaining, 2),
+        "months_left": months_left,
+        "required_monthly_saving": round(remaining / months_left, 2) if months_left else round(remaining, 2),
+    }
+
+
+def get_profile_snapshot(recent_count: int = PROFILE_RECENT_TRANSACTIONS):
+    """Builds a compact overview of the user's finances from the rollup tables.
+
+    Reads one row per month, goal and asset plus the `recent_count` newest transactions, so the
+    cost and size of the result do not grow with the length of the transaction history.
+    """
+    with get_db_connection() as conn:
+        months = conn.execute('SELECT month, type, total_cents FROM monthly_totals ORDER BY month').fetchall()
+        goals = conn.execute('SELECT * FROM goal ORDER BY date_target').fetchall()
+        positions = conn.execute(
+            'SELECT title, quantity, cost_basis_cents / 100.0 AS cost_basis, lot_count '
+            'FROM investment_positions ORDER BY cost_basis_cents DESC'
+        ).fetchall()
+        recent = conn.execute(
+            f"SELECT {_ROW_COLUMNS['transaction_history']} FROM transaction_history "
+            "ORDER BY created_ts DESC, id DESC LIMIT ?", (recent_count,)
+        ).fetchall()
+
+    cents = {'income': 0, 'expense': 0}
+    for row in months:
+        cents[row['type']] += row['total_cents']
+    totals = {transaction_type: total / 100 for transaction_type, total in cents.items()}
+    month_count = _month_span(months[0]['month'], months[-1]['month']) if months else 0
+    net_savings = totals['income'] - totals['expense']
+    wealth = wealth_basis(net_savings, sum(row['cost_basis'] for row in positions))
+    today = datetime.now()
+
+    return {
+        "cashflow": {
+            "total_income": round(totals['income'], 2),
+            "total_expense": round(totals['expense'], 2),
+            "net_savings": round(net_savings, 2),
+            "months_of_history": month_count,
+            "average_monthly_income": round(totals['income'] / month_count, 2) if month_count else 0.0,
+            "average_monthly_expense": round(totals['expense'] / month_count, 2) if month_count else 0.0,
+            "savings_rate_percent": round(net_savings / totals['income'] * 100, 1) if totals['income'] else None,
+        },
+        "wealth": {part: round(value, 2) for part, value in wealth.items()},
+        "goals": [_goal_progress(dict(goal), wealth["total"], today) for goal in goals],
+        "positions": [
+            {
+                "title": row['title'],
+                "quantity": row['quantity'],
+                "cost_basis": round(row['cost_basis'], 2),
+                "average_price": round(row['cost_basis'] / row['quantity'], 8) if row['quantity'] else None,
+                "lots": row['lot_count'],
+            }
+            for row in positions
+        ],
+        "recent_transactions": [dict(row) for row in recent],
+    }
 
 
 # This block allows you to run `python database.py` to set up the DB for the first time.
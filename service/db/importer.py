@@ -0,0 +1,227 @@
+import argparse
+import csv
+import math
+import os
+import re
+from datetime import datetime, timedelta, timezone
+
+from service.db import database
+
+# Bulk ingestion of bank history. Records are parsed lazily, validated one by one and handed
+# to database.add_transactions as a generator, so a file of any size is inserted in chunks
+# inside a single write transaction with one pass over the data.
+
+MAX_REPORTED_ERRORS = 20
+
+_TYPE_ALIASES = {
+    'income': 'income', 'credit': 'income', 'deposit': 'income', 'in': 'income',
+    'expense': 'expense', 'debit': 'expense', 'withdrawal': 'expense', 'out': 'expense',
+}
+_CSV_COLUMNS = {
+    'type': ('type', 'transaction_type', 'kind'),
+    'amount': ('amount', 'transaction_amount', 'value'),
+    'created_at': ('created_at', 'date', 'timestamp', 'datetime', 'posted'),
+    'category': ('category', 'categories', 'tag'),
+}
+_DATETIME_FORMATS = ('%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d',
+                     '%d/%m/%Y', '%d.%m.%Y')
+
+
+def _parse_amount(value) -> float:
+    """Parses an amount such as '-1,234.56', '1.234,56', '12,50', '1 000' or '€ 9.99'.
+
+    The last '.' or ',' is the decimal separator and the other one groups thousands; a mark that
+    appears more than once only groups thousands. A single mark followed by exactly three digits
+    ('1,234' or '1.234') could be either, so it is rejected rather than guessed.
+    """
+    text = value
+    if isinstance(value, str):
+        text = re.sub(r"[\s'$€£]", '', value)
+        last = max(text.rfind('.'), text.rfind(','))
+        if last >= 0:
+            mark = text[last]
+            if text.count(mark) > 1:
+                whole, fraction, group = text, '', mark
+            else:
+                whole, fraction = text[:last], text[last + 1:]
+                group = ',' if mark == '.' else '.'
+                if group not in whole and len(fraction) == 3 and whole.lstrip('+-') not in ('', '0'):
+                    raise ValueError(f"Ambiguous amount: {value!r} ('{mark}' may separate thousands or decimals)")
+            digits = whole.lstrip('+-')
+            if group in digits and not re.fullmatch(rf'\d{{1,3}}(?:{re.escape(group)}\d{{3}})+', digits):
+                raise ValueError(f"Invalid amount: {value!r}")
+            text = whole.replace(group, '') + ('.' + fraction if fraction else '')
+    amount = float(text)
+    if not math.isfinite(amount) or amount == 0:
+        raise ValueError(f"Invalid amount: {value!r}")
+    return amount
+
+
+def _parse_timestamp(value) -> str:
+    """Converts a date/datetime (or its text) to the 'YYYY-MM-DD HH:MM:SS' UTC form used by CURRENT_TIMESTAMP."""
+    if isinstance(value, datetime):
+        parsed = value
+    else:
+        text = str(value).strip()
+        try:
+            parsed = datetime.fromisoformat(text.replace('Z', '+00:00'))
+        except ValueError:
+            for fmt in _DATETIME_FORMATS:
+                try:
+                    parsed = datetime.strptime(text, fmt)
+                    break
+                except ValueError:
+                    continue
+            else:
+                raise ValueError(f"Invalid date: {value!r}") from None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def normalize_record(record: dict) -> tuple:
+    """Validates one transaction record and returns it as a (type, amount, created_at, category) row.
+
+    `type` may be omitted when the amount is signed (negative amounts are expenses);
+    `created_at` (or `date`) may be omitted to use the current time, and `category` to leave
+    the transaction uncategorized.
+    """
+    amount = _parse_amount(record.get('amount'))
+    raw_type = str(record.get('type') or '').strip().lower()
+    if raw_type:
+        transaction_type = _TYPE_ALIASES.get(raw_type)
+        if transaction_type is None:
+            raise ValueError(f"Transaction type must be 'income' or 'expense', got {record.get('type')!r}")
+    else:
+        transaction_type = 'expense' if amount < 0 else 'income'
+    created_at = record.get('created_at') or record.get('date')
+    return (transaction_type, abs(amount), _parse_timestamp(created_at) if created_at else None,
+            database.normalize_category(record.get('category')))
+
+
+# --- Parsers ---
+
+def read_csv(path: str):
+    """Yields one record per CSV row; headers are matched case-insensitively against common names."""
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.DictReader(f)
+        headers = {name.strip().lower(): name for name in reader.fieldnames or ()}
+        columns = {
+            field: next((headers[alias] for alias in aliases if alias in headers), None)
+            for field, aliases in _CSV_COLUMNS.items()
+        }
+        if columns['amount'] is None:
+            raise ValueError(f"{path}: no amount column in header {reader.fieldnames}")
+        for row in reader:
+            yield {field: row.get(column) if column else None for field, column in columns.items()}
+
+
+def _parse_ofx_datetime(value: str) -> str:
+    """Parses an OFX date such as '20240115', '20240115120000.000' or '20240115120000[-5:EST]'."""
+    match = re.fullmatch(r'(\d{8})(\d{6})?(?:\.\d+)?(?:\[([+-]?\d+(?:\.\d+)?)(?::\w+)?\])?', value.strip())
+    if not match:
+        raise ValueError(f"Invalid OFX date: {value!r}")
+    date_part, time_part, offset = match.groups()
+    parsed = datetime.strptime(date_part + (time_part or '000000'), '%Y%m%d%H%M%S')
+    if offset:
+        parsed = parsed.replace(tzinfo=timezone(timedelta(hours=float(offset))))
+    return _parse_timestamp(parsed)
+
+
+def read_ofx(path: str, block_size: int = 64 * 1024):
+    """Yields one record per <STMTTRN> of an OFX file (SGML or XML flavour).
+
+    The file is tokenized block by block, so only the transaction being parsed is kept in memory.
+    Amounts keep their OFX sign (negative for debits), which decides the transaction type.
+    """
+    token_re = re.compile(r'<(/?)([A-Za-z0-9.]+)>([^<]*)')
+    current = None
+    buffer = ''
+    with open(path, encoding='utf-8', errors='replace') as f:
+        while True:
+            block = f.read(block_size)
+            buffer += block
+            # Keep the trailing, possibly incomplete tag for the next block.
+            cut = buffer.rfind('<') if block else len(buffer)
+            cut = max(cut, 0)
+            text, buffer = buffer[:cut], buffer[cut:]
+            for closing, tag, value in token_re.findall(text):
+                tag = tag.upper()
+                if tag == 'STMTTRN':
+                    if closing and current is not None:
+                        if 'amount' in current:
+                            yield current
+                        current = None
+                    elif not closing:
+                        current = {}
+                elif current is not None and not closing:
+                    value = value.strip()
+                    if tag == 'TRNAMT':
+                        current['amount'] = value
+                    elif tag == 'DTPOSTED':
+                        try:
+                            current['created_at'] = _parse_ofx_datetime(value)
+                        except ValueError:
+                            current['created_at'] = value  # reported as a skipped record
+            if not block:
+                return
+
+
+def read_records(path: str, fmt: str = None):
+    """Picks the parser from `fmt` ('csv' or 'ofx') or from the file extension."""
+    fmt = (fmt or os.path.splitext(path)[1].lstrip('.')).lower()
+    if fmt == 'csv':
+        return read_csv(path)
+    if fmt in ('ofx', 'qfx'):
+        return read_ofx(path)
+    raise ValueError(f"Unsupported import format: {fmt!r} (expected 'csv' or 'ofx')")
+
+
+# --- Import ---
+
+def import_records(records, chunk_size: int = database.IMPORT_CHUNK_SIZE) -> dict:
+    """Validates and bulk-inserts transaction records, skipping (and reporting) the invalid ones."""
+    skipped = 0
+    errors = []
+
+    def valid_rows():
+        nonlocal skipped
+        for number, record in enumerate(records, start=1):
+            try:
+                yield normalize_record(record)
+            except (ValueError, TypeError) as e:
+                skipped += 1
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append(f"record {number}: {e}")
+
+    inserted = database.add_transactions(valid_rows(), chunk_size=chunk_size)
+    return {"inserted": inserted, "skipped": skipped, "errors": errors}
+
+
+def import_file(path: str, fmt: str = None, chunk_size: int = database.IMPORT_CHUNK_SIZE) -> dict:
+    """Imports a CSV or OFX bank export into transaction_history."""
+    return import_records(read_records(path, fmt), chunk_size=chunk_size)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import income/expense transactions from CSV or OFX files.")
+    parser.add_argument('files', nargs='+', help="CSV or OFX files to import")
+    parser.add_argument('--format', choices=('csv', 'ofx'), help="file format (default: from the file extension)")
+    parser.add_argument('--chunk-size', type=int, default=database.IMPORT_CHUNK_SIZE,
+                        help="rows per executemany batch")
+    parser.add_argument('--database', default=database.DATABASE_NAME, help="SQLite database file")
+    args = parser.parse_args(argv)
+
+    database.DATABASE_NAME = args.database
+    database.init_db()
+    for path in args.files:
+        result = import_file(path, fmt=args.format, chunk_size=args.chunk_size)
+        print(f"✅ {path}: {result['inserted']} imported, {result['skipped']} skipped")
+        for error in result['errors']:
+            print(f"   - {error}")
+    database.close_all_pools()
+
+
+# Run `python -m service.db.importer statement.csv` to import a bank export.
+if __name__ == '__main__':
+    main()
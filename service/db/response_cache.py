@@ -0,0 +1,127 @@
+import hashlib
+import re
+import time
+from typing import Optional
+
+from service.db import database
+
+# Answers to repeated analytical questions ("how am I doing on my goals?"), stored in their own
+# SQLite file. An entry is only served while the user's data is unchanged (exact, via the data
+# version counter) and, for answers that used market data, while the market epoch is the same.
+
+RESPONSE_CACHE_DB = 'response_cache.db'
+RESPONSE_CACHE_MAX_ENTRIES = 500
+# Answers built from market data are reused for at most this long.
+MARKET_EPOCH_SECONDS = 300
+# Very short prompts ("yes", "tell me more") depend on the conversation, not just on the data.
+MIN_CACHEABLE_WORDS = 3
+# Prompts that refer back to earlier turns ("what about last month?", "and the one before?").
+_REFERENTIAL = re.compile(
+    r'^(?:and|but|so|also|then|what about|how about)\b'
+    r'|\b(?:it|its|that|those|them|they|one|ones|same|again|else|instead|previous|above|mentioned)\b'
+)
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Lowercases and collapses whitespace/trailing punctuation so trivially different phrasings share an entry."""
+    return re.sub(r'\s+', ' ', prompt.strip().lower()).rstrip(' .!?')
+
+
+def is_cacheable_prompt(prompt: str) -> bool:
+    """Whether the answer to `prompt` can only depend on the data, not on the conversation before it."""
+    normalized = normalize_prompt(prompt)
+    return len(normalized.split()) >= MIN_CACHEABLE_WORDS and not _REFERENTIAL.search(normalized)
+
+
+def market_epoch(now: float = None, period: float = MARKET_EPOCH_SECONDS) -> int:
+    """Number of the market data period `now` falls in."""
+    return int((now if now is not None else time.time()) // period)
+
+
+class ResponseCache:
+    """A bounded, least-recently-used cache of agent responses on disk."""
+
+    def __init__(self, path: str = RESPONSE_CACHE_DB, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+                 market_period: float = MARKET_EPOCH_SECONDS):
+        self.path = path
+        self.max_entries = max_entries
+        self.market_period = market_period
+        self._stats = {"hits": 0, "misses": 0, "stale": 0, "stores": 0, "evictions": 0}
+        with database.get_pool(self.path).transaction() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS response_cache (
+                    key TEXT PRIMARY KEY,
+                    prompt TEXT NOT NULL,
+                    route TEXT NOT NULL,
+                    data_version INTEGER NOT NULL,
+                    market_epoch INTEGER,
+                    response TEXT NOT NULL,
+                    last_used REAL NOT NULL
+                );
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_response_cache_last_used ON response_cache (last_used);')
+
+    @staticmethod
+    def _key(prompt: str, scope: str, agent: str) -> str:
+        return hashlib.sha256(f'{scope}\x00{agent}\x00{normalize_prompt(prompt)}'.encode()).hexdigest()
+
+    def lookup(self, prompt: str, data_version: int, scope: str = '', agent: str = '') -> Optional[dict]:
+        """Returns the cached {"response", "route"} for `prompt` if it is still valid, else None.
+
+        `agent` is the agent the prompt is sent to, i.e. where its route starts; the same prompt
+        reaching another agent (e.g. one the conversation was transferred to) has its own entry.
+        """
+        if not is_cacheable_prompt(prompt):
+            return None
+        key = self._key(prompt, scope, agent)
+        pool = database.get_pool(self.path)
+        with pool.connection() as conn:
+            row = conn.execute('SELECT * FROM response_cache WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            self._stats["misses"] += 1
+            return None
+        stale = row['data_version'] != data_version or (
+            row['market_epoch'] is not None and row['market_epoch'] != market_epoch(period=self.market_period)
+        )
+        with pool.transaction() as conn:
+            if stale:
+                conn.execute('DELETE FROM response_cache WHERE key = ?', (key,))
+            else:
+                conn.execute('UPDATE response_cache SET last_used = ? WHERE key = ?', (time.time(), key))
+        if stale:
+            self._stats["stale"] += 1
+            self._stats["misses"] += 1
+            return None
+        self._stats["hits"] += 1
+        return {"response": row['response'], "route": row['route']}
+
+    def store(self, prompt: str, response: str, route: str, data_version: int, uses_market: bool,
+              scope: str = '', agent: str = ''):
+        """Caches `response`, computed from data at `data_version`, evicting the least recently used entries."""
+        if not is_cacheable_prompt(prompt):
+            return
+        epoch = market_epoch(period=self.market_period) if uses_market else None
+        with database.get_pool(self.path).transaction() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO response_cache (key, prompt, route, data_version, market_epoch, response, last_used) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (self._key(prompt, scope, agent), normalize_prompt(prompt), route, data_version, epoch, response, time.time())
+            )
+            evicted = conn.execute(
+                'DELETE FROM response_cache WHERE key IN ('
+                '  SELECT key FROM response_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)',
+                (self.max_entries,)
+            ).rowcount
+        self._stats["stores"] += 1
+        self._stats["evictions"] += evicted
+
+    def clear(self):
+        with database.get_pool(self.path).transaction() as conn:
+            conn.execute('DELETE FROM response_cache')
+
+    def stats(self) -> dict:
+        with database.get_pool(self.path).connection() as conn:
+            entries = conn.execute('SELECT COUNT(*) FROM response_cache').fetchone()[0]
+        lookups = self._stats["hits"] + self._stats["misses"]
+        return {"entries": entries, **self._stats,
+                "hit_rate": round(self._stats["hits"] / lookups, 3) if lookups else 0.0}
@@ -0,0 +1,270 @@
+import json
+import time
+from typing import Optional
+
+from service.db import database
+
+# Conversation sessions on disk, in their own SQLite file. Every session keeps a running token
+# estimate of its stored events; once it goes over the budget, the oldest whole invocations are
+# dropped and folded into a short rolling summary, which the agents read from the session state
+# ('conversation_summary'). The history sent to the model is therefore bounded however long the
+# conversation gets, and it survives restarts.
+
+SESSION_DB = 'sessions.db'
+SESSION_TOKEN_BUDGET = 8000
+# Compaction brings a session down to this fraction of the budget, so it doesn't run on every turn.
+COMPACT_TO_RATIO = 0.5
+SUMMARY_STATE_KEY = 'conversation_summary'
+SUMMARY_MAX_CHARS = 2000
+SUMMARY_LINE_CHARS = 200
+# State key prefixes, as in google.adk.sessions.State.
+APP_PREFIX = 'app:'
+USER_PREFIX = 'user:'
+TEMP_PREFIX = 'temp:'
+
+
+def split_state_delta(delta: dict) -> tuple:
+    """Splits a state delta into its (app, user, session) parts; 'temp:' keys are never stored."""
+    app, user, session = {}, {}, {}
+    for key, value in (delta or {}).items():
+        if key.startswith(APP_PREFIX):
+            app[key[len(APP_PREFIX):]] = value
+        elif key.startswith(USER_PREFIX):
+            user[key[len(USER_PREFIX):]] = value
+        elif not key.startswith(TEMP_PREFIX):
+            session[key] = value
+    return app, user, session
+
+
+class SessionStore:
+    """Sessions, their events and app/user-level state, stored in SQLite."""
+
+    def __init__(self, path: str = SESSION_DB, token_budget: int = SESSION_TOKEN_BUDGET,
+                 compact_to_ratio: float = COMPACT_TO_RATIO, summary_max_chars: int = SUMMARY_MAX_CHARS):
+        self.path = path
+        self.token_budget = token_budget
+        self.compact_to_ratio = compact_to_ratio
+        self.summary_max_chars = summary_max_chars
+        self._stats = {"appended": 0, "compactions": 0, "compacted_events": 0}
+        with database.get_pool(self.path).transaction() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS sessions (
+                    app_name TEXT NOT NULL,
+                    user_id TEXT NOT NULL,
+                    id TEXT NOT NULL,
+                    state TEXT NOT NULL DEFAULT '{}',
+                    event_tokens INTEGER NOT NULL DEFAULT 0,
+                    next_seq INTEGER NOT NULL DEFAULT 0,
+                    create_time REAL NOT NULL,
+                    update_time REAL NOT NULL,
+                    PRIMARY KEY (app_name, user_id, id)
+                ) WITHOUT ROWID;
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS session_events (
+                    app_name TEXT NOT NULL,
+                    user_id TEXT NOT NULL,
+                    session_id TEXT NOT NULL,
+                    seq INTEGER NOT NULL,
+                    invocation_id TEXT,
+                    timestamp REAL NOT NULL,
+                    tokens INTEGER NOT NULL,
+                    summary TEXT,
+                    event TEXT NOT NULL,
+                    PRIMARY KEY (app_name, user_id, session_id, seq)
+                ) WITHOUT ROWID;
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS app_states (
+                    app_name TEXT PRIMARY KEY,
+                    state TEXT NOT NULL DEFAULT '{}'
+                );
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS user_states (
+                    app_name TEXT NOT NULL,
+                    user_id TEXT NOT NULL,
+                    state TEXT NOT NULL DEFAULT '{}',
+                    PRIMARY KEY (app_name, user_id)
+                ) WITHOUT ROWID;
+            ''')
+
+    # --- State ---
+
+    @staticmethod
+    def _merge_state(conn, table: str, where: str, params: tuple, delta: dict, insert_sql: str):
+        if not delta:
+            return
+        row = conn.execute(f'SELECT state FROM {table} WHERE {where}', params).fetchone()
+        state = json.loads(row['state']) if row else {}
+        state.update(delta)
+        if row:
+            conn.execute(f'UPDATE {table} SET state = ? WHERE {where}', (json.dumps(state, default=str),) + params)
+        else:
+            conn.execute(insert_sql, params + (json.dumps(state, default=str),))
+
+    def _apply_shared_state(self, conn, app_name: str, user_id: str, app_delta: dict, user_delta: dict):
+        self._merge_state(conn, 'app_states', 'app_name = ?', (app_name,), app_delta,
+                          'INSERT INTO app_states (app_name, state) VALUES (?, ?)')
+        self._merge_state(conn, 'user_states', 'app_name = ? AND user_id = ?', (app_name, user_id), user_delta,
+                          'INSERT INTO user_states (app_name, user_id, state) VALUES (?, ?, ?)')
+
+    @staticmethod
+    def _full_state(conn, app_name: str, user_id: str, session_state: dict) -> dict:
+        """Session state plus the app and user state, under their 'app:'/'user:' prefixes."""
+        state = dict(session_state)
+        row = conn.execute('SELECT state FROM app_states WHERE app_name = ?', (app_name,)).fetchone()
+        if row:
+            state.update({APP_PREFIX + key: value for key, value in json.loads(row['state']).items()})
+        row = conn.execute('SELECT state FROM user_states WHERE app_name = ? AND user_id = ?',
+                           (app_name, user_id)).fetchone()
+        if row:
+            state.update({USER_PREFIX + key: value for key, value in json.loads(row['state']).items()})
+        return state
+
+    # --- Sessions ---
+
+    def create_session(self, app_name: str, user_id: str, session_id: str, state: dict = None) -> dict:
+        """Creates a session; raises ValueError if it already exists."""
+        app_delta, user_delta, session_state = split_state_delta(state)
+        now = time.time()
+        with database.get_pool(self.path).transaction() as conn:
+            exists = conn.execute('SELECT 1 FROM sessions WHERE app_name = ? AND user_id = ? AND id = ?',
+                                  (app_name, user_id, session_id)).fetchone()
+            if exists:
+                raise ValueError(f"Session '{session_id}' already exists for user '{user_id}'")
+            conn.execute(
+                'INSERT INTO sessions (app_name, user_id, id, state, create_time, update_time) VALUES (?, ?, ?, ?, ?, ?)',
+                (app_name, user_id, session_id, json.dumps(session_state, default=str), now, now)
+            )
+            self._apply_shared_state(conn, app_name, user_id, app_delta, user_delta)
+            full_state = self._full_state(conn, app_name, user_id, session_state)
+        return {"app_name": app_name, "user_id": user_id, "id": session_id, "state": full_state,
+                "events": [], "update_time": now}
+
+    def get_session(self, app_name: str, user_id: str, session_id: str, num_recent_events: int = None,
+                    after_timestamp: float = None) -> Optional[dict]:
+        """Returns the session with its stored events (as JSON strings, oldest first), or None."""
+        with database.get_pool(self.path).connection() as conn:
+            row = conn.execute('SELECT * FROM sessions WHERE app_name = ? AND user_id = ? AND id = ?',
+                               (app_name, user_id, session_id)).fetchone()
+            if row is None:
+                return None
+            query = 'SELECT event FROM session_events WHERE app_name = ? AND user_id = ? AND session_id = ?'
+            params = [app_name, user_id, session_id]
+            if after_timestamp is not None:
+                query += ' AND timestamp >= ?'
+                params.append(after_timestamp)
+            query += ' ORDER BY seq DESC'
+            if num_recent_events:
+                query += ' LIMIT ?'
+                params.append(num_recent_events)
+            events = [event_row['event'] for event_row in conn.execute(query, params).fetchall()]
+            events.reverse()
+            state = self._full_state(conn, app_name, user_id, json.loads(row['state']))
+        return {"app_name": app_name, "user_id": user_id, "id": session_id, "state": state,
+                "events": events, "update_time": row['update_time']}
+
+    def list_sessions(self, app_name: str, user_id: str = None) -> list:
+        """Returns the sessions of `app_name` (optionally of one user), without their events."""
+        query = 'SELECT app_name, user_id, id, state, update_time FROM sessions WHERE app_name = ?'
+        params = [app_name]
+        if user_id is not None:
+            query += ' AND user_id = ?'
+            params.append(user_id)
+        with database.get_pool(self.path).connection() as conn:
+            rows = conn.execute(query, params).fetchall()
+            return [{"app_name": row['app_name'], "user_id": row['user_id'], "id": row['id'],
+                     "state": self._full_state(conn, row['app_name'], row['user_id'], json.loads(row['state'])),
+                     "events": [], "update_time": row['update_time']} for row in rows]
+
+    def delete_session(self, app_name: str, user_id: str, session_id: str):
+        with database.get_pool(self.path).transaction() as conn:
+            conn.execute('DELETE FROM session_events WHERE app_name = ? AND user_id = ? AND session_id = ?',
+                         (app_name, user_id, session_id))
+            conn.execute('DELETE FROM sessions WHERE app_name = ? AND user_id = ? AND id = ?',
+                         (app_name, user_id, session_id))
+
+    # --- Events ---
+
+    def append_event(self, app_name: str, user_id: str, session_id: str, event_json: str, invocation_id: str,
+                     timestamp: float, tokens: int, state_delta: dict = None, summary: str = None) -> dict:
+        """Stores one event and applies its state delta, compacting the session if it went over budget.
+
+        Returns {"tokens": <stored event tokens after compaction>, "compacted": <events dropped>}.
+        """
+        app_delta, user_delta, session_delta = split_state_delta(state_delta)
+        with database.get_pool(self.path).transaction() as conn:
+            row = conn.execute('SELECT state, event_tokens, next_seq FROM sessions '
+                               'WHERE app_name = ? AND user_id = ? AND id = ?',
+                               (app_name, user_id, session_id)).fetchone()
+            if row is None:
+                raise ValueError(f"Session '{session_id}' not found for user '{user_id}'")
+            state = json.loads(row['state'])
+            state.update(session_delta)
+            conn.execute(
+                'INSERT INTO session_events (app_name, user_id, session_id, seq, invocation_id, timestamp, tokens, '
+                'summary, event) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (app_name, user_id, session_id, row['next_seq'], invocation_id, timestamp, tokens, summary, event_json)
+            )
+            event_tokens = row['event_tokens'] + tokens
+            compacted = 0
+            if event_tokens > self.token_budget:
+                compacted, freed, summary_text = self._compact(conn, app_name, user_id, session_id, invocation_id,
+                                                               event_tokens, state.get(SUMMARY_STATE_KEY, ''))
+                event_tokens -= freed
+                if compacted:
+                    state[SUMMARY_STATE_KEY] = summary_text
+            conn.execute(
+                'UPDATE sessions SET state = ?, event_tokens = ?, next_seq = next_seq + 1, update_time = ? '
+                'WHERE app_name = ? AND user_id = ? AND id = ?',
+                (json.dumps(state, default=str), event_tokens, timestamp, app_name, user_id, session_id)
+            )
+            self._apply_shared_state(conn, app_name, user_id, app_delta, user_delta)
+        self._stats["appended"] += 1
+        if compacted:
+            self._stats["compactions"] += 1
+            self._stats["compacted_events"] += compacted
+        return {"tokens": event_tokens, "compacted": compacted}
+
+    def _compact(self, conn, app_name, user_id, session_id, current_invocation, event_tokens, summary) -> tuple:
+        """Drops the oldest whole invocations (never the current one) until the session fits the target.
+
+        Returns (events dropped, tokens freed, new summary).
+        """
+        target = self.token_budget * self.compact_to_ratio
+        rows = conn.execute(
+            'SELECT seq, invocation_id, tokens, summary FROM session_events '
+            'WHERE app_name = ? AND user_id = ? AND session_id = ? ORDER BY seq',
+            (app_name, user_id, session_id)
+        ).fetchall()
+        drop, freed, lines = [], 0, []
+        for index, row in enumerate(rows):
+            if row['invocation_id'] == current_invocation:
+                break
+            drop.append(row['seq'])
+            freed += row['tokens']
+            if row['summary']:
+                lines.append(row['summary'])
+            following = rows[index + 1]['invocation_id'] if index + 1 < len(rows) else None
+            # Only stop at the end of an invocation, so no turn is left half in the history.
+            if event_tokens - freed <= target and following != row['invocation_id']:
+                break
+        if not drop:
+            return 0, 0, summary
+        conn.executemany(
+            'DELETE FROM session_events WHERE app_name = ? AND user_id = ? AND session_id = ? AND seq = ?',
+            [(app_name, user_id, session_id, seq) for seq in drop]
+        )
+        summary = '\n'.join(filter(None, [summary, *lines]))
+        if len(summary) > self.summary_max_chars:
+            # Keep the most recent part, cut at a line boundary.
+            summary = summary[-self.summary_max_chars:]
+            summary = summary[summary.find('\n') + 1:] if '\n' in summary else summary
+        return len(drop), freed, summary
+
+    def stats(self) -> dict:
+        with database.get_pool(self.path).connection() as conn:
+            sessions, tokens = conn.execute('SELECT COUNT(*), COALESCE(SUM(event_tokens), 0) FROM sessions').fetchone()
+            events = conn.execute('SELECT COUNT(*) FROM session_events').fetchone()[0]
+        return {"sessions": sessions, "events": events, "event_tokens": tokens, **self._stats}
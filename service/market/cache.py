@@ -0,0 +1,228 @@
+import asyncio
+import fnmatch
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from google.adk.tools.base_tool import BaseTool
+from google.adk.tools.base_toolset import BaseToolset
+from google.adk.tools.tool_context import ToolContext
+
+from service.tracing import tracer
+
+# Caching proxy for the CoinGecko MCP toolset. Every call through `npx mcp-remote` costs a
+# subprocess hop and a remote round trip and counts against the CoinGecko rate limit, while
+# most questions ask for the same few coins within seconds of each other.
+
+DEFAULT_TTL = 60
+# First matching pattern wins; a TTL of 0 disables caching for that tool.
+TOOL_TTLS = (
+    ('*simple_price*', 30),
+    ('*token_price*', 30),
+    ('*top_gainers*', 120),
+    ('*markets*', 60),
+    ('*trending*', 300),
+    ('*market_chart*', 300),
+    ('*ohlc*', 300),
+    ('*coins_list*', 24 * 3600),
+    ('*categories*', 24 * 3600),
+    ('*supported_vs_currencies*', 24 * 3600),
+    ('*asset_platforms*', 24 * 3600),
+    ('*search*', 3600),
+    ('*id_coins*', 3600),
+)
+CACHE_MAX_ENTRIES = 1024
+CACHE_MAX_BYTES = 16 * 1024 * 1024
+
+
+def ttl_for_tool(tool_name: str, ttls=TOOL_TTLS, default: float = DEFAULT_TTL) -> float:
+    """Returns the cache lifetime in seconds for results of `tool_name`."""
+    for pattern, ttl in ttls:
+        if fnmatch.fnmatch(tool_name, pattern):
+            return ttl
+    return default
+
+
+def _normalize_value(value):
+    if isinstance(value, str):
+        value = value.strip().lower()
+        # 'bitcoin,ethereum' and 'ethereum, bitcoin' ask for the same thing.
+        if ',' in value:
+            value = ','.join(sorted(part.strip() for part in value.split(',') if part.strip()))
+        return value
+    if isinstance(value, dict):
+        return {key: _normalize_value(item) for key, item in value.items() if item is not None}
+    if isinstance(value, (list, tuple)):
+        return [_normalize_value(item) for item in value]
+    return value
+
+
+def make_cache_key(tool_name: str, args: dict) -> str:
+    """Builds a cache key from the tool name and its arguments, ignoring key order, case and blanks."""
+    return tool_name + ':' + json.dumps(_normalize_value(args or {}), sort_keys=True, default=str)
+
+
+class AsyncTTLCache:
+    """An LRU cache with per-entry expiry, a memory cap and coalescing of concurrent loads.
+
+    When several coroutines ask for the same missing key at once, only the first one runs the
+    loader; the others await its result. Failed loads are not cached. If the loading caller is
+    cancelled (e.g. its client disconnected), the waiters are not: the next of them loads again.
+    """
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, max_bytes: int = CACHE_MAX_BYTES, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._clock = clock
+        self._entries = OrderedDict()  # key -> (expires_at, size, value)
+        self._in_flight = {}
+        self._bytes = 0
+        self._stats = {"hits": 0, "misses": 0, "coalesced": 0, "evictions": 0, "expired": 0}
+
+    @staticmethod
+    def _size_of(value) -> int:
+        try:
+            return len(json.dumps(value, default=str))
+        except (TypeError, ValueError):
+            return len(repr(value))
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def get(self, key):
+        """Returns the cached value for `key`, or None if it is missing or expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= self._clock():
+            self._remove(key)
+            self._stats["expired"] += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry[2]
+
+    def set(self, key, value, ttl: float):
+        """Stores `value` for `ttl` seconds, evicting the least recently used entries over the caps."""
+        if ttl <= 0:
+            return
+        size = self._size_of(value)
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (self._clock() + ttl, size, value)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self._stats["evictions"] += 1
+
+    async def get_or_load(self, key, ttl: float, loader, cacheable=lambda value: True):
+        """Returns the cached value for `key`, or awaits `loader()` once for all concurrent callers."""
+        while True:
+            value = self.get(key)
+            if value is not None:
+                self._stats["hits"] += 1
+                return value
+            in_flight = self._in_flight.get(key)
+            if in_flight is None:
+                break
+            self._stats["coalesced"] += 1
+            try:
+                return await asyncio.shield(in_flight)
+            except asyncio.CancelledError:
+                # Only the load was cancelled, not this caller: try again (or load it ourselves).
+                if not in_flight.cancelled() or asyncio.current_task().cancelling():
+                    raise
+
+        self._stats["misses"] += 1
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            value = await loader()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved in case nobody else was waiting for it.
+            future.exception()
+            raise
+        else:
+            future.set_result(value)
+            if cacheable(value):
+                self.set(key, value, ttl)
+            return value
+        finally:
+            self._in_flight.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "bytes": self._bytes, "in_flight": len(self._in_flight), **self._stats}
+
+
+def _is_cacheable_result(result) -> bool:
+    # MCP tools report failures in-band; never keep those around.
+    return result is not None and not (isinstance(result, dict) and (result.get("isError") or result.get("error")))
+
+
+class CachedTool(BaseTool):
+    """Delegates to a wrapped tool, serving repeated calls from an AsyncTTLCache."""
+
+    def __init__(self, tool: BaseTool, cache: AsyncTTLCache, ttl: float):
+        super().__init__(name=tool.name, description=tool.description, is_long_running=tool.is_long_running)
+        self._tool = tool
+        self._cache = cache
+        self._ttl = ttl
+
+    def _get_declaration(self):
+        return self._tool._get_declaration()
+
+    async def _call(self, args: dict[str, Any], tool_context: ToolContext) -> Any:
+        # Only real round trips to the MCP server get a span; cache hits don't.
+        with tracer.span(f"mcp {self.name}", 'mcp'):
+            return await self._tool.run_async(args=args, tool_context=tool_context)
+
+    async def run_async(self, *, args: dict[str, Any], tool_context: ToolContext) -> Any:
+        if self._ttl <= 0:
+            return await self._call(args, tool_context)
+        return await self._cache.get_or_load(
+            make_cache_key(self.name, args),
+            self._ttl,
+            lambda: self._call(args, tool_context),
+            cacheable=_is_cacheable_result,
+        )
+
+
+class CachingToolset(BaseToolset):
+    """Wraps a toolset (typically an McpToolset) so that all of its tools go through a shared cache."""
+
+    def __init__(self, toolset: BaseToolset, cache: AsyncTTLCache = None, ttls=TOOL_TTLS,
+                 default_ttl: float = DEFAULT_TTL):
+        super().__init__()
+        self._toolset = toolset
+        self.cache = cache or get_market_cache()
+        self._ttls = ttls
+        self._default_ttl = default_ttl
+
+    async def get_tools(self, readonly_context=None) -> list[BaseTool]:
+        tools = await self._toolset.get_tools(readonly_context)
+        return [CachedTool(tool, self.cache, ttl_for_tool(tool.name, self._ttls, self._default_ttl)) for tool in tools]
+
+    async def close(self) -> None:
+        await self._toolset.close()
+
+
+_market_cache: Optional[AsyncTTLCache] = None
+
+
+def get_market_cache() -> AsyncTTLCache:
+    """Returns the process-wide market data cache shared by every CachingToolset."""
+    global _market_cache
+    if _market_cache is None:
+        _market_cache = AsyncTTLCache()
+    return _market_cache
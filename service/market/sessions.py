@@ -0,0 +1,199 @@
+import asyncio
+import os
+import shlex
+import time
+from typing import Optional
+
+from google.adk.tools.base_tool import BaseTool
+from google.adk.tools.base_toolset import BaseToolset
+from google.adk.tools.mcp_tool import McpToolset, StdioConnectionParams
+from mcp import StdioServerParameters
+
+from service.market.cache import CachingToolset
+
+# One MCP connection per server config for the whole process. The root agent and
+# market_data_agent used to build their own McpToolset each, i.e. two `npx mcp-remote`
+# processes that only connected on the first market question.
+
+COINGECKO = 'coingecko'
+COINGECKO_SSE_URL = 'https://mcp.api.coingecko.com/sse'
+MCP_TIMEOUT = 30
+HEALTH_CHECK_INTERVAL = 60
+HEALTH_CHECK_TIMEOUT = 15
+MAX_RECONNECT_DELAY = 300
+
+
+def coingecko_connection_params() -> StdioConnectionParams:
+    """Connection to the CoinGecko MCP server, or to the command in MARKET_MCP_COMMAND if set (e.g. a local stub)."""
+    override = os.getenv('MARKET_MCP_COMMAND')
+    if override:
+        command, *args = shlex.split(override)
+    else:
+        command, args = 'npx', ['mcp-remote', COINGECKO_SSE_URL, '--log-level', 'error']
+    return StdioConnectionParams(
+        server_params=StdioServerParameters(command=command, args=args),
+        timeout=MCP_TIMEOUT,
+    )
+
+
+MCP_SERVERS = {
+    COINGECKO: coingecko_connection_params,
+}
+
+
+class ManagedMcpToolset(BaseToolset):
+    """An McpToolset that can be warmed up, health-checked and transparently reconnected.
+
+    The tool list is fetched once per connection and reused, so agents listing their tools on
+    every model call do not pay a `list_tools` round trip each time.
+    """
+
+    def __init__(self, name: str, connection_params_factory):
+        super().__init__()
+        self.name = name
+        self._connection_params_factory = connection_params_factory
+        self._toolset: Optional[McpToolset] = None
+        self._tools: Optional[list[BaseTool]] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._stats = {"connects": 0, "reconnects": 0, "failed_checks": 0, "last_check": None, "healthy": None}
+
+    def _connection_lock(self) -> asyncio.Lock:
+        # Created on first use, inside the running loop: the registry is built at import time.
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    async def _connect(self) -> list[BaseTool]:
+        # A previous toolset (e.g. of a failed attempt) still owns an `npx` subprocess.
+        await self._close_connection()
+        toolset = McpToolset(connection_params=self._connection_params_factory())
+        started = time.perf_counter()
+        try:
+            tools = await toolset.get_tools()
+        except BaseException:
+            await self._close_toolset(toolset)
+            raise
+        self._toolset = toolset
+        self._stats["connects"] += 1
+        self._stats["connect_seconds"] = round(time.perf_counter() - started, 3)
+        return tools
+
+    async def get_tools(self, readonly_context=None) -> list[BaseTool]:
+        if self._tools is None:
+            async with self._connection_lock():
+                if self._tools is None:
+                    self._tools = await self._connect()
+        return self._tools
+
+    async def check_health(self, timeout: float = HEALTH_CHECK_TIMEOUT) -> bool:
+        """Lists the server's tools as a round-trip probe; never raises."""
+        if self._toolset is None:
+            return False
+        try:
+            await asyncio.wait_for(self._toolset.get_tools(), timeout)
+            healthy = True
+        except Exception:
+            healthy = False
+            self._stats["failed_checks"] += 1
+        self._stats["healthy"] = healthy
+        self._stats["last_check"] = time.time()
+        return healthy
+
+    async def reconnect(self):
+        """Drops the current connection and opens a new one."""
+        async with self._connection_lock():
+            self._stats["reconnects"] += 1
+            self._tools = await self._connect()
+
+    async def _close_toolset(self, toolset: McpToolset):
+        try:
+            await toolset.close()
+        except Exception as e:
+            # The MCP client may already be gone (e.g. the subprocess died); nothing left to release.
+            print(f"⚠️ Error while closing MCP toolset '{self.name}': {e}")
+
+    async def _close_connection(self):
+        toolset, self._toolset, self._tools = self._toolset, None, None
+        if toolset is not None:
+            await self._close_toolset(toolset)
+
+    async def close(self) -> None:
+        async with self._connection_lock():
+            await self._close_connection()
+
+    def stats(self) -> dict:
+        return {"name": self.name, "connected": self._tools is not None, **self._stats}
+
+
+class McpSessionRegistry:
+    """Holds one shared (cached) toolset per MCP server config, and keeps the connections alive."""
+
+    def __init__(self, servers: dict = None):
+        self._servers = servers or MCP_SERVERS
+        self._managed = {}
+        self._toolsets = {}
+        self._tasks = []
+
+    def get_toolset(self, name: str = COINGECKO) -> CachingToolset:
+        """Returns the shared toolset for `name`; no connection is opened until it is used or warmed up."""
+        toolset = self._toolsets.get(name)
+        if toolset is None:
+            managed = self._managed[name] = ManagedMcpToolset(name, self._servers[name])
+            toolset = self._toolsets[name] = CachingToolset(managed)
+        return toolset
+
+    async def warm_up(self, names=None):
+        """Connects the given (default: all configured) servers concurrently; failures are reported, not raised."""
+        names = list(names or self._servers)
+        for name in names:
+            self.get_toolset(name)
+        results = await asyncio.gather(*(self._managed[name].get_tools() for name in names), return_exceptions=True)
+        for name, result in zip(names, results):
+            if isinstance(result, Exception):
+                print(f"⚠️ MCP server '{name}' warm-up failed: {result}")
+            else:
+                print(f"✅ MCP server '{name}' ready with {len(result)} tools.")
+
+    async def _health_loop(self, interval: float):
+        failures = {}
+        while True:
+            await asyncio.sleep(interval)
+            for name, managed in list(self._managed.items()):
+                if await managed.check_health():
+                    failures.pop(name, None)
+                    continue
+                failures[name] = failures.get(name, 0) + 1
+                try:
+                    await managed.reconnect()
+                    failures.pop(name, None)
+                except Exception as e:
+                    delay = min(interval * 2 ** failures[name], MAX_RECONNECT_DELAY)
+                    print(f"⚠️ MCP server '{name}' reconnect failed ({e}); retrying in {delay:.0f}s")
+                    await asyncio.sleep(delay)
+
+    def start(self, health_check_interval: float = HEALTH_CHECK_INTERVAL):
+        """Starts background warm-up and health checking; must be called from the running event loop."""
+        if self._tasks:
+            return
+        self._tasks = [asyncio.create_task(self.warm_up())]
+        if health_check_interval:
+            self._tasks.append(asyncio.create_task(self._health_loop(health_check_interval)))
+
+    async def close(self):
+        """Stops background tasks and closes every connection."""
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await asyncio.gather(*(managed.close() for managed in self._managed.values()), return_exceptions=True)
+
+    def stats(self) -> list:
+        return [managed.stats() for managed in self._managed.values()]
+
+
+mcp_registry = McpSessionRegistry()
+
+
+def get_market_toolset() -> CachingToolset:
+    """The CoinGecko toolset shared by every agent that needs market data."""
+    return mcp_registry.get_toolset(COINGECKO)
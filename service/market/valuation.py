@@ -0,0 +1,179 @@
+import asyncio
+import json
+import time
+
+# Values the user's investments at current market prices. Positions come aggregated per asset from
+# the database; every distinct title is resolved to a CoinGecko coin id once per process, and the
+# prices of all of them are fetched with a single simple-price call through the shared (cached)
+# market toolset, instead of the model asking for each asset in turn.
+
+VALUATION_CURRENCY = 'usd'
+# Tool names on the CoinGecko MCP server; a glob would also catch e.g. get_search_trending.
+PRICE_TOOL = 'get_simple_price'
+SEARCH_TOOL = 'get_search'
+# Titles no coin matched are looked up again after this many seconds.
+UNRESOLVED_RETRY_SECONDS = 3600
+
+
+def _normalize_title(title: str) -> str:
+    return ' '.join(str(title).split()).lower()
+
+
+def tool_payload(result):
+    """The JSON value returned by an MCP tool call: its structured content, or the text of its first part."""
+    if not isinstance(result, dict):
+        return result
+    texts = [part.get('text', '') for part in result.get('content') or () if part.get('type') == 'text']
+    if result.get('isError'):
+        raise RuntimeError(texts[0] if texts else 'market data tool failed')
+    structured = result.get('structuredContent')
+    if structured is not None:
+        # FastMCP wraps results that are not objects as {"result": ...}.
+        return structured['result'] if set(structured) == {'result'} else structured
+    for text in texts:
+        try:
+            return json.loads(text)
+        except ValueError:
+            continue
+    return result
+
+
+def _find_tool(tools: list, name: str):
+    """The tool called `name`, else the one called `name` behind a toolset prefix ('coingecko_get_search')."""
+    tool = next((tool for tool in tools if tool.name == name), None) or \
+        next((tool for tool in tools if tool.name.endswith(f'_{name}')), None)
+    if tool is None:
+        raise RuntimeError(f"the market toolset has no '{name}' tool")
+    return tool
+
+
+def _match_coin(query: str, coins: list):
+    """The first coin whose id, symbol or name is `query`; search results come ranked by market cap."""
+    for coin in coins:
+        if query in (str(coin.get('id', '')).lower(), str(coin.get('symbol', '')).lower(),
+                     str(coin.get('name', '')).lower()):
+            return coin['id']
+    return None
+
+
+class SymbolResolver:
+    """Maps investment titles ('BTC', 'bitcoin', 'Bitcoin') to coin ids, remembering the answers."""
+
+    def __init__(self, clock=time.monotonic):
+        self._clock = clock
+        self._ids = {}  # normalized title -> coin id
+        self._misses = {}  # normalized title -> when to look it up again
+        self._stats = {"hits": 0, "lookups": 0, "unresolved": 0}
+
+    async def _lookup(self, title: str, search_tool, tool_context):
+        self._stats["lookups"] += 1
+        result = tool_payload(await search_tool.run_async(args={"query": title}, tool_context=tool_context))
+        coins = result.get('coins', []) if isinstance(result, dict) else result or []
+        coin_id = _match_coin(title, coins)
+        if coin_id is None:
+            self._stats["unresolved"] += 1
+            self._misses[title] = self._clock() + UNRESOLVED_RETRY_SECONDS
+        else:
+            self._ids[title] = coin_id
+        return coin_id
+
+    async def resolve(self, titles, tools: list, tool_context=None) -> dict:
+        """Returns {title: coin id or None}; unknown titles are searched concurrently."""
+        resolved, missing = {}, {}
+        now = self._clock()
+        for title in titles:
+            key = _normalize_title(title)
+            if key in self._ids:
+                self._stats["hits"] += 1
+                resolved[title] = self._ids[key]
+            elif self._misses.get(key, 0) > now:
+                self._stats["hits"] += 1
+                resolved[title] = None
+            else:
+                missing.setdefault(key, []).append(title)
+        if missing:
+            search_tool = _find_tool(tools, SEARCH_TOOL)
+            ids = await asyncio.gather(*(self._lookup(key, search_tool, tool_context) for key in missing))
+            for same_titles, coin_id in zip(missing.values(), ids):
+                resolved.update((title, coin_id) for title in same_titles)
+        return resolved
+
+    def clear(self):
+        self._ids.clear()
+        self._misses.clear()
+
+    def stats(self) -> dict:
+        return {"resolved": len(self._ids), **self._stats}
+
+
+symbol_resolver = SymbolResolver()
+
+
+def _round(value, digits: int = 2):
+    return None if value is None else round(value, digits)
+
+
+async def value_portfolio(positions: list, tools: list, tool_context=None, resolver: SymbolResolver = None,
+                          currency: str = VALUATION_CURRENCY) -> dict:
+    """Market value and profit/loss per asset and in total.
+
+    `positions` are database.get_investment_positions() rows and `tools` the market toolset's tools.
+    Titles resolving to the same coin are merged. Assets without a price are listed with their cost
+    basis only and left out of the market value and P&L totals.
+    """
+    resolver = resolver or symbol_resolver
+    coin_ids = await resolver.resolve([row['title'] for row in positions], tools, tool_context)
+    assets = {}
+    for row in positions:
+        coin_id = coin_ids.get(row['title'])
+        asset = assets.setdefault(coin_id or f"?{row['title']}", {
+            "titles": [], "coin_id": coin_id, "quantity": 0.0, "cost_basis": 0.0, "lots": 0})
+        asset["titles"].append(row['title'])
+        asset["quantity"] += row['quantity']
+        asset["cost_basis"] += row['cost_basis']
+        asset["lots"] += row['lots']
+
+    ids = sorted({coin_id for coin_id in coin_ids.values() if coin_id})
+    prices = {}
+    if ids:
+        price_tool = _find_tool(tools, PRICE_TOOL)
+        result = await price_tool.run_async(args={"ids": ','.join(ids), "vs_currencies": currency},
+                                            tool_context=tool_context)
+        prices = {coin_id: quote.get(currency) for coin_id, quote in (tool_payload(result) or {}).items()
+                  if isinstance(quote, dict)}
+
+    total_cost = total_value = priced_cost = 0.0
+    items, unpriced = [], []
+    for asset in assets.values():
+        price = prices.get(asset["coin_id"])
+        value = asset["quantity"] * price if price is not None else None
+        cost = asset["cost_basis"]
+        total_cost += cost
+        if value is None:
+            unpriced.extend(asset["titles"])
+        else:
+            total_value += value
+            priced_cost += cost
+        items.append({
+            "title": ' / '.join(asset["titles"]),
+            "coin_id": asset["coin_id"],
+            "quantity": asset["quantity"],
+            "lots": asset["lots"],
+            "cost_basis": round(cost, 2),
+            "average_price": round(cost / asset["quantity"], 8) if asset["quantity"] else None,
+            "current_price": price,
+            "market_value": _round(value),
+            "pnl": _round(value - cost if value is not None else None),
+            "pnl_percent": _round((value - cost) / cost * 100 if value is not None and cost else None),
+        })
+    items.sort(key=lambda item: -(item["market_value"] if item["market_value"] is not None else item["cost_basis"]))
+
+    return {
+        "currency": currency,
+        "positions": items,
+        "total_cost_basis": round(total_cost, 2),
+        "total_market_value": round(total_value, 2),
+        "total_pnl": round(total_value - priced_cost, 2),
+        "total_pnl_percent": round((total_value - priced_cost) / priced_cost * 100, 2) if priced_cost else None,
+        "unpriced": unpriced,
+    }
@@ -0,0 +1,9 @@
+# Rough token counts, for budgets that must not cost a tokenizer call: the session history
+# (service/db/session_store.py) and tool results sent back to the model (result_encoding.py).
+
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count of `text` (about 4 characters per token for English and JSON)."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN if text else 0
@@ -0,0 +1,272 @@
+import contextvars
+import json
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Optional
+
+# Nested spans for one conversation turn: the turn itself, every agent, model call, tool, MCP
+# round trip and database query under it. Spans are only recorded inside a turn (a root span
+# opened with root=True) and only while tracing is enabled; otherwise span() returns a shared
+# no-op context manager, so the instrumented code paths pay one attribute check.
+#
+# Finished turns are appended to a JSONL file in the OTLP/JSON format (one
+# ExportTraceServiceRequest per line, as written by the OpenTelemetry collector's file exporter),
+# and summarized per turn for the console (see summarize_spans/format_summary).
+
+TRACE_ENV = 'ASSISTANT_TRACE'  # set to 1 to print per-turn summaries
+TRACE_FILE_ENV = 'ASSISTANT_TRACE_FILE'  # set to a path to also export spans
+SERVICE_NAME = 'financial-assistant'
+MAX_ATTRIBUTE_CHARS = 200
+
+# OTLP span kinds: model, MCP and database calls leave the process, everything else is internal.
+_OTLP_KIND = {'model': 3, 'mcp': 3, 'db': 3}
+_OTLP_KIND_INTERNAL = 1
+
+_current_span = contextvars.ContextVar('current_span', default=None)
+_NOOP = nullcontext()
+
+
+class Span:
+    __slots__ = ('trace_id', 'span_id', 'parent', 'name', 'kind', 'attributes', 'status', 'start_ns', 'end_ns',
+                 '_started', 'duration_ms', 'spans', '_token')
+
+    def __init__(self, name: str, kind: str, parent: Optional['Span'], attributes: dict):
+        self.trace_id = parent.trace_id if parent else f'{random.getrandbits(128):032x}'
+        self.span_id = f'{random.getrandbits(64):016x}'
+        self.parent = parent
+        self.name = name
+        self.kind = kind
+        self.attributes = attributes
+        self.status = 'ok'
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self._started = time.perf_counter()
+        self.duration_ms = None
+        self.spans = None  # on a root span: every finished span of the trace
+        self._token = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def add(self, key: str, amount=1):
+        self.attributes[key] = self.attributes.get(key, 0) + amount
+
+    def fail(self, error: BaseException):
+        self.status = 'error'
+        self.attributes['error'] = repr(error)[:MAX_ATTRIBUTE_CHARS]
+
+    def to_dict(self) -> dict:
+        return {"name": self.name, "kind": self.kind, "span_id": self.span_id,
+                "parent_id": self.parent.span_id if self.parent else None,
+                "duration_ms": self.duration_ms, "status": self.status, **self.attributes}
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)[:MAX_ATTRIBUTE_CHARS]}
+
+
+def _otlp_span(span: Span) -> dict:
+    attributes = {"assistant.span_kind": span.kind, **span.attributes}
+    data = {
+        "traceId": span.trace_id,
+        "spanId": span.span_id,
+        "name": span.name,
+        "kind": _OTLP_KIND.get(span.kind, _OTLP_KIND_INTERNAL),
+        "startTimeUnixNano": str(span.start_ns),
+        "endTimeUnixNano": str(span.end_ns),
+        "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items()
+                       if value is not None],
+        "status": {"code": 2 if span.status == 'error' else 1},
+    }
+    if span.parent is not None:
+        data["parentSpanId"] = span.parent.span_id
+    return data
+
+
+class JsonlSpanExporter:
+    """Appends every finished trace to a file as one OTLP/JSON line."""
+
+    def __init__(self, path: str, service_name: str = SERVICE_NAME):
+        self.path = path
+        self.service_name = service_name
+        self._lock = threading.Lock()
+
+    def export(self, spans: list):
+        line = json.dumps({"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": self.service_name}}]},
+            "scopeSpans": [{"scope": {"name": __name__}, "spans": [_otlp_span(span) for span in spans]}],
+        }]}, default=str)
+        with self._lock, open(self.path, 'a', encoding='utf-8') as f:
+            f.write(line + '\n')
+
+
+class _HttpAttemptHandler(logging.Handler):
+    """Counts the HTTP requests made under the current span, and the failed ones, from httpx's request log.
+
+    Model calls make a single attempt each (see registry.get_retry_config); their retries are
+    counted by ScheduledLlm as 'scheduler.retries' on the model span.
+    """
+
+    def emit(self, record):
+        span = _current_span.get()
+        if span is None:
+            return
+        args = record.args if isinstance(record.args, tuple) else ()
+        status = args[3] if len(args) > 3 and isinstance(args[3], int) else None
+        span.add('http.attempts')
+        if status is not None and status >= 400:
+            span.add('http.failed')
+            span.set(**{'http.last_error_status': status})
+
+
+class Tracer:
+    def __init__(self):
+        self.enabled = False
+        self.exporter: Optional[JsonlSpanExporter] = None
+        self._http_handler = None
+        self._stats = {"traces": 0, "spans": 0}
+
+    def configure(self, enabled: bool = True, path: str = None):
+        """Turns tracing on (exporting to `path` if given) or off."""
+        self.enabled = enabled
+        self.exporter = JsonlSpanExporter(path) if enabled and path else None
+        httpx_logger = logging.getLogger('httpx')
+        if enabled and self._http_handler is None:
+            self._http_handler = _HttpAttemptHandler()
+            httpx_logger.addHandler(self._http_handler)
+            if httpx_logger.getEffectiveLevel() > logging.INFO:
+                httpx_logger.setLevel(logging.INFO)
+        elif not enabled and self._http_handler is not None:
+            httpx_logger.removeHandler(self._http_handler)
+            self._http_handler = None
+
+    def configure_from_env(self):
+        path = os.getenv(TRACE_FILE_ENV)
+        self.configure(enabled=bool(path) or os.getenv(TRACE_ENV, '') not in ('', '0', 'false'), path=path)
+
+    def begin(self, name: str, kind: str = 'internal', root: bool = False, **attributes) -> Optional[Span]:
+        """Starts a span under the current one and makes it current; None if there is no trace to join."""
+        parent = _current_span.get()
+        if parent is None and not root:
+            return None
+        span = Span(name, kind, parent, attributes)
+        if parent is None:
+            span.spans = []
+        span._token = _current_span.set(span)
+        return span
+
+    def end(self, span: Optional[Span], error: BaseException = None):
+        """Finishes `span`, restoring its parent as the current span."""
+        if span is None or span.end_ns is not None:
+            return
+        if error is not None:
+            span.fail(error)
+        span.end_ns = time.time_ns()
+        span.duration_ms = round((time.perf_counter() - span._started) * 1000, 3)
+        try:
+            _current_span.reset(span._token)
+        except ValueError:
+            # Ended from another context (e.g. an ADK callback in a different task); fix up this one.
+            if _current_span.get() is span:
+                _current_span.set(span.parent)
+        root = span
+        while root.parent is not None:
+            root = root.parent
+        if root.spans is not None:
+            root.spans.append(span)
+        self._stats["spans"] += 1
+        if span is root:
+            self._stats["traces"] += 1
+            if self.exporter is not None:
+                self.exporter.export(span.spans)
+
+    @contextmanager
+    def _span(self, name: str, kind: str, root: bool, attributes: dict):
+        span = self.begin(name, kind, root, **attributes)
+        try:
+            yield span
+        except BaseException as e:
+            if span is not None:
+                span.fail(e)
+            raise
+        finally:
+            self.end(span)
+
+    def span(self, name: str, kind: str = 'internal', root: bool = False, **attributes):
+        """Context manager yielding a Span (or None when disabled or outside a trace)."""
+        if not self.enabled:
+            return _NOOP
+        return self._span(name, kind, root, attributes)
+
+    def stats(self) -> dict:
+        return {"enabled": self.enabled, "file": self.exporter.path if self.exporter else None, **self._stats}
+
+
+tracer = Tracer()
+span = tracer.span
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def summarize_spans(spans: list) -> dict:
+    """Per-turn totals by kind, plus per-agent, per-tool and per-model details."""
+    summary = {"total_ms": 0.0, "kinds": {}, "agents": {}, "tools": {}, "models": {}, "slowest_db": None}
+    for item in spans or ():
+        if item.parent is None:
+            summary["total_ms"] = item.duration_ms
+            continue
+        kind = summary["kinds"].setdefault(item.kind, {"count": 0, "ms": 0.0})
+        kind["count"] += 1
+        kind["ms"] = round(kind["ms"] + item.duration_ms, 3)
+        attributes = item.attributes
+        if item.kind == 'agent':
+            summary["agents"][item.name] = round(summary["agents"].get(item.name, 0) + item.duration_ms, 3)
+        elif item.kind in ('tool', 'mcp'):
+            tool = summary["tools"].setdefault(item.name, {"count": 0, "ms": 0.0, "bytes": 0, "errors": 0})
+            tool["count"] += 1
+            tool["ms"] = round(tool["ms"] + item.duration_ms, 3)
+            tool["bytes"] += attributes.get('result.bytes', 0)
+            tool["errors"] += item.status == 'error'
+        elif item.kind == 'model':
+            model = summary["models"].setdefault(attributes.get('model', item.name), {
+                "calls": 0, "ms": 0.0, "prompt_tokens": 0, "response_tokens": 0, "retries": 0})
+            model["calls"] += 1
+            model["ms"] = round(model["ms"] + item.duration_ms, 3)
+            model["prompt_tokens"] += attributes.get('tokens.prompt') or 0
+            model["response_tokens"] += attributes.get('tokens.response') or 0
+            model["retries"] += attributes.get('scheduler.retries', 0)
+        elif item.kind == 'db':
+            slowest = summary["slowest_db"]
+            if slowest is None or item.duration_ms > slowest["ms"]:
+                summary["slowest_db"] = {"name": item.name, "ms": item.duration_ms}
+    return summary
+
+
+def format_summary(summary: dict) -> str:
+    """A few console lines describing where a turn's time went."""
+    kinds = ', '.join(f"{kind} {data['count']}× {data['ms']:.0f} ms" for kind, data in sorted(summary["kinds"].items()))
+    lines = [f"⏱️ Turn {summary['total_ms']:.0f} ms ({kinds or 'no spans'})"]
+    for name, ms in summary["agents"].items():
+        lines.append(f"   agent {name}: {ms:.0f} ms")
+    for name, model in summary["models"].items():
+        retries = f", {model['retries']} retries" if model["retries"] else ""
+        lines.append(f"   model {name}: {model['calls']} calls, {model['ms']:.0f} ms, "
+                     f"{model['prompt_tokens']} → {model['response_tokens']} tokens{retries}")
+    for name, tool in summary["tools"].items():
+        errors = f", {tool['errors']} errors" if tool["errors"] else ""
+        lines.append(f"   tool {name}: {tool['count']}× {tool['ms']:.0f} ms, {tool['bytes']} bytes{errors}")
+    if summary["slowest_db"]:
+        lines.append(f"   slowest db query: {summary['slowest_db']['name']} {summary['slowest_db']['ms']:.1f} ms")
+    return '\n'.join(lines)
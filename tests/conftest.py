@@ -0,0 +1,12 @@
+import pytest
+
+from service.db import database
+
+
+@pytest.fixture
+def db(tmp_path):
+    """A fresh database at the latest schema version, made the default for the test."""
+    with database.use_database(str(tmp_path / 'test.db')) as path:
+        database.init_db(verbose=False)
+        yield path
+    database.close_all_pools()
@@ -0,0 +1,35 @@
+import asyncio
+import threading
+
+from service.db import async_database, database
+
+
+def test_queries_run_off_the_event_loop_in_the_callers_database(db):
+    release = threading.Event()
+
+    def slow_query():
+        release.wait(5)
+        return threading.current_thread().name, database.current_database(), database.get_pool().database
+
+    async def main():
+        query = asyncio.create_task(async_database.run_db(slow_query))
+        # The loop keeps running while the query waits on its worker thread.
+        await asyncio.sleep(0.01)
+        release.set()
+        return await query
+
+    thread, current, pool = asyncio.run(main())
+    assert thread.startswith('db-async')
+    assert current == pool == db
+    # Worker threads borrow connections from their own pool group.
+    assert (async_database.DB_POOL_GROUP, db) in {(stats["group"], stats["database"])
+                                                  for stats in database.get_pool_stats()}
+
+
+def test_async_writes_and_streaming(db):
+    async def main():
+        await asyncio.gather(*(async_database.add_transaction('expense', amount, f'2024-01-{amount:02d} 12:00:00')
+                               for amount in range(1, 11)))
+        return [row['amount'] async for row in async_database.aiter_transactions('expense', batch_size=3)]
+
+    assert asyncio.run(main()) == [float(amount) for amount in range(10, 0, -1)]
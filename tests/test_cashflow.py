@@ -0,0 +1,51 @@
+import threading
+
+import numpy as np
+
+from service.analytics import cashflow
+from service.analytics.cashflow import CashflowArrays, cashflow_analytics
+from service.db import database
+from service.db.database import to_epoch
+
+
+def test_end_date_is_included():
+    epoch = np.array([to_epoch('2026-09-30 10:00:00'), to_epoch('2026-10-01 23:59:00'),
+                      to_epoch('2026-10-02 00:00:00')], dtype=np.int64)
+    arrays = CashflowArrays(epoch=epoch, amount=np.array([10.0, 20.0, 40.0]),
+                            income=np.array([False, False, False]), data_version=1)
+    result = cashflow_analytics('month', start_date='2026-10-01', end_date='2026-10-01',
+                                now=to_epoch('2026-12-01'), arrays=arrays)
+    assert result['transactions'] == 1
+
+
+def test_arrays_come_from_one_snapshot(db):
+    database.add_transaction('income', 10)
+    first = cashflow._load_arrays()
+    stop = threading.Event()
+
+    def write():
+        with database.use_database(db):
+            while not stop.is_set():
+                database.add_transaction('expense', 1)
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    try:
+        for _ in range(200):
+            arrays = cashflow._load_arrays()
+            # Every insert bumps the data version once, so a consistent load has exactly this many rows.
+            assert len(arrays.epoch) == 1 + arrays.data_version - first.data_version
+    finally:
+        stop.set()
+        writer.join()
+
+
+def test_cached_arrays_are_bounded(tmp_path, monkeypatch):
+    monkeypatch.setattr(cashflow, 'MAX_CACHED_DATABASES', 2)
+    cashflow.clear_cache()
+    for number in range(3):
+        with database.use_database(str(tmp_path / f'{number}.db')):
+            database.init_db(verbose=False)
+            cashflow.get_arrays()
+    database.close_all_pools()
+    assert cashflow.cache_stats()['databases'] == 2
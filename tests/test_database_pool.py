@@ -0,0 +1,77 @@
+import contextvars
+import threading
+
+import pytest
+
+from service.db import database
+from service.db.database import ConnectionPool
+
+
+def test_pool_reuses_wal_connections(tmp_path):
+    pool = ConnectionPool(str(tmp_path / 'pool.db'), max_size=2)
+    with pool.connection() as conn:
+        first = conn
+        assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    with pool.connection() as conn:
+        assert conn is first
+    assert pool.stats()["open"] == 1
+    pool.close()
+
+
+def test_pool_is_bounded_and_times_out(tmp_path):
+    pool = ConnectionPool(str(tmp_path / 'pool.db'), max_size=1, timeout=0.05)
+    with pool.connection():
+        with pytest.raises(TimeoutError):
+            with pool.connection():
+                pass
+    assert pool.stats()["waited"] == 1
+    pool.close()
+
+
+def test_transactions_commit_or_roll_back(tmp_path):
+    pool = ConnectionPool(str(tmp_path / 'pool.db'))
+    with pool.transaction() as conn:
+        conn.execute('CREATE TABLE t (x INTEGER)')
+        conn.execute('INSERT INTO t VALUES (1)')
+    with pytest.raises(RuntimeError):
+        with pool.transaction() as conn:
+            conn.execute('INSERT INTO t VALUES (2)')
+            raise RuntimeError
+    with pool.connection() as conn:
+        assert [tuple(row) for row in conn.execute('SELECT x FROM t')] == [(1,)]
+    pool.close()
+
+
+def test_writers_from_every_thread_are_serialized(db):
+    def add(worker):
+        for index in range(25):
+            database.add_transaction('expense', worker + index / 100, '2024-01-01 12:00:00')
+
+    # Each thread runs in a copy of the test's context, so it uses the test database.
+    threads = [threading.Thread(target=contextvars.copy_context().run, args=(add, worker)) for worker in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(database.get_all_transactions()) == 200
+
+
+def test_least_recently_used_idle_pools_are_closed(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, 'MAX_OPEN_POOLS', 2)
+    database.close_all_pools()
+    paths = [str(tmp_path / f'{name}.db') for name in 'abcd']
+    try:
+        first = database.get_pool(paths[0])
+        with first.connection():
+            # A pool with a borrowed connection is kept even when it is the least recently used.
+            second = database.get_pool(paths[1])
+            database.get_pool(paths[2])
+        assert [stats["database"] for stats in database.get_pool_stats()] == paths[:3]
+
+        database.get_pool(paths[3])
+        assert [stats["database"] for stats in database.get_pool_stats()] == paths[2:]
+        with pytest.raises(Exception):
+            with second.connection():
+                pass
+    finally:
+        database.close_all_pools()
@@ -0,0 +1,72 @@
+import numpy as np
+
+from service.analytics import goals
+
+CURRENT_MONTH = goals._month_number('2026-10')
+
+
+def _goal(goal_id, target, date_target):
+    return {'id': goal_id, 'note': f'goal {goal_id}', 'money_target': target, 'date_target': date_target}
+
+
+def test_long_horizon_caps_the_paths():
+    result = goals.simulate_goals([_goal(1, 10000, '2076-10-01')], 1000.0, 0.0, np.array([100.0, 200.0]),
+                                  CURRENT_MONTH, simulations=goals.MAX_SIMULATIONS)
+    assert result['simulations'] * goals.MAX_HORIZON_MONTHS <= goals.MAX_SIMULATED_VALUES
+
+
+def test_projection_without_risk_is_exact():
+    # A constant contribution and no volatility make every path the same.
+    result = goals.simulate_goals([_goal(1, 2200, '2027-10-01'), _goal(2, 1000, '2026-10-01')], 1000.0, 0.0,
+                                  np.array([100.0]), CURRENT_MONTH, annual_volatility=0.0)
+    reachable, due = result['goals']
+    assert reachable['projected_wealth']['median'] == 2200.0
+    assert reachable['probability_percent'] == 100.0
+    assert due['projected_wealth']['median'] == 1000.0
+
+
+def test_chunked_simulation_matches_one_block(monkeypatch):
+    args = ([_goal(1, 5000, '2030-01-01'), _goal(2, 9000, '2040-06-01')], 500.0, 2000.0,
+            np.array([100.0, -50.0, 300.0]), CURRENT_MONTH)
+    whole = goals.simulate_goals(*args, simulations=4000)
+    monkeypatch.setattr(goals, 'CHUNK_VALUES', 10_000)
+    chunked = goals.simulate_goals(*args, simulations=4000)
+    assert chunked['simulations'] == whole['simulations']
+    for one, other in zip(whole['goals'], chunked['goals']):
+        assert abs(one['probability_percent'] - other['probability_percent']) < 5
+        assert abs(one['projected_wealth']['median'] / other['projected_wealth']['median'] - 1) < 0.05
+
+
+def test_results_cache_is_bounded(tmp_path, monkeypatch):
+    from service.db import database
+
+    monkeypatch.setattr(goals, 'MAX_CACHED_RESULTS', 2)
+    goals.clear_cache()
+    for number in range(3):
+        with database.use_database(str(tmp_path / f'{number}.db')):
+            database.init_db(verbose=False)
+            goals.get_goal_projections()
+    database.close_all_pools()
+    assert goals.cache_stats()['databases'] == 2
+
+
+def test_investments_are_counted_once(db):
+    from service.db import database
+
+    database.add_transaction('income', 1000)
+    database.add_transaction('expense', 200)
+    database.add_investment(2, 'BTC', 150)
+    database.add_goal('car', '2030-01-01', 1600)
+    snapshot = database.get_profile_snapshot()
+    assert snapshot['wealth'] == {'cash': 500.0, 'invested': 300.0, 'total': 800.0}
+    assert snapshot['goals'][0]['progress_percent'] == 50.0
+    inputs = goals._load_inputs(CURRENT_MONTH)
+    assert (inputs['savings'], inputs['holdings']) == (500.0, 300.0)
+
+
+def test_investments_beyond_savings_count_at_cost(db):
+    from service.db import database
+
+    database.add_transaction('income', 100)
+    database.add_investment(1, 'ETH', 400)
+    assert database.get_profile_snapshot()['wealth'] == {'cash': 0.0, 'invested': 400.0, 'total': 400.0}
@@ -0,0 +1,85 @@
+import pytest
+
+from service.db import database, importer
+from service.db.importer import _parse_amount, import_file
+
+OFX = """OFXHEADER:100
+<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>
+<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20240115120000.000[-5:EST]<TRNAMT>-1.234,56<NAME>Rent</STMTTRN>
+<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20240131<TRNAMT>2500.00<NAME>Salary</STMTTRN>
+<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>not a date<TRNAMT>-5.00</STMTTRN>
+</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>
+"""
+
+
+@pytest.mark.parametrize('text, amount', [
+    ('1.234,56', 1234.56),
+    ('-1,234.56', -1234.56),
+    ('12,50', 12.5),
+    ('0,125', 0.125),
+    ('1 000', 1000.0),
+    ('1,234,567', 1234567.0),
+    ('€ 9.99', 9.99),
+])
+def test_amount_decimal_separator(text, amount):
+    assert _parse_amount(text) == amount
+
+
+@pytest.mark.parametrize('text', ['1,234', '1.234', '12,34.5', '0', 'abc'])
+def test_ambiguous_or_invalid_amounts_are_rejected(text):
+    with pytest.raises(ValueError):
+        _parse_amount(text)
+
+
+def _transactions():
+    return sorted((row['type'], row['amount'], row['created_at'], row['category'])
+                  for row in database.get_all_transactions())
+
+
+def test_csv_import_keeps_timestamps_and_reports_bad_rows(db, tmp_path):
+    path = tmp_path / 'statement.csv'
+    path.write_text('Date,Amount,Type,Category\n'
+                    '2024-01-15,"1.234,56",debit,Rent\n'
+                    '15/01/2024,2500,credit,\n'
+                    '2024-01-16,"1,234",debit,Food\n'
+                    'yesterday,10,debit,Food\n', encoding='utf-8')
+
+    result = import_file(str(path), chunk_size=1)
+
+    assert (result['inserted'], result['skipped']) == (2, 2)
+    assert [error.split(':')[0] for error in result['errors']] == ['record 3', 'record 4']
+    assert _transactions() == [('expense', 1234.56, '2024-01-15 00:00:00', 'rent'),
+                               ('income', 2500.0, '2024-01-15 00:00:00', database.normalize_category(None))]
+
+
+def test_ofx_import_streams_transactions_across_blocks(db, tmp_path):
+    path = tmp_path / 'statement.ofx'
+    path.write_text(OFX, encoding='utf-8')
+    # A tiny block size splits tags between reads.
+    records = list(importer.read_ofx(str(path), block_size=7))
+    assert [record['amount'] for record in records] == ['-1.234,56', '2500.00', '-5.00']
+
+    result = import_file(str(path))
+
+    assert (result['inserted'], result['skipped']) == (2, 1)
+    assert _transactions() == [('expense', 1234.56, '2024-01-15 17:00:00', database.normalize_category(None)),
+                               ('income', 2500.0, '2024-01-31 00:00:00', database.normalize_category(None))]
+
+
+def test_add_new_transactions_tool_imports_in_one_call(db):
+    import asyncio
+
+    from service.agents.database_agent import AddNewTransactions
+
+    result = asyncio.run(AddNewTransactions([
+        {"type": "expense", "amount": 12.5, "category": "Food", "date": "2024-02-01"},
+        {"type": "income", "amount": "2.500,00", "date": "2024-02-01"},
+        {"type": "gift", "amount": 5},
+    ]))
+
+    assert (result["status"], result["inserted"], result["skipped"]) == ("success", 2, 1)
+    assert _transactions() == [('expense', 12.5, '2024-02-01 00:00:00', 'food'),
+                               ('income', 2500.0, '2024-02-01 00:00:00', database.normalize_category(None))]
+    # The bulk insert keeps the daily rollup in step.
+    assert database.get_transaction_totals_by_date_range('2024-02-01', '2024-02-01') == {
+        'expense': 12.5, 'income': 2500.0}
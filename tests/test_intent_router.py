@@ -0,0 +1,60 @@
+import asyncio
+from datetime import date, timedelta
+
+import pytest
+
+from service.agents.intent_router import IntentRouter, parse_day, parse_intent
+from service.db import database
+
+TODAY = date(2026, 10, 17)  # a Saturday
+
+
+@pytest.mark.parametrize('message, note, day', [
+    ("spent 40 on lunch", 'lunch', None),
+    ("spent 40 on lunch yesterday", 'lunch', date(2026, 10, 16)),
+    ("I paid 1200 for rent last month", 'rent', date(2026, 9, 17)),
+    ("paid 30 for coffee on 2026-10-01", 'coffee', date(2026, 10, 1)),
+    ("bought shoes for 80 last week", 'shoes', date(2026, 10, 10)),
+    ("spent 12 3 days ago", None, date(2026, 10, 14)),
+])
+def test_add_expense_splits_note_and_date(message, note, day):
+    intent, _, slots = parse_intent(message, TODAY)
+    assert intent == 'add_expense'
+    assert slots.get('note') == note
+    assert slots.get('when') == day
+
+
+@pytest.mark.parametrize('message', [
+    "spent 40 on lunch, is that too much",
+    "spent 40 on lunch is that too much",
+    "spent 40 on lunch; also what about my goals",
+    "spent 40 on lunch on 2027-01-01",
+    "spent 40 on lunch in march",
+    "spent 40 on a very long lunch with colleagues",
+    "I paid 1200 for rent last month, right?",
+])
+def test_leftover_text_goes_to_the_agents(message):
+    assert parse_intent(message, TODAY) is None
+
+
+def test_parse_day():
+    assert parse_day('today', TODAY) == TODAY
+    assert parse_day('last friday', TODAY) == date(2026, 10, 16)
+    assert parse_day('on saturday', TODAY) == TODAY
+    assert parse_day('last saturday', TODAY) == date(2026, 10, 10)
+    assert parse_day('last month', date(2026, 3, 31)) == date(2026, 2, 28)
+    assert parse_day('on 2026-02-30', TODAY) is None
+
+
+def test_dated_expense_is_saved_on_its_day(db):
+    result = asyncio.run(IntentRouter().route("spent 40 on lunch yesterday"))
+    assert result.intent == 'add_expense'
+    [row] = database.get_all_transactions()
+    assert row['category'] == 'lunch'
+    assert row['amount'] == 40
+    assert row['created_at'][:10] == (date.today() - timedelta(days=1)).isoformat()
+
+
+def test_question_after_expense_is_not_saved(db):
+    assert asyncio.run(IntentRouter().route("spent 40 on lunch, is that too much?")) is None
+    assert database.get_all_transactions() == []
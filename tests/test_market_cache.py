@@ -0,0 +1,108 @@
+import asyncio
+
+import pytest
+
+from service.market.cache import AsyncTTLCache, make_cache_key, ttl_for_tool
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_cache_key_ignores_order_case_and_blanks():
+    assert make_cache_key('get_simple_price', {'ids': 'Bitcoin, ethereum', 'vs_currencies': 'usd'}) == \
+        make_cache_key('get_simple_price', {'vs_currencies': 'USD', 'ids': 'ethereum,bitcoin'})
+    assert ttl_for_tool('get_simple_price') == 30
+    assert ttl_for_tool('get_search_trending') == 300
+
+
+def test_entries_expire_and_evict_least_recently_used():
+    clock = Clock()
+    cache = AsyncTTLCache(max_entries=2, clock=clock)
+    cache.set('a', 1, ttl=10)
+    cache.set('b', 2, ttl=10)
+    assert cache.get('a') == 1
+    cache.set('c', 3, ttl=10)
+    assert cache.get('b') is None and cache.get('a') == 1
+    clock.now = 10
+    assert cache.get('a') is None
+    assert cache.stats()['evictions'] == 1
+
+
+def test_concurrent_loads_are_coalesced():
+    cache = AsyncTTLCache()
+    loads = []
+
+    async def loader():
+        loads.append(1)
+        await asyncio.sleep(0.01)
+        return {'price': 1}
+
+    async def main():
+        return await asyncio.gather(*(cache.get_or_load('key', 60, loader) for _ in range(5)))
+
+    assert asyncio.run(main()) == [{'price': 1}] * 5
+    assert len(loads) == 1
+    assert cache.stats()['coalesced'] == 4
+
+
+def test_failed_loads_are_not_cached():
+    cache = AsyncTTLCache()
+
+    async def failing():
+        raise RuntimeError('rate limited')
+
+    async def main():
+        with pytest.raises(RuntimeError):
+            await cache.get_or_load('key', 60, failing)
+        return await cache.get_or_load('key', 60, lambda: asyncio.sleep(0, result=2))
+
+    assert asyncio.run(main()) == 2
+
+
+def test_waiters_survive_a_cancelled_loader():
+    cache = AsyncTTLCache()
+    loads = []
+
+    async def loader():
+        loads.append(1)
+        await asyncio.sleep(0.05)
+        return 'value'
+
+    async def main():
+        first = asyncio.create_task(cache.get_or_load('key', 60, loader))
+        await asyncio.sleep(0)
+        waiters = [asyncio.create_task(cache.get_or_load('key', 60, loader)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        first.cancel()
+        results = await asyncio.gather(*waiters)
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return results
+
+    assert asyncio.run(main()) == ['value'] * 3
+    assert len(loads) == 2
+
+
+def test_cancelled_waiter_does_not_cancel_the_load():
+    cache = AsyncTTLCache()
+
+    async def loader():
+        await asyncio.sleep(0.02)
+        return 'value'
+
+    async def main():
+        first = asyncio.create_task(cache.get_or_load('key', 60, loader))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(cache.get_or_load('key', 60, loader))
+        await asyncio.sleep(0.005)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        return await first
+
+    assert asyncio.run(main()) == 'value'
@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip('google.adk.tools.mcp_tool', exc_type=ImportError)
+sessions = pytest.importorskip('service.market.sessions', exc_type=ImportError)
+
+
+class FakeMcpToolset:
+    """Stands in for McpToolset: each instance is one server subprocess."""
+
+    instances = []
+    failures = 0
+
+    def __init__(self, connection_params):
+        self.closed = False
+        FakeMcpToolset.instances.append(self)
+
+    async def get_tools(self):
+        if FakeMcpToolset.failures:
+            FakeMcpToolset.failures -= 1
+            raise ConnectionError('server not ready')
+        return ['get_search', 'get_simple_price']
+
+    async def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def fake_mcp(monkeypatch):
+    monkeypatch.setattr(sessions, 'McpToolset', FakeMcpToolset)
+    FakeMcpToolset.instances, FakeMcpToolset.failures = [], 0
+    return FakeMcpToolset
+
+
+def test_failed_connections_are_closed(fake_mcp):
+    fake_mcp.failures = 2
+    managed = sessions.ManagedMcpToolset('test', lambda: None)
+
+    async def main():
+        for _ in range(2):
+            with pytest.raises(ConnectionError):
+                await managed.get_tools()
+        return await managed.get_tools()
+
+    assert asyncio.run(main()) == ['get_search', 'get_simple_price']
+    assert [toolset.closed for toolset in fake_mcp.instances] == [True, True, False]
+
+
+def test_reconnect_closes_the_previous_toolset(fake_mcp):
+    managed = sessions.ManagedMcpToolset('test', lambda: None)
+
+    async def main():
+        await managed.get_tools()
+        await managed.reconnect()
+        await managed.close()
+
+    asyncio.run(main())
+    assert [toolset.closed for toolset in fake_mcp.instances] == [True, True]
+
+
+def test_lock_is_created_in_the_running_loop(fake_mcp):
+    managed = sessions.ManagedMcpToolset('test', lambda: None)
+    # Two separate loops, as with a registry built at import time and used by asyncio.run later.
+    asyncio.run(managed.get_tools())
+    asyncio.run(managed.close())
+    assert managed.stats()['connects'] == 1
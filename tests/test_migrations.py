@@ -0,0 +1,72 @@
+from service.db import database
+
+V1_TRANSACTIONS = [('income', 0.1, '2024-01-05 09:00:00'), ('expense', 0.2, '2024-01-05 18:30:00'),
+                   ('expense', 19.99, '2024-02-29 23:59:59'), ('expense', 5.0, '2024-02-29T12:00:00')]
+
+
+def _v1_database(monkeypatch, path):
+    """A database at schema version 1, as created before the v2 migration shipped, with some data."""
+    monkeypatch.setattr(database, 'MIGRATIONS', database.MIGRATIONS[:1])
+    with database.use_database(path):
+        database.migrate()
+        with database.get_db_transaction() as conn:
+            conn.executemany('INSERT INTO transaction_history (type, amount, created_at) VALUES (?, ?, ?)',
+                             V1_TRANSACTIONS)
+            conn.execute("INSERT INTO invest (amount, title, price, created_at) "
+                         "VALUES (0.5, 'BTC', 30000.01, '2024-01-10 12:00:00')")
+    monkeypatch.undo()
+
+
+def test_v2_backfill_converts_to_cents_epochs_and_categories(tmp_path, monkeypatch):
+    path = str(tmp_path / 'v1.db')
+    _v1_database(monkeypatch, path)
+    try:
+        with database.use_database(path):
+            version_before = database.get_data_version()
+            assert database.get_schema_version() == 1
+
+            # An interrupted migration: one backfill chunk done, then a row written the old way.
+            with database.get_db_transaction() as conn:
+                assert not database._backfill_v2(conn, 2)
+                conn.execute("INSERT INTO transaction_history (type, amount, created_at) "
+                             "VALUES ('income', 1234.56, '2024-03-01 08:00:00')")
+
+            assert database.migrate(chunk_size=2) == [2]
+            assert database.get_schema_version() == 2
+            assert database.get_data_version() > version_before
+
+            rows = sorted(database.get_all_transactions(), key=lambda row: row['id'])
+            assert [(row['id'], row['type'], row['amount'], row['created_at'], row['category']) for row in rows] == [
+                (1, 'income', 0.1, '2024-01-05 09:00:00', database.DEFAULT_CATEGORY),
+                (2, 'expense', 0.2, '2024-01-05 18:30:00', database.DEFAULT_CATEGORY),
+                (3, 'expense', 19.99, '2024-02-29 23:59:59', database.DEFAULT_CATEGORY),
+                (4, 'expense', 5.0, '2024-02-29 12:00:00', database.DEFAULT_CATEGORY),
+                (5, 'income', 1234.56, '2024-03-01 08:00:00', database.DEFAULT_CATEGORY),
+            ]
+            with database.get_db_connection() as conn:
+                cents = [row[0] for row in conn.execute('SELECT amount_cents FROM transaction_history ORDER BY id')]
+            assert cents == [10, 20, 1999, 500, 123456]
+
+            # The rollups are rebuilt in cents from the converted rows, and kept up to date afterwards.
+            assert database.get_transaction_totals_by_date_range('2024-01-05', '2024-01-05') == {
+                'income': 0.1, 'expense': 0.2}
+            database.add_transaction('expense', 0.7, '2024-01-05 20:00:00', category='Food')
+            assert database.get_transaction_totals_by_date_range('2024-01-05', '2024-01-05') == {
+                'income': 0.1, 'expense': 0.9}
+            assert database.get_category_totals('2024-01-01', '2024-01-31') == [
+                {'category': 'food', 'total': 0.7, 'transactions': 1},
+                {'category': database.DEFAULT_CATEGORY, 'total': 0.2, 'transactions': 1}]
+            [position] = database.get_investment_positions()
+            assert (position['title'], position['quantity'], position['cost_basis']) == ('BTC', 0.5, 15000.01)
+
+            # Nothing left to do on the next start.
+            assert database.migrate() == []
+    finally:
+        database.close_all_pools()
+
+
+def test_new_database_is_built_at_the_latest_version(db):
+    assert database.get_schema_version() == database.MIGRATIONS[-1][0]
+    database.add_transaction('expense', 12.34, '2024-05-01 10:00:00', category=' Groceries ')
+    [row] = database.get_all_transactions()
+    assert (row['amount'], row['created_at'], row['category']) == (12.34, '2024-05-01 10:00:00', 'groceries')
@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+
+from service.agents.model_scheduler import BACKGROUND, INTERACTIVE, ModelScheduler, TokenBucket, retry_after_of
+
+
+class ApiError(Exception):
+    def __init__(self, code, retry_after=None):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+        self.retry_after = retry_after
+
+
+def test_interactive_requests_go_before_background_ones():
+    scheduler = ModelScheduler(rpm=0, tpm=0, max_concurrent=1)
+    order = []
+
+    async def request(name, priority):
+        async with scheduler.slot(priority):
+            order.append(name)
+
+    async def main():
+        await scheduler.acquire()
+        waiting = [asyncio.create_task(request('advice', BACKGROUND)),
+                   asyncio.create_task(request('turn', INTERACTIVE))]
+        await asyncio.sleep(0)
+        assert scheduler.queue_depth() == {'interactive': 1, 'background': 1}
+        scheduler.release()
+        await asyncio.gather(*waiting)
+
+    asyncio.run(main())
+    assert order == ['turn', 'advice']
+
+
+def test_a_429_pauses_everyone_and_slows_the_rate():
+    now = [0.0]
+    scheduler = ModelScheduler(rpm=60, tpm=0, clock=lambda: now[0])
+
+    delay = scheduler.backoff(0, ApiError(429, retry_after=2.0))
+
+    assert 2.0 <= delay <= 2.4
+    stats = scheduler.stats()
+    assert (stats["paused_for_s"], stats["rpm_effective"], stats["throttled"]) == (2.0, 30.0, 1)
+    for _ in range(10):
+        scheduler.succeeded()
+    assert scheduler.stats()["rpm_effective"] == 60.0
+    # Errors without a retry delay back off exponentially, without pausing the others.
+    assert 0 <= scheduler.backoff(3, ApiError(503)) <= 8.0
+    assert scheduler.stats()["pauses"] == 1
+
+
+def test_retry_delay_of_a_gemini_error():
+    error = ApiError(429)
+    error.details = {"error": {"details": [{"@type": "type.googleapis.com/google.rpc.RetryInfo",
+                                            "retryDelay": "7s"}]}}
+    assert retry_after_of(error) == 7.0
+
+
+def test_call_retries_throttled_requests_only():
+    scheduler = ModelScheduler(rpm=0, tpm=0, max_attempts=3)
+    attempts = []
+
+    async def throttled_once():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ApiError(429, retry_after=0.01)
+        return 'ok'
+
+    async def invalid():
+        raise ApiError(400)
+
+    assert asyncio.run(scheduler.call(throttled_once)) == 'ok'
+    with pytest.raises(ApiError):
+        asyncio.run(scheduler.call(invalid))
+    stats = scheduler.stats()
+    assert (len(attempts), stats["retries"], stats["failures"], stats["in_flight"]) == (2, 1, 1, 0)
+
+
+def test_token_bucket_refills_per_minute():
+    now = [0.0]
+    bucket = TokenBucket(600, clock=lambda: now[0])
+    bucket.take(600)
+    assert bucket.delay(60) == pytest.approx(6.0)
+    now[0] = 6.0
+    assert bucket.delay(60) == 0.0
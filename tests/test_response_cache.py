@@ -0,0 +1,91 @@
+from service.agents.turns import TurnSummary
+from service.db import response_cache
+from service.db.response_cache import ResponseCache
+
+PROMPT = "what is my portfolio worth"
+
+
+def test_valuation_turn_uses_market():
+    turn = TurnSummary(agents=['Financial_Assistant', 'root_database_agent'],
+                       tools=['transfer_to_agent', 'GetPortfolioValuation'])
+    assert turn.uses_market
+    assert not TurnSummary(agents=['root_database_agent'], tools=['GetAllInvestments']).uses_market
+
+
+def test_cached_valuation_expires_with_the_market_epoch(tmp_path, monkeypatch):
+    cache = ResponseCache(path=str(tmp_path / 'cache.db'), market_period=300)
+    turn = TurnSummary(agents=['root_database_agent'], tools=['GetPortfolioValuation'])
+    monkeypatch.setattr(response_cache.time, 'time', lambda: 1000.0)
+    cache.store(PROMPT, "worth 100", turn.route, data_version=1, uses_market=turn.uses_market)
+    assert cache.lookup(PROMPT, data_version=1)["response"] == "worth 100"
+
+    monkeypatch.setattr(response_cache.time, 'time', lambda: 1300.0)
+    assert cache.lookup(PROMPT, data_version=1) is None
+
+
+def test_referential_prompts_are_not_cacheable():
+    assert response_cache.is_cacheable_prompt("how am I doing on my goals?")
+    assert response_cache.is_cacheable_prompt("how much did I spend this month")
+    assert not response_cache.is_cacheable_prompt("what about last month?")
+    assert not response_cache.is_cacheable_prompt("and the one before?")
+    assert not response_cache.is_cacheable_prompt("is it worth keeping")
+
+
+def test_entries_are_kept_per_agent(tmp_path):
+    cache = ResponseCache(path=str(tmp_path / 'cache.db'))
+    cache.store(PROMPT, "worth 100", 'Financial_Assistant', data_version=1, uses_market=False,
+                agent='Financial_Assistant')
+    assert cache.lookup(PROMPT, data_version=1, agent='Financial_Assistant')["response"] == "worth 100"
+    assert cache.lookup(PROMPT, data_version=1, agent='adviser_agent') is None
+
+
+class _Runner:
+    """A Runner over a stand-in root agent that counts its runs."""
+
+    def __init__(self, tmp_path):
+        from google.adk.agents import BaseAgent
+        from google.adk.events import Event
+        from google.adk.runners import Runner
+        from google.genai import types
+
+        from service.agents.session_service import SqliteSessionService
+        from service.db.session_store import SessionStore
+
+        runs = self.runs = []
+
+        class EchoAgent(BaseAgent):
+            async def _run_async_impl(self, ctx):
+                runs.append(ctx.user_content.parts[0].text)
+                yield Event(invocation_id=ctx.invocation_id, author=self.name,
+                            content=types.Content(role='model', parts=[types.Part(text=f"answer {len(runs)}")]))
+
+        self.runner = Runner(app_name='test', agent=EchoAgent(name='Financial_Assistant'),
+                             session_service=SqliteSessionService(SessionStore(str(tmp_path / 'sessions.db'))))
+
+
+def _assistant(tmp_path):
+    from service.agents.assistant import Assistant
+
+    fake = _Runner(tmp_path)
+    return Assistant(fake.runner, response_cache=ResponseCache(path=str(tmp_path / 'cache.db'))), fake
+
+
+def test_follow_ups_skip_the_cache_and_hits_join_the_session(db, tmp_path):
+    import asyncio
+
+    async def main():
+        assistant, fake = _assistant(tmp_path)
+        first = await assistant.handle(PROMPT, session_id='a')
+        # Right after a turn, the same words may mean something else: the agents answer again.
+        again = await assistant.handle(PROMPT, session_id='a')
+        fresh = await assistant.handle(PROMPT, session_id='b')
+        session = await fake.runner.session_service.get_session(app_name='test', user_id='user', session_id='b')
+        return first, again, fresh, session, fake.runs
+
+    first, again, fresh, session, runs = asyncio.run(main())
+    assert (first.source, again.source, fresh.source) == ('agent', 'agent', 'cache')
+    assert runs == [PROMPT, PROMPT]
+    # The follow-up was not stored, so the first answer is the one replayed.
+    assert fresh.text == first.text
+    assert [(event.author, event.content.parts[0].text) for event in session.events] == [
+        ('user', PROMPT), ('Financial_Assistant', first.text)]
@@ -0,0 +1,33 @@
+from service.agents.result_encoding import compact_page, encode_table
+from service.db.database import encode_cursor
+
+BIG_ROW = {'id': 5, 'type': 'expense', 'amount': 12.5, 'created_at': '2026-10-16 12:00:00', 'category': 'x' * 2000}
+
+
+def test_single_row_over_budget_is_kept():
+    cursor = encode_cursor('2026-10-10 12:00:00', 3)
+    result = compact_page({'items': [BIG_ROW], 'next_cursor': cursor}, budget=100)
+    assert len(result['data']['rows']) == 1
+    assert result['next_cursor'] == cursor
+
+
+def test_truncated_page_continues_after_last_row_kept():
+    rows = [{**BIG_ROW, 'id': row_id, 'category': str(row_id) * 2000} for row_id in (5, 4, 3)]
+    result = compact_page({'items': rows, 'next_cursor': None}, budget=600)
+    kept = len(result['data']['rows'])
+    assert 1 <= kept < len(rows)
+    assert result['next_cursor'] == encode_cursor(rows[kept - 1]['created_at'], rows[kept - 1]['id'])
+
+
+def test_only_money_is_rounded():
+    investments = encode_table([
+        {'id': 1, 'amount': 1.23456, 'title': 'BTC', 'price': 65000.123, 'created_at': '2026-10-16 12:00:00'},
+        {'id': 2, 'amount': 0.000123456, 'title': 'ETH', 'price': 2500.5, 'created_at': '2026-10-15 12:00:00'},
+    ])
+    assert [row[1] for row in investments['rows']] == [1.23456, 0.000123456]
+    assert [row[3] for row in investments['rows']] == [65000.12, 2500.5]
+    transactions = encode_table([
+        {'id': 1, 'type': 'expense', 'amount': 1.23456, 'created_at': '2026-10-16 12:00:00'},
+        {'id': 2, 'type': 'income', 'amount': 3.0, 'created_at': '2026-10-15 12:00:00'},
+    ])
+    assert [row[2] for row in transactions['rows']] == [1.23, 3.0]
@@ -0,0 +1,65 @@
+import asyncio
+
+from google.adk.events import Event, EventActions
+from google.genai import types
+
+from service.agents.session_service import SqliteSessionService
+from service.db.session_store import SUMMARY_STATE_KEY, SessionStore
+
+
+def _append(store, invocation_id, tokens, summary, delta=None):
+    return store.append_event('app', 'user', 's', '{}', invocation_id, 0.0, tokens, delta, summary)
+
+
+def test_compaction_drops_whole_invocations_into_the_summary(tmp_path):
+    store = SessionStore(str(tmp_path / 'sessions.db'), token_budget=100, compact_to_ratio=0.5)
+    store.create_session('app', 'user', 's')
+    for turn in range(3):
+        _append(store, f'turn-{turn}', 20, f'user: question {turn}')
+        _append(store, f'turn-{turn}', 10, f'agent: answer {turn}')
+
+    # 90 tokens so far; this event goes over the budget, so the oldest turns are folded away.
+    assert _append(store, 'turn-3', 20, 'user: question 3') == {"tokens": 50, "compacted": 4}
+    session = store.get_session('app', 'user', 's')
+    assert len(session["events"]) == 3
+    assert session["state"][SUMMARY_STATE_KEY] == 'user: question 0\nagent: answer 0\nuser: question 1\nagent: answer 1'
+    assert store.stats()["event_tokens"] == 50
+
+
+def test_the_current_invocation_is_never_compacted(tmp_path):
+    store = SessionStore(str(tmp_path / 'sessions.db'), token_budget=50)
+    store.create_session('app', 'user', 's')
+    for _ in range(4):
+        result = _append(store, 'only-turn', 20, None)
+    assert result == {"tokens": 80, "compacted": 0}
+
+
+def test_state_scopes_and_temp_keys(tmp_path):
+    store = SessionStore(str(tmp_path / 'sessions.db'))
+    store.create_session('app', 'user', 's', {'app:currency': 'usd', 'user:name': 'Sam', 'temp:scratch': 1})
+    _append(store, 'turn', 1, None, {'topic': 'goals', 'temp:other': 2})
+    store.create_session('app', 'user', 't')
+
+    assert store.get_session('app', 'user', 's')["state"] == {'app:currency': 'usd', 'user:name': 'Sam',
+                                                               'topic': 'goals'}
+    assert store.get_session('app', 'user', 't')["state"] == {'app:currency': 'usd', 'user:name': 'Sam'}
+
+
+def test_sessions_survive_a_new_service(tmp_path):
+    path = str(tmp_path / 'sessions.db')
+
+    async def write():
+        service = SqliteSessionService(SessionStore(path))
+        session = await service.create_session(app_name='app', user_id='user', session_id='s')
+        content = types.Content(role='user', parts=[types.Part(text='how am I doing on my goals?')])
+        await service.append_event(session, Event(invocation_id='i1', author='user', content=content,
+                                                  actions=EventActions(state_delta={'topic': 'goals'})))
+
+    async def read():
+        service = SqliteSessionService(SessionStore(path))
+        return await service.get_session(app_name='app', user_id='user', session_id='s')
+
+    asyncio.run(write())
+    session = asyncio.run(read())
+    assert [event.content.parts[0].text for event in session.events] == ['how am I doing on my goals?']
+    assert session.state == {'topic': 'goals'}
@@ -0,0 +1,78 @@
+import asyncio
+
+from service.db import database
+from service.market.valuation import SymbolResolver, value_portfolio
+
+COINS = {
+    'btc': [{'id': 'wrapped-bitcoin', 'symbol': 'wbtc', 'name': 'Wrapped Bitcoin'},
+            {'id': 'bitcoin', 'symbol': 'btc', 'name': 'Bitcoin'}],
+    'bitcoin': [{'id': 'bitcoin', 'symbol': 'btc', 'name': 'Bitcoin'}],
+    'eth': [{'id': 'ethereum', 'symbol': 'eth', 'name': 'Ethereum'}],
+    'shiny token': [{'id': 'shiny', 'symbol': 'shn', 'name': 'Shiny Token'}],
+}
+
+
+class FakeTool:
+    """A market tool answering like the MCP server, as a structuredContent result."""
+
+    def __init__(self, name, answer):
+        self.name = name
+        self.answer = answer
+        self.calls = []
+
+    async def run_async(self, *, args, tool_context=None):
+        self.calls.append(args)
+        return {"content": [], "structuredContent": self.answer(args)}
+
+
+def _tools(prices):
+    return [
+        # Listed first: a prefix/glob match on 'get_search' would pick it.
+        FakeTool('get_search_trending', lambda args: {"coins": []}),
+        FakeTool('get_search', lambda args: {"coins": COINS.get(args['query'], [])}),
+        FakeTool('get_simple_price', lambda args: {
+            coin_id: {"usd": prices[coin_id]} for coin_id in args['ids'].split(',') if coin_id in prices}),
+    ]
+
+
+def test_titles_resolve_once_by_exact_tool_name():
+    tools = _tools({})
+    now = [0.0]
+    resolver = SymbolResolver(clock=lambda: now[0])
+
+    first = asyncio.run(resolver.resolve(['BTC', 'btc ', 'unknown coin'], tools))
+    assert first == {'BTC': 'bitcoin', 'btc ': 'bitcoin', 'unknown coin': None}
+    assert tools[0].calls == []
+    assert [call['query'] for call in tools[1].calls] == ['btc', 'unknown coin']
+
+    # Known ids and recent misses are answered from memory.
+    asyncio.run(resolver.resolve(['Btc', 'unknown coin'], tools))
+    assert len(tools[1].calls) == 2
+    assert resolver.stats() == {"resolved": 1, "hits": 2, "lookups": 2, "unresolved": 1}
+
+    # Misses are looked up again once the retry delay has passed.
+    now[0] = 3601.0
+    asyncio.run(resolver.resolve(['unknown coin'], tools))
+    assert len(tools[1].calls) == 3
+
+
+def test_portfolio_value_and_missing_prices(db):
+    database.add_investment(0.5, 'BTC', 20000)
+    database.add_investment(0.5, 'bitcoin', 40000)
+    database.add_investment(2, 'ETH', 1000)
+    database.add_investment(10, 'Shiny Token', 1)
+    tools = _tools({'bitcoin': 50000.0, 'ethereum': 1500.0})
+
+    result = asyncio.run(value_portfolio(database.get_investment_positions(), tools, resolver=SymbolResolver()))
+
+    # One price call for every resolved coin.
+    assert tools[2].calls == [{"ids": "bitcoin,ethereum,shiny", "vs_currencies": "usd"}]
+    bitcoin, ethereum, shiny = result["positions"]
+    assert (bitcoin["coin_id"], bitcoin["quantity"], bitcoin["cost_basis"]) == ('bitcoin', 1.0, 30000.0)
+    assert (bitcoin["market_value"], bitcoin["pnl"], bitcoin["pnl_percent"]) == (50000.0, 20000.0, 66.67)
+    assert (ethereum["market_value"], ethereum["pnl"]) == (3000.0, 1000.0)
+    # No price: listed at cost, left out of the market value and P&L.
+    assert (shiny["current_price"], shiny["market_value"], shiny["pnl"]) == (None, None, None)
+    assert result["unpriced"] == ['Shiny Token']
+    assert result["total_cost_basis"] == 32010.0
+    assert (result["total_market_value"], result["total_pnl"]) == (53000.0, 21000.0)